@@ -0,0 +1,29 @@
+"""
+ASGI config for The Endless Nights Engine.
+HTTP goes to Django as before; websockets watch the world decay.
+
+This is the application to deploy: the game and LLM routers are async, so
+under ASGI a witness waiting on a long-poll or a provider holds no thread.
+
+    gunicorn -c gunicorn.conf.py endless_nights.asgi:application
+    daphne endless_nights.asgi:application  # one process, development
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'endless_nights.settings')
+
+# Django must be set up before consumers import models
+django_asgi_app = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+from channels.security.websocket import AllowedHostsOriginValidator  # noqa: E402
+
+from game.routing import websocket_urlpatterns  # noqa: E402
+
+application = ProtocolTypeRouter({
+    'http': django_asgi_app,
+    'websocket': AllowedHostsOriginValidator(URLRouter(websocket_urlpatterns)),
+})
@@ -0,0 +1,245 @@
+"""
+Micro-benchmarks for the model hot paths, with regression thresholds.
+Measure how fast things fall apart, so they fall apart no slower tomorrow.
+
+Each benchmark times one method - Location.degrade, Character.forget,
+Knowledge.calculate_weight, Message.degrade_text,
+ConversationContext.generate_prompt, OnlyWorldsAdapter._analyze_power_level -
+over SAMPLE instances drawn from a synthetic world of a given size, REPEATS
+times, and keeps the best round as the time per call (the least disturbed by
+everything else the machine was doing).
+
+Runs happen in a throwaway test database, never the real one. Results can be
+saved as a baseline (JSON, per benchmark and size); compare() flags anything
+slower than its baseline by more than TOLERANCE. See `manage.py benchmark`.
+"""
+
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+import json
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.db import connection
+
+Benchmark = Callable[[Dict, random.Random], Callable[[], None]]
+
+BENCHMARKS: Dict[str, Benchmark] = {}
+
+
+def _config(name: str, default):
+    return getattr(settings, 'BENCHMARK_CONFIG', {}).get(name, default)
+
+
+def benchmark(name: str):
+    """Register a benchmark: given a world and a seeded Random, return a function making one round of calls."""
+    def register(setup: Benchmark) -> Benchmark:
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def build_world(size: int, seed: int) -> Dict:
+    """
+    A synthetic world of `size` elements, bulk inserted: a tenth locations, a
+    quarter characters, the rest objects, plus one session with a tenth as
+    much knowledge and as many messages.
+    """
+    from game.models import Conversation, GameSession, Knowledge, Message
+    from llm.models import ConversationContext
+    from worlds.models import Character, Location, Object as WorldObject, World
+
+    rng = random.Random(seed)
+    words = "night lantern ruler knight merchant servant child vast grand small road ember crown".split()
+
+    def text(count: int) -> str:
+        return ' '.join(rng.choice(words) for _ in range(count))
+
+    world = World.objects.create(name=f"Benchmark {size}", description=text(20), source_type='manual')
+    locations = Location.objects.bulk_create(
+        [Location(world=world, name=f"Location {i}", description=text(rng.randint(5, 60)))
+         for i in range(max(1, size // 10))],
+        batch_size=2000,
+    )
+    characters = Character.objects.bulk_create(
+        [Character(world=world, name=f"Character {i}", description=text(rng.randint(5, 60)),
+                   current_location=rng.choice(locations))
+         for i in range(max(1, size // 4))],
+        batch_size=2000,
+    )
+    WorldObject.objects.bulk_create(
+        [WorldObject(world=world, name=f"Object {i}", description=text(rng.randint(3, 30)),
+                     location=rng.choice(locations))
+         for i in range(max(0, size - len(locations) - len(characters)))],
+        batch_size=2000,
+    )
+
+    session = GameSession.objects.create(world=world, witness_name='benchmark', world_entropy=0.3)
+    knowledge = Knowledge.objects.bulk_create(
+        [Knowledge(session=session, knowledge_type='whisper', content=text(12),
+                   base_weight=rng.random() * 3, is_terrible=rng.random() < 0.2,
+                   involves_self=rng.random() < 0.2, is_truth=rng.random() < 0.8)
+         for _ in range(max(1, size // 10))],
+        batch_size=2000,
+    )
+
+    sample = _config('SAMPLE', 200)
+    conversations = Conversation.objects.bulk_create(
+        [Conversation(session=session, character=rng.choice(characters), night_occurred=rng.randint(1, 50))
+         for _ in range(min(sample, len(characters)))],
+    )
+    contexts = ConversationContext.objects.bulk_create(
+        [ConversationContext(conversation=conversation, coherence_target=rng.random(),
+                             character_state={'memory_intact': rng.random()})
+         for conversation in conversations],
+    )
+    messages = Message.objects.bulk_create(
+        [Message(conversation=rng.choice(conversations), speaker='character',
+                 original_content=text(rng.randint(5, 80)))
+         for _ in range(max(1, size // 10))],
+        batch_size=2000,
+    )
+
+    return {
+        'size': size,
+        'locations': locations,
+        'characters': characters,
+        'knowledge': knowledge,
+        'messages': messages,
+        'contexts': contexts,
+    }
+
+
+def _sample(rows: List, rng: random.Random) -> List:
+    return rng.sample(rows, min(len(rows), _config('SAMPLE', 200)))
+
+
+@benchmark('Location.degrade')
+def _location_degrade(world, rng):
+    locations = _sample(world['locations'], rng)
+    return lambda: [location.degrade(0.001) for location in locations]
+
+
+@benchmark('Character.forget')
+def _character_forget(world, rng):
+    characters = _sample(world['characters'], rng)
+    return lambda: [character.forget(0.001) for character in characters]
+
+
+@benchmark('Knowledge.calculate_weight')
+def _knowledge_weight(world, rng):
+    knowledge = _sample(world['knowledge'], rng)
+    return lambda: [item.calculate_weight() for item in knowledge]
+
+
+@benchmark('Message.degrade_text')
+def _message_degrade(world, rng):
+    messages = _sample(world['messages'], rng)
+    levels = [rng.random() for _ in messages]
+    return lambda: [message.degrade_text(level) for message, level in zip(messages, levels)]
+
+
+@benchmark('ConversationContext.generate_prompt')
+def _generate_prompt(world, rng):
+    from llm.models import ConversationContext
+
+    # Loaded fresh each round, as a request would
+    ids = [context.id for context in _sample(world['contexts'], rng)]
+    return lambda: [context.generate_prompt() for context in ConversationContext.objects.filter(id__in=ids)]
+
+
+@benchmark('OnlyWorldsAdapter._analyze_power_level')
+def _analyze_power_level(world, rng):
+    from worlds.onlyworlds import OnlyWorldsAdapter
+
+    adapter = OnlyWorldsAdapter(api_key='', pin='')
+    data = [{'description': character.description} for character in _sample(world['characters'], rng)]
+    return lambda: [adapter._analyze_power_level(item) for item in data]
+
+
+def _time(run: Callable[[], None], calls: int, repeats: int) -> Dict:
+    rounds = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        run()
+        rounds.append((time.perf_counter() - started) / calls * 1e6)
+    return {
+        'calls': calls,
+        'best_us': round(min(rounds), 3),
+        'median_us': round(statistics.median(rounds), 3),
+    }
+
+
+def run(sizes=None, names=None, seed: int = None, repeats: int = None, progress=None) -> Dict:
+    """Time the selected benchmarks on a fresh world of each size; returns {name: {size: timing}}."""
+    sizes = sizes or _config('SIZES', (1000, 10000, 100000))
+    names = names or list(BENCHMARKS)
+    seed = seed if seed is not None else _config('SEED', 0)
+    repeats = repeats or _config('REPEATS', 5)
+
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        raise ValueError(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    results = {name: {} for name in names}
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        for size in sizes:
+            world = build_world(size, seed)
+            for name in names:
+                rng = random.Random(seed)
+                random.seed(seed)  # Message.degrade_text draws from the module generator
+                round_of_calls = BENCHMARKS[name](world, rng)
+                calls = len(round_of_calls())  # Warm up, and count the calls in a round
+                results[name][str(size)] = _time(round_of_calls, calls, repeats)
+                if progress:
+                    progress(name, size, results[name][str(size)])
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+    return results
+
+
+def baseline_path() -> Path:
+    return Path(_config('BASELINE', settings.BASE_DIR / 'benchmarks' / 'baseline.json'))
+
+
+def load_baseline(path: Path = None) -> Optional[Dict]:
+    path = path or baseline_path()
+    if not path.exists():
+        return None
+    return json.loads(path.read_text())
+
+
+def save_baseline(results: Dict, path: Path = None) -> Path:
+    """Merge results into the baseline, so benchmarks run on their own keep the others' numbers."""
+    path = path or baseline_path()
+    baseline = load_baseline(path) or {}
+    for name, sizes in results.items():
+        baseline.setdefault(name, {}).update(sizes)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(baseline, indent=2, sort_keys=True))
+    return path
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float = None) -> List[Dict]:
+    """Every benchmark and size with a baseline, with its change; `regressed` past the tolerance."""
+    tolerance = tolerance if tolerance is not None else _config('TOLERANCE', 0.25)
+    comparisons = []
+    for name, sizes in results.items():
+        for size, timing in sizes.items():
+            before = baseline.get(name, {}).get(size)
+            if not before:
+                continue
+            change = timing['best_us'] / before['best_us'] - 1 if before['best_us'] else 0.0
+            comparisons.append({
+                'benchmark': name,
+                'size': size,
+                'baseline_us': before['best_us'],
+                'best_us': timing['best_us'],
+                'change': round(change, 4),
+                'regressed': change > tolerance,
+            })
+    return comparisons
@@ -0,0 +1,240 @@
+"""
+Read-through caching for world and session reads.
+Memories that fade on schedule, and vanish the moment the world changes.
+
+Every cached value lives under a key built from a scheme plus the version
+stamps of the namespaces it depends on. Writes never delete cached values;
+model signals bump the namespace version when the write commits, and stale
+keys simply stop being asked for and expire.
+"""
+
+from collections import defaultdict
+from typing import Callable, Dict, Iterable
+import math
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+
+
+# Key schemes - every cached read is named here, nowhere else
+KEY_SCHEMES = {
+    'world_detail': 'world:{world_id}:detail',
+    'session_state': 'session:{session_id}:state',
+    'character_memories': 'character:{character_id}:memories',
+    'inspector_worlds': 'inspector:worlds',
+    'inspector_characters': 'inspector:world:{world_id}:characters',
+    'inspector_locations': 'inspector:world:{world_id}:locations',
+    'inspector_objects': 'inspector:world:{world_id}:objects',
+}
+
+# Namespaces - what a write invalidates
+WORLDS_NAMESPACE = 'worlds'
+
+
+def world_namespace(world_id) -> str:
+    return f"world:{world_id}"
+
+
+def session_namespace(session_id) -> str:
+    return f"session:{session_id}"
+
+
+def character_namespace(character_id) -> str:
+    return f"character:{character_id}"
+
+
+def _config(name: str, default):
+    return getattr(settings, 'CACHE_CONFIG', {}).get(name, default)
+
+
+class CacheMetrics:
+    """Hit/miss counters per key scheme, kept in-process and cheap to bump."""
+
+    EVENTS = ('hits', 'misses', 'early_recomputes', 'lock_waits')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = defaultdict(lambda: dict.fromkeys(self.EVENTS, 0))
+        self._invalidations = defaultdict(int)
+
+    def record(self, scheme: str, event: str, amount: int = 1):
+        with self._lock:
+            self._counts[scheme][event] += amount
+
+    def record_invalidation(self, namespace: str):
+        with self._lock:
+            self._invalidations[namespace.split(':', 1)[0]] += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            schemes = {scheme: dict(counts) for scheme, counts in self._counts.items()}
+            invalidations = dict(self._invalidations)
+
+        for counts in schemes.values():
+            reads = counts['hits'] + counts['misses']
+            counts['hit_rate'] = round(counts['hits'] / reads, 4) if reads else 0.0
+        return {'schemes': schemes, 'invalidations': invalidations}
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+            self._invalidations.clear()
+
+
+metrics = CacheMetrics()
+
+
+def _version_key(namespace: str) -> str:
+    return f"ns:{namespace}:v"
+
+
+def namespace_stamp(namespaces: Iterable[str]) -> str:
+    """The combined version stamp of several namespaces, e.g. '3.1'."""
+    namespaces = list(namespaces)
+    if not namespaces:
+        return '0'
+    versions = cache.get_many([_version_key(ns) for ns in namespaces])
+    return '.'.join(str(versions.get(_version_key(ns), 0)) for ns in namespaces)
+
+
+async def anamespace_stamp(namespaces: Iterable[str]) -> str:
+    """namespace_stamp for async callers."""
+    namespaces = list(namespaces)
+    if not namespaces:
+        return '0'
+    versions = await cache.aget_many([_version_key(ns) for ns in namespaces])
+    return '.'.join(str(versions.get(_version_key(ns), 0)) for ns in namespaces)
+
+
+def invalidate(*namespaces: str):
+    """Bump namespace versions so every key stamped with them goes stale."""
+    for namespace in namespaces:
+        key = _version_key(namespace)
+        if not cache.add(key, 1, None):
+            try:
+                cache.incr(key)
+            except ValueError:
+                # Evicted between add and incr
+                cache.set(key, 1, None)
+        metrics.record_invalidation(namespace)
+
+
+def invalidate_on_commit(*namespaces: str):
+    """invalidate() once the current transaction commits, so no reader caches what it could not yet see."""
+    transaction.on_commit(lambda: invalidate(*namespaces))
+
+
+def read_through(
+    scheme: str,
+    loader: Callable,
+    namespaces: Iterable[str] = (),
+    timeout: int = None,
+    **params,
+):
+    """
+    Return the cached value for a key scheme, loading it on a miss.
+
+    Stampede protection is twofold: a short lock lets one caller rebuild a
+    missing value while the rest wait for it, and values are recomputed early
+    with a probability that rises as expiry approaches (XFetch), so hot keys
+    are refreshed before they ever go missing.
+    """
+    timeout = timeout or _config('DEFAULT_TIMEOUT', 300)
+    key = f"{KEY_SCHEMES[scheme].format(**params)}@{namespace_stamp(namespaces)}"
+
+    entry = cache.get(key)
+    if entry is not None:
+        value, expires_at, delta = entry
+        beta = _config('EARLY_RECOMPUTE_BETA', 1.0)
+        if time.time() - delta * beta * math.log(random.random() or 1e-12) < expires_at:
+            metrics.record(scheme, 'hits')
+            return value
+        metrics.record(scheme, 'early_recomputes')
+        return _recompute(key, loader, timeout)
+
+    metrics.record(scheme, 'misses')
+
+    lock_key = f"lock:{key}"
+    if cache.add(lock_key, 1, _config('LOCK_TIMEOUT', 10)):
+        try:
+            return _recompute(key, loader, timeout)
+        finally:
+            cache.delete(lock_key)
+
+    # Someone else is rebuilding this key; give them a moment before joining in
+    metrics.record(scheme, 'lock_waits')
+    deadline = time.time() + _config('LOCK_WAIT', 2.0)
+    while time.time() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+
+    return _recompute(key, loader, timeout)
+
+
+def _recompute(key: str, loader: Callable, timeout: int):
+    started = time.time()
+    value = loader()
+    delta = time.time() - started
+    cache.set(key, (value, time.time() + timeout, delta), timeout)
+    return value
+
+
+def cache_stats() -> Dict:
+    """Hit/miss metrics for every key scheme seen by this process."""
+    return {
+        'backend': settings.CACHES['default']['BACKEND'].rsplit('.', 1)[-1],
+        **metrics.snapshot(),
+    }
+
+
+# Signal handlers - which writes make which reads stale, once they commit
+
+def _world_changed(sender, instance, **kwargs):
+    invalidate_on_commit(WORLDS_NAMESPACE, world_namespace(instance.pk))
+
+
+def _world_element_changed(sender, instance, **kwargs):
+    invalidate_on_commit(WORLDS_NAMESPACE, world_namespace(instance.world_id))
+
+
+def _session_changed(sender, instance, **kwargs):
+    invalidate_on_commit(session_namespace(instance.pk))
+
+
+def _session_child_changed(sender, instance, **kwargs):
+    invalidate_on_commit(session_namespace(instance.session_id))
+
+
+def _memory_changed(sender, instance, **kwargs):
+    invalidate_on_commit(character_namespace(instance.character_id))
+
+
+SIGNAL_HANDLERS = (
+    ('worlds.World', _world_changed),
+    ('worlds.Location', _world_element_changed),
+    ('worlds.Character', _world_element_changed),
+    ('worlds.Object', _world_element_changed),
+    ('worlds.Treaty', _world_element_changed),
+    ('game.GameSession', _session_changed),
+    ('game.Knowledge', _session_child_changed),
+    ('llm.CharacterMemory', _memory_changed),
+)
+
+
+def connect_signals():
+    """Invalidate cached reads on every save and delete of the models behind them."""
+    for sender, handler in SIGNAL_HANDLERS:
+        for signal in (post_save, post_delete):
+            signal.connect(
+                handler,
+                sender=sender,
+                weak=False,
+                dispatch_uid=f"cache_{sender}_{'save' if signal is post_save else 'delete'}",
+            )
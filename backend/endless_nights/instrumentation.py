@@ -0,0 +1,292 @@
+"""
+Per-request cost instrumentation for the Ninja API.
+Every request leaves a trace: how many queries, how long in the database,
+how long in Python, how many bytes went back to the witness.
+"""
+
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+import random
+import threading
+import time
+import tracemalloc
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+
+# Upper bounds for histogram buckets, per measured quantity
+BUCKETS = {
+    'total_ms': (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000),
+    'db_ms': (0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 1000),
+    'python_ms': (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000),
+    'queries': (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+    'payload_bytes': (256, 1024, 4096, 16384, 65536, 262144, 1048576),
+    'alloc_kb': (16, 64, 256, 1024, 4096, 16384, 65536),
+}
+
+
+def _config(name: str, default):
+    return getattr(settings, 'REQUEST_METRICS', {}).get(name, default)
+
+
+class Histogram:
+    """Cumulative-bucket histogram, Prometheus style."""
+
+    __slots__ = ('bounds', 'counts', 'count', 'total')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # Last bucket is +Inf
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+                return
+        self.counts[-1] += 1
+
+    def quantile(self, q: float) -> float:
+        """
+        The q-th observation, interpolated linearly within its bucket as
+        Prometheus' histogram_quantile does; past the last bound, that bound.
+        """
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= target:
+                if i == len(self.bounds):
+                    return self.bounds[-1]
+                lower = self.bounds[i - 1] if i else 0.0
+                return round(lower + (self.bounds[i] - lower) * (target - seen) / bucket_count, 3)
+            seen += bucket_count
+        return self.bounds[-1]
+
+    def to_dict(self) -> Dict:
+        return {
+            'count': self.count,
+            'sum': round(self.total, 3),
+            'mean': round(self.total / self.count, 3) if self.count else 0.0,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'buckets': dict(zip([str(b) for b in self.bounds] + ['+Inf'], self.counts)),
+        }
+
+
+class MetricsRegistry:
+    """Histograms per (method, route), shared by all threads of a worker."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = defaultdict(self._new_route)
+
+    @staticmethod
+    def _new_route():
+        return {
+            'requests': 0,
+            'errors': 0,
+            'histograms': {name: Histogram(bounds) for name, bounds in BUCKETS.items()},
+        }
+
+    def observe(self, method: str, route: str, status: int, values: Dict[str, float]):
+        with self._lock:
+            entry = self._routes[(method, route)]
+            entry['requests'] += 1
+            if status >= 500:
+                entry['errors'] += 1
+            for name, value in values.items():
+                entry['histograms'][name].observe(value)
+
+    def to_dict(self) -> List[Dict]:
+        with self._lock:
+            return [
+                {
+                    'method': method,
+                    'route': route,
+                    'requests': entry['requests'],
+                    'errors': entry['errors'],
+                    **{name: hist.to_dict() for name, hist in entry['histograms'].items()},
+                }
+                for (method, route), entry in sorted(self._routes.items(), key=lambda item: item[0][1])
+            ]
+
+    def to_prometheus(self) -> str:
+        """Render every histogram in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            routes = list(self._routes.items())
+
+            for counter, field in (('requests_total', 'requests'), ('request_errors_total', 'errors')):
+                lines.append(f'# TYPE endless_nights_{counter} counter')
+                for (method, route), entry in routes:
+                    labels = f'method="{method}",route="{route}"'
+                    lines.append(f'endless_nights_{counter}{{{labels}}} {entry[field]}')
+
+            for name in BUCKETS:
+                metric = f'endless_nights_request_{name}'
+                lines.append(f'# TYPE {metric} histogram')
+                for (method, route), entry in routes:
+                    hist = entry['histograms'][name]
+                    labels = f'method="{method}",route="{route}"'
+                    cumulative = 0
+                    for bound, bucket_count in zip(list(hist.bounds) + ['+Inf'], hist.counts):
+                        cumulative += bucket_count
+                        lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                    lines.append(f'{metric}_sum{{{labels}}} {hist.total}')
+                    lines.append(f'{metric}_count{{{labels}}} {hist.count}')
+
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+
+registry = MetricsRegistry()
+
+
+class QueryCounter:
+    """A database execute wrapper that counts queries and their time."""
+
+    __slots__ = ('count', 'duration')
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+# The counter of the async request being served, wherever its queries run
+_request_queries: ContextVar[Optional[QueryCounter]] = ContextVar('request_queries', default=None)
+
+
+def _count_request_queries(execute, sql, params, many, context):
+    counter = _request_queries.get()
+    if counter is None:
+        return execute(sql, params, many, context)
+    return counter(execute, sql, params, many, context)
+
+
+def _install_query_counter(sender, connection, **kwargs):
+    # Async views query from the threads sync_to_async lends them, on those
+    # threads' connections; each connection reports to the request whose
+    # context it is running in
+    if _count_request_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_request_queries)
+
+
+connection_created.connect(_install_query_counter)
+
+# tracemalloc is process-wide; only one request at a time may measure with it
+_alloc_lock = threading.Lock()
+
+
+class RequestMetricsMiddleware:
+    """
+    Record query count, DB time, Python time, payload size and (sampled)
+    allocations for every request, and report them as Server-Timing.
+
+    Under ASGI it runs on the event loop, so async views are not pushed onto
+    a thread; allocations are not sampled there, since concurrent requests
+    share the heap being traced.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not _config('ENABLED', True):
+            return self.get_response(request)
+
+        queries = QueryCounter()
+        tracing = (
+            random.random() < _config('ALLOC_SAMPLE_RATE', 0.01)
+            and _alloc_lock.acquire(blocking=False)
+        )
+        if tracing:
+            started_tracing = not tracemalloc.is_tracing()
+            if started_tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(queries):
+                response = self.get_response(request)
+        finally:
+            total = time.perf_counter() - started
+            if tracing:
+                peak = tracemalloc.get_traced_memory()[1]
+                if started_tracing:
+                    tracemalloc.stop()
+                _alloc_lock.release()
+
+        return self._observe(request, response, total, queries, (peak - baseline) if tracing else None)
+
+    async def __acall__(self, request):
+        if not _config('ENABLED', True):
+            return await self.get_response(request)
+
+        queries = QueryCounter()
+        token = _request_queries.set(queries)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            total = time.perf_counter() - started
+            _request_queries.reset(token)
+
+        return self._observe(request, response, total, queries)
+
+    def _observe(self, request, response, total: float, queries: QueryCounter, allocated: Optional[int] = None):
+        match = getattr(request, 'resolver_match', None)
+        route = match.route if match and match.route else 'unmatched'
+        payload = 0 if response.streaming else len(response.content)
+
+        values = {
+            'total_ms': total * 1000,
+            'db_ms': queries.duration * 1000,
+            'python_ms': max(0.0, total - queries.duration) * 1000,
+            'queries': queries.count,
+            'payload_bytes': payload,
+        }
+        if allocated is not None:
+            values['alloc_kb'] = max(0, allocated) / 1024
+
+        registry.observe(request.method, route, response.status_code, values)
+
+        if _config('SERVER_TIMING', True):
+            timings = [
+                f'db;dur={values["db_ms"]:.2f};desc="{queries.count} queries"',
+                f'app;dur={values["python_ms"]:.2f}',
+                f'total;dur={values["total_ms"]:.2f}',
+            ]
+            if allocated is not None:
+                timings.append(f'alloc;desc="{values["alloc_kb"]:.0f} KiB peak"')
+            response['Server-Timing'] = ', '.join(timings)
+
+        return response
@@ -0,0 +1,62 @@
+"""
+Lazy imports for heavy optional libraries.
+What is not needed tonight is not carried.
+
+lazy_import('spacy') returns a stand-in that imports the real module the
+first time one of its attributes is read, so modules can name NLP and LLM
+libraries at the top of the file without every manage.py command and every
+worker boot paying for them. A missing library raises ImportError at that
+first use, exactly where a local import would have.
+
+loaded() tells which of them have actually been imported; profile_startup
+fails if any were imported while starting up.
+"""
+
+from typing import Dict, List
+import importlib
+import sys
+import threading
+import types
+
+_lazy: Dict[str, 'LazyModule'] = {}
+_lock = threading.Lock()
+
+
+class LazyModule(types.ModuleType):
+    """A module that is imported on first attribute access."""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__['_module'] = None
+
+    def _load(self) -> types.ModuleType:
+        module = self.__dict__['_module']
+        if module is None:
+            # No lock of ours is held: importlib serialises imports of a module
+            # itself, and one lazy module's import may load another
+            module = importlib.import_module(self.__name__)
+            self.__dict__['_module'] = module
+        return module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __dir__(self) -> List[str]:
+        return dir(self._load())
+
+    def __repr__(self) -> str:
+        state = 'loaded' if self.__dict__['_module'] is not None else 'not loaded'
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """A stand-in for module `name`, shared by everyone who asks for it."""
+    with _lock:
+        if name not in _lazy:
+            _lazy[name] = LazyModule(name)
+        return _lazy[name]
+
+
+def loaded() -> Dict[str, bool]:
+    """Every lazily imported module, and whether it has been imported by now (by anyone)."""
+    return {name: name in sys.modules for name in sorted(_lazy)}
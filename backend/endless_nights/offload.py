@@ -0,0 +1,48 @@
+"""
+A thread pool for CPU-bound work asked for by async views.
+Set the heavy things down to one side, so the night keeps answering.
+
+Under ASGI one event loop serves every request of a process; anything that
+computes for long on it - degrading a reply, rendering a heat tile - stalls
+every other witness waiting on that loop. offload() runs such work on a small
+pool of its own, apart from the threads Django lends to the ORM, and awaits
+it. The GIL still serialises pure Python, so the pool buys responsiveness,
+not parallelism: CPU_WORKERS stays small.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+import asyncio
+import functools
+import os
+import threading
+
+from django.conf import settings
+
+T = TypeVar('T')
+
+_executor = None
+_lock = threading.Lock()
+
+
+def _config(name: str, default):
+    return getattr(settings, 'ASYNC_CONFIG', {}).get(name, default)
+
+
+def executor() -> ThreadPoolExecutor:
+    """The process's pool, started on first use (so never in a master about to fork)."""
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=_config('CPU_WORKERS', min(4, os.cpu_count() or 1)),
+                    thread_name_prefix='offload',
+                )
+    return _executor
+
+
+async def offload(func: Callable[..., T], *args, **kwargs) -> T:
+    """Run func(*args, **kwargs) on the CPU pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor(), functools.partial(func, *args, **kwargs))
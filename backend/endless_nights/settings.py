@@ -32,6 +32,7 @@ INSTALLED_APPS = [
     
     # Third party
     'corsheaders',
+    'channels',
     
     # Our apps - where the endless night lives
     'worlds',
@@ -41,6 +42,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'endless_nights.instrumentation.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -130,11 +132,82 @@ CELERY_RESULT_BACKEND = os.getenv('REDIS_URL', 'redis://localhost:6379')
 # OnlyWorlds Integration
 ONLYWORLDS_API_KEY = os.getenv('ONLYWORLDS_API_KEY', '')
 ONLYWORLDS_PIN = os.getenv('ONLYWORLDS_PIN', '')
+ONLYWORLDS_SCHEMA_DIR = Path(os.getenv('ONLYWORLDS_SCHEMA_DIR', BASE_DIR.parent / 'ow_schema'))
 
 # LLM Configuration
 ANTHROPIC_API_KEY = os.getenv('ANTHROPIC_API_KEY', '')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
 
+LLM_CONFIG = {
+    'TOKENIZER': 'cl100k_base',  # tiktoken encoding; falls back to ~4 characters a token
+    'TOKEN_BUDGET': int(os.getenv('LLM_TOKEN_BUDGET', 3000)),  # Whole prompt plus reply
+    'RESPONSE_RESERVE': 500,  # Tokens kept free for the reply
+    'WINDOW_TURNS': 6,  # Recent turns sent verbatim
+    'SUMMARY_BUDGET': 400,  # Tokens the folded summary may use
+    'PROVIDER': os.getenv('LLM_PROVIDER', 'placeholder'),  # Used when no default LLMProvider row is active
+    'PROVIDER_REFRESH': 60,  # Seconds between re-reads of the default LLMProvider
+    'TIMEOUT': 30,  # Seconds a provider call may take
+}
+
+# Routing - hedged requests and circuit breaking across providers
+ROUTING_CONFIG = {
+    'HEDGING': os.getenv('LLM_HEDGING', 'true').lower() == 'true',
+    'WINDOW': 100,  # Recent calls per provider behind p50/p95 and the error rate
+    'MIN_SAMPLES': 20,  # Successful calls needed before hedging at p95
+    'HEDGE_AFTER': 2.0,  # Seconds to wait before hedging until then
+    'HEDGE_MIN': 0.05,  # Never hedge sooner than this
+    'CONSECUTIVE_FAILURES': 5,  # Failures in a row that eject a provider
+    'ERROR_THRESHOLD': 0.5,  # Error rate over the window that ejects a provider
+    'MIN_CALLS': 10,  # Calls needed before the error rate counts
+    'COOLDOWN': 30,  # Seconds an ejected provider sits out
+}
+
+# Mock LLM server - `manage.py run_mock_llm`, for load tests without a network
+MOCK_LLM_CONFIG = {
+    'HOST': '127.0.0.1',
+    'PORT': 8808,
+    'SEED': 0,  # Same seed, same replies and the same run of latencies
+    'LATENCY': 'lognormal:0.3,0.5',  # Time to first token; see llm.mock_server.parse_distribution
+    'TOKENS_PER_SECOND': 60.0,
+    'ERROR_RATE': 0.0,  # Share of requests that fail
+    'MIN_TOKENS': 16,
+    'MAX_TOKENS': 96,
+}
+
+# Metering - tokens counted per call, budgets enforced as they are spent
+# Provider budgets and prices live on LLMProvider (token_budget, cost_per_1k_tokens, fallback)
+METERING_CONFIG = {
+    'SESSION_TOKEN_BUDGET': int(os.getenv('LLM_SESSION_TOKEN_BUDGET', 200000)),  # 0 = unlimited
+    'PREGEN_TOKEN_BUDGET': int(os.getenv('LLM_PREGEN_TOKEN_BUDGET', 50000)),  # Per session, for pre-generated lines
+    'FLUSH_INTERVAL': 5.0,  # Seconds between writes of usage aggregates
+    'FLUSH_SIZE': 200,  # Calls that trigger an early write
+    'COUNTER_TIMEOUT': 2 * 24 * 60 * 60,  # Seconds the live budget counters stay cached
+    'SILENCE': "{name} looks at you, but says nothing more tonight.",  # Over budget with nothing cached
+}
+
+# Response cache - the same question gets the same half-answer
+# Redis when REDIS_URL is set, a per-process LRU otherwise
+RESPONSE_CACHE_CONFIG = {
+    'ENABLED': os.getenv('LLM_RESPONSE_CACHE', 'true').lower() == 'true',
+    'TIMEOUT': 24 * 60 * 60,  # Seconds a cached reply may live
+    'MAX_ENTRIES': 50000,  # Least recently used replies are evicted beyond this
+    'BUCKET': 0.1,  # Width of the degradation/coherence buckets in the key
+    'VARIANTS': 3,  # Replies kept per key
+    'RESAMPLE_RATE': 0.2,  # Chance a hit asks the provider anyway, for variety
+}
+
+# Pre-generation - lines prepared for nearby characters when a night falls
+PREGEN_CONFIG = {
+    'ENABLED': os.getenv('LLM_PREGEN', 'true').lower() == 'true',
+    'WORKERS': 1,  # Background threads per process
+    'QUEUE_SIZE': 1000,  # Jobs beyond this are dropped
+    'NEIGHBOURS': True,  # Also prepare characters one connection away
+    'MAX_CHARACTERS': 6,  # Characters prepared per night
+    'QUESTIONS': 3,  # Likely questions answered ahead, per character
+    'COMMON_QUESTIONS': ('Who are you?', 'What happened here?', 'What do you remember?'),
+    'TIMEOUT': 60 * 60,  # Seconds a queued position stays valid
+}
+
 # Game Configuration - The Weight of Knowledge
 GAME_CONFIG = {
     'DEFAULT_WORLD': os.getenv('DEFAULT_WORLD', 'efteling'),
@@ -142,14 +215,133 @@ GAME_CONFIG = {
     'DEGRADATION_SPEED': os.getenv('DEGRADATION_SPEED', 'normal'),
     'KNOWLEDGE_WEIGHT_MULTIPLIER': 1.0,
     'MAX_NIGHT_COUNT': float('inf'),  # Endless nights
+    'SNAPSHOT_INTERVAL': int(os.getenv('SESSION_SNAPSHOT_INTERVAL', 50)),  # Events between session snapshots
+    'LONG_POLL_TIMEOUT': float(os.getenv('LONG_POLL_TIMEOUT', 25)),  # Longest a /changes request may wait
+    'LONG_POLL_INTERVAL': 0.25,  # Seconds between cache checks while waiting
+    'MAX_TURN_ACTIONS': 20,  # Most actions one /turn request may carry
+    'CONVERSATION_NIGHTS': 0.4,  # Share of a night's forgetting one ended conversation costs a character
 }
 
 # Cache Configuration - Memories that fade
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
-        'LOCATION': os.getenv('REDIS_URL', 'redis://127.0.0.1:6379'),
+# Redis when REDIS_URL is set, local memory otherwise (development without Redis)
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'redis' if os.getenv('REDIS_URL') else 'locmem')
+
+if CACHE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL', 'redis://127.0.0.1:6379'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'endless-nights',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
+CACHE_CONFIG = {
+    'DEFAULT_TIMEOUT': 300,  # Seconds a cached read may live
+    'LOCK_TIMEOUT': 10,  # Seconds one rebuild may hold the stampede lock
+    'LOCK_WAIT': 2.0,  # Seconds other readers wait for that rebuild
+    'EARLY_RECOMPUTE_BETA': 1.0,  # >1 refreshes hot keys earlier
+}
+
+# Map index - tears, burns and blood, found by viewport
+SPATIAL_CONFIG = {
+    'GRID_SIZE': 64,  # Grid cells per map axis
+    'ZOOM_LEVELS': 4,  # Heat tiles at zooms 0-3; zoom z is 2^z x 2^z tiles
+    'TILE_BINS': 16,  # Heat bins per tile axis
+    'TIMEOUT': 60 * 60,  # Seconds a grid or tile may stay cached
+}
+
+# Channels - the world decaying live, pushed to whoever is watching
+# Redis carries broadcasts between processes; the in-memory layer only reaches
+# sockets served by the same process (development)
+ASGI_APPLICATION = 'endless_nights.asgi.application'
+
+if os.getenv('REDIS_URL'):
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [os.getenv('REDIS_URL')]},
+        }
     }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        }
+    }
+
+# Async views - the game and LLM routers wait without holding a thread (asgi.py)
+ASYNC_CONFIG = {
+    'CPU_WORKERS': int(os.getenv('ASYNC_CPU_WORKERS', min(4, os.cpu_count() or 1))),  # Degradation, tiles
+}
+
+BROADCAST_CONFIG = {
+    'COALESCE_MS': 100,  # Events arriving within this window go out as one frame
+    'MAX_BATCH': 64,  # Flush early once a frame holds this many events
+    'ENCODING': os.getenv('BROADCAST_ENCODING', 'msgpack'),  # msgpack or json
+}
+
+# Request instrumentation - what each endpoint costs
+REQUEST_METRICS = {
+    'ENABLED': os.getenv('REQUEST_METRICS', 'True') == 'True',
+    'SERVER_TIMING': True,  # Add Server-Timing headers to responses
+    'ALLOC_SAMPLE_RATE': float(os.getenv('REQUEST_METRICS_ALLOC_SAMPLE_RATE', '0.01')),  # tracemalloc is costly
+    'PROMETHEUS': True,  # Allow /api/inspector/metrics?format=prometheus
+}
+
+# Warm-up - built once in the gunicorn master, shared by forked workers (gunicorn.conf.py)
+WARMUP_CONFIG = {
+    'ENABLED': os.getenv('WARMUP', 'True') == 'True',
+    'WARMERS': ['onlyworlds_schema', 'url_patterns', 'tokenizer', 'reference_worlds'],
+    'WORLDS': 10,  # Most witnessed worlds to snapshot
+    'FREEZE': True,  # gc.freeze() afterwards, so worker collections leave shared pages alone
+}
+
+# Startup - `manage.py profile_startup` fails past these import-time budgets
+STARTUP_CONFIG = {
+    'SETUP_BUDGET_MS': 600,  # django.setup(): every manage.py command pays this
+    'URLS_BUDGET_MS': 1200,  # Plus the URLconf and routers: what a web worker boots with
+}
+
+# Benchmarks - `manage.py benchmark` times the model hot paths
+BENCHMARK_CONFIG = {
+    'SIZES': (1000, 10000, 100000),  # Elements per synthetic world
+    'SAMPLE': 200,  # Instances timed per round
+    'REPEATS': 5,  # Rounds; the best one counts
+    'SEED': 0,
+    'TOLERANCE': 0.25,  # Fail when more than 25% slower than the baseline
+    'BASELINE': BASE_DIR / 'benchmarks' / 'baseline.json',
+}
+
+# Named-entity extraction - the parser's first pass, local and LLM-free (parser/ner.py)
+NER_CONFIG = {
+    'MODEL': os.getenv('NER_MODEL', 'en_core_web_sm'),  # python -m spacy download en_core_web_sm
+    'MODELS': (),  # Other models a request may ask for; nothing else is ever loaded
+    'KEEP': ('tok2vec', 'ner'),  # Components that run; the rest of the pipeline is disabled
+    'CHUNK_CHARS': 10000,  # Text per doc, cut at paragraph breaks
+    'BATCH_SIZE': 32,  # Docs per nlp.pipe batch
+    'N_PROCESS': int(os.getenv('NER_N_PROCESS', 1)),  # Processes nlp.pipe forks; 1 inside web workers
+    'MIN_LENGTH': 2,  # Shortest name kept
+    'MIN_MENTIONS': 1,  # Fewest mentions a candidate needs
+    'MAX_MENTIONS': 200,  # Offsets stored per candidate
+}
+
+# Load testing - `manage.py load_test` against a running server
+LOAD_TEST_CONFIG = {
+    'WITNESSES': 10,  # Concurrent virtual witnesses
+    'SCENARIO': 'night',  # See game.loadtest.SCENARIOS
+    'DURATION': 60.0,  # Seconds
+    'RAMP_UP': 5.0,  # Seconds over which witnesses join
+    'THINK_TIME': 1.0,  # Mean seconds between a witness's requests
+    'MESSAGES': 2,  # Messages per conversation
+    'TIMEOUT': 30.0,
+    'SEED': 0,
 }
 
 # Logging - Whispers in the dark
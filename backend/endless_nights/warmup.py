@@ -0,0 +1,161 @@
+"""
+Warming the process up before it forks.
+Light the lamps once, in the master, and let every worker read by them.
+
+warm() builds the immutable, read-mostly structures every worker would
+otherwise build for itself on its first requests: the compiled OnlyWorlds
+schema, the URLconf with every router's request and response models, the
+tokenizer's BPE tables, and snapshots of the reference worlds. Run in the
+gunicorn master with preload_app (see gunicorn.conf.py), they are inherited
+by every worker copy-on-write; gc.freeze() then moves them out of the
+collector's sight, so collections in the workers do not touch - and so copy -
+their pages.
+
+Each warmer's time and how much it grew the process (resident set size) are
+kept for the /inspector/warmup report.
+"""
+
+from typing import Callable, Dict, List, Optional
+import gc
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+WARMERS: Dict[str, Callable[[], str]] = {}
+
+_report: Dict = {'warmed': False, 'pid': None, 'items': [], 'rss_before_kb': None, 'rss_after_kb': None}
+_lock = threading.Lock()
+
+
+def _config(name: str, default):
+    return getattr(settings, 'WARMUP_CONFIG', {}).get(name, default)
+
+
+def warmer(name: str):
+    """Register a warmer: a function that builds something and says what it built."""
+    def register(build: Callable[[], str]) -> Callable[[], str]:
+        WARMERS[name] = build
+        return build
+    return register
+
+
+def rss_kb() -> Optional[int]:
+    """Resident set size of this process, where /proc tells it."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+@warmer('onlyworlds_schema')
+def _schema() -> str:
+    from worlds.schema import load_schema
+
+    return f"{len(load_schema())} element types compiled"
+
+
+@warmer('url_patterns')
+def _urls() -> str:
+    from django.urls import get_resolver
+
+    def count(patterns) -> int:
+        return sum(count(p.url_patterns) if hasattr(p, 'url_patterns') else 1 for p in patterns)
+
+    # Imports every router and builds each operation's pydantic models
+    return f"{count(get_resolver().url_patterns)} URL patterns resolved"
+
+
+@warmer('tokenizer')
+def _tokenizer() -> str:
+    from llm.context import _config as llm_config, get_encoding
+
+    name = llm_config('TOKENIZER', 'cl100k_base')
+    if get_encoding(name) is None:
+        return f"{name} unavailable; token counts are estimated"
+    return f"{name} loaded"
+
+
+@warmer('reference_worlds')
+def _worlds() -> str:
+    from worlds.models import World
+    from worlds.snapshot import get_snapshot
+
+    worlds = World.objects.order_by('-times_witnessed').values_list('id', flat=True)[:_config('WORLDS', 10)]
+    snapshots = [get_snapshot(str(world_id)) for world_id in worlds]
+    locations = sum(len(s.location_ids) for s in snapshots if s)
+    return f"{len(snapshots)} world snapshots, {locations} locations"
+
+
+def warm(names: List[str] = None, freeze: bool = None) -> Dict:
+    """Run the warmers once per process (names: a subset); returns the report."""
+    with _lock:
+        if _report['warmed'] and _report['pid'] == os.getpid():
+            return report()
+
+        _report['rss_before_kb'] = rss_kb()
+        items = []
+        for name in names or _config('WARMERS', list(WARMERS)):
+            baseline = rss_kb()
+            started = time.perf_counter()
+            try:
+                detail, ok = WARMERS[name](), True
+            except Exception as exc:
+                # A cold start is slower, not broken; workers build it on demand
+                logger.warning("Warming %s failed: %r", name, exc)
+                detail, ok = repr(exc), False
+            after = rss_kb()
+            items.append({
+                'name': name,
+                'ok': ok,
+                'detail': detail,
+                'ms': round((time.perf_counter() - started) * 1000, 1),
+                'rss_kb': after - baseline if after is not None and baseline is not None else None,
+            })
+
+        _close_connections()
+        frozen = freeze if freeze is not None else _config('FREEZE', True)
+        if frozen:
+            gc.collect()
+            gc.freeze()
+
+        _report.update({
+            'warmed': True,
+            'pid': os.getpid(),
+            'items': items,
+            'frozen': frozen,
+            'rss_after_kb': rss_kb(),
+        })
+        logger.info("Warmed up in %.0fms: %s", sum(i['ms'] for i in items), ', '.join(i['name'] for i in items))
+        return report()
+
+
+def _close_connections():
+    # A connection opened before the fork would be shared by every worker
+    from django.db import connections
+
+    connections.close_all()
+
+
+def report() -> Dict:
+    """What was preloaded and what it cost, as this process sees it."""
+    items = _report['items']
+    return {
+        'warmed': _report['warmed'],
+        'warmed_in_pid': _report['pid'],
+        'pid': os.getpid(),
+        'inherited': _report['warmed'] and _report['pid'] != os.getpid(),
+        'frozen': _report.get('frozen', False),
+        'frozen_objects': gc.get_freeze_count(),
+        'total_ms': round(sum(item['ms'] for item in items), 1),
+        'preloaded_kb': sum(item['rss_kb'] or 0 for item in items),
+        'rss_before_kb': _report['rss_before_kb'],
+        'rss_after_kb': _report['rss_after_kb'],
+        'rss_kb': rss_kb(),
+        'items': items,
+    }
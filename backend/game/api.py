@@ -1,33 +1,63 @@
 """
 API endpoints for game sessions.
+
+The views are async: served over ASGI (endless_nights/asgi.py), a witness
+waiting on a long-poll or a slow action does not hold a thread. Simple reads
+and writes use the async ORM; the actions, which run in transactions, run in
+the request's database thread via sync_to_async.
 """
 
+from asgiref.sync import sync_to_async
 from ninja import Router
 from typing import Optional
-from .models import GameSession, Knowledge, Conversation, Message, Discovery
+from .models import GameSession, GameEvent, Knowledge, Conversation, Message, Discovery
+from .events import rebuild_state
+from .sync import await_changes
+from django.conf import settings
+from django.db.models import F
+from django.http import Http404
+from endless_nights.caching import read_through, session_namespace
+from endless_nights.offload import offload
 from worlds.models import World
+from worlds.snapshot import get_snapshot
+from .overlay import load_overlay, merge, merged_world
+from . import services, spatial
+from .services import TurnContext
+from .turns import TurnRequest, run_turn
 import uuid
 
 router = Router()
 
+SESSION_STATE_FIELDS = (
+    'id', 'world_id', 'current_location_id', 'night_count', 'total_weight', 'movement_speed',
+    'world_entropy', 'text_degradation', 'color_loss', 'is_active', 'version',
+)
+
+
+async def _act(action, session_id, *args):
+    """Run a game action against a freshly loaded session."""
+    return await sync_to_async(action)(await TurnContext.aload(session_id), *args)
+
 
 @router.post("/start")
-def start_session(request, world_id: str, witness_name: str, witness_size: str = "thumb"):
+async def start_session(request, world_id: str, witness_name: str, witness_size: str = "thumb"):
     """Start a new witness session."""
-    world = World.objects.get(id=world_id)
-    world.times_witnessed += 1
-    world.save()
+    world = await World.objects.aget(id=world_id)
+    # One statement, no signals: concurrent starts all count, and the world's snapshot stays warm
+    await World.objects.filter(pk=world.pk).aupdate(times_witnessed=F('times_witnessed') + 1)
     
-    session = GameSession.objects.create(
+    # request.user is loaded lazily, from the session store
+    player = await sync_to_async(lambda: request.user if request.user.is_authenticated else None)()
+    session = await GameSession.objects.acreate(
         world=world,
         witness_name=witness_name,
         witness_size=witness_size,
-        player_id=str(uuid.uuid4()) if not request.user.is_authenticated else None,
-        player=request.user if request.user.is_authenticated else None,
+        anonymous_id=str(uuid.uuid4()) if player is None else '',
+        player=player,
     )
     
     # Add first whisper
-    Knowledge.objects.create(
+    await Knowledge.objects.acreate(
         session=session,
         knowledge_type='whisper',
         content='The night has no intention of ending',
@@ -44,62 +74,154 @@ def start_session(request, world_id: str, witness_name: str, witness_size: str =
     }
 
 
+def _session_state(session_id: str):
+    """The cached session row and the location it stands in, as this witness sees it."""
+    def load():
+        session = GameSession.objects.filter(id=session_id).values(*SESSION_STATE_FIELDS).first()
+        if session is None:
+            raise Http404("No such session")
+        session['knowledge_count'] = Knowledge.objects.filter(session_id=session_id).count()
+        session['overlay'] = load_overlay(session_id)
+        return session
+    
+    session = read_through('session_state', load, namespaces=[session_namespace(session_id)], session_id=session_id)
+    
+    # World state comes from the snapshot, not from Location rows,
+    # with this witness's own degradation layered on top
+    location = None
+    if session['current_location_id']:
+        snapshot = get_snapshot(session['world_id'])
+        if snapshot:
+            location = merge(snapshot.location(session['current_location_id']), session['overlay'], 'location')
+    return session, location
+
+
 @router.get("/{session_id}/state")
-def get_session_state(request, session_id: str):
+async def get_session_state(request, session_id: str):
     """Get current session state."""
-    session = GameSession.objects.get(id=session_id)
+    session, location = await sync_to_async(_session_state)(session_id)
     
     return {
-        "session_id": str(session.id),
-        "night_count": session.night_count,
-        "total_weight": session.total_weight,
-        "movement_speed": session.movement_speed,
-        "world_entropy": session.world_entropy,
-        "text_degradation": session.text_degradation,
-        "color_loss": session.color_loss,
-        "current_location": str(session.current_location.id) if session.current_location else None,
-        "knowledge_count": session.knowledge.count(),
-        "is_active": session.is_active,
+        "session_id": str(session['id']),
+        "night_count": session['night_count'],
+        "total_weight": session['total_weight'],
+        "movement_speed": session['movement_speed'],
+        "world_entropy": session['world_entropy'],
+        "text_degradation": session['text_degradation'],
+        "color_loss": session['color_loss'],
+        "current_location": str(session['current_location_id']) if session['current_location_id'] else None,
+        "location": location,
+        "knowledge_count": session['knowledge_count'],
+        "is_active": session['is_active'],
+        "version": session['version'],
     }
 
 
 @router.post("/{session_id}/advance-night")
-def advance_night(request, session_id: str):
-    """Advance to the next night."""
-    session = GameSession.objects.get(id=session_id)
-    session.advance_night()
+async def advance_night(request, session_id: str, nights: int = 1):
+    """Advance one or more nights; skipping ahead costs the same as a single night."""
+    return await _act(services.advance, session_id, nights)
+
+
+@router.post("/{session_id}/discover")
+async def add_discovery(request, session_id: str, content: str, knowledge_type: str = "whisper"):
+    """Add a new piece of knowledge."""
+    return await _act(services.discover, session_id, content, knowledge_type)
+
+
+@router.get("/{session_id}/changes")
+async def get_changes(request, session_id: str, since: int = 0, timeout: Optional[float] = None):
+    """What changed since version `since`, waiting up to `timeout` seconds for something to."""
+    limit = settings.GAME_CONFIG.get('LONG_POLL_TIMEOUT', 25)
+    timeout = limit if timeout is None else min(max(0.0, timeout), limit)
     
-    # Degrade world
-    if session.current_location:
-        session.current_location.degrade()
+    changes = await await_changes(session_id, since, timeout)
+    if changes is None:
+        raise Http404("No such session")
+    return changes
+
+
+@router.get("/{session_id}/world")
+async def get_session_world(request, session_id: str):
+    """The world as this witness sees it, degradation included."""
+    try:
+        session = await GameSession.objects.aget(id=session_id)
+    except GameSession.DoesNotExist:
+        raise Http404("No such session")
+    return await sync_to_async(merged_world)(session)
+
+
+@router.post("/{session_id}/move")
+async def move(request, session_id: str, location_id: str):
+    """Walk to another location in the world."""
+    return await _act(services.move, session_id, location_id)
+
+
+@router.post("/{session_id}/turn")
+async def take_turn(request, session_id: str, turn: TurnRequest):
+    """
+    Run a whole turn - discoveries, conversations, moves, nights - in one request.
+
+    Not all-or-nothing: actions between conversations commit together, and each
+    conversation commits on its own. When an action fails, its stretch is rolled
+    back and the turn stops; `results` holds what was committed before it and
+    `failed` names the action, so a retry resumes from `failed.index`.
+    """
+    return await _act(run_turn, session_id, turn.actions)
+
+
+@router.get("/{session_id}/map/impacts")
+async def map_impacts(request, session_id: str, x0: float = 0.0, y0: float = 0.0,
+                x1: float = 1.0, y1: float = 1.0, kind: Optional[str] = None):
+    """Tears, burns and blood inside a viewport of the map (coordinates 0-1)."""
+    x0, x1 = sorted((max(0.0, min(1.0, x0)), max(0.0, min(1.0, x1))))
+    y0, y1 = sorted((max(0.0, min(1.0, y0)), max(0.0, min(1.0, y1))))
     
+    grid = await sync_to_async(spatial.get_grid)(session_id)
+    impacts = await offload(grid.query, x0, y0, x1, y1, kinds=[kind] if kind else None)
     return {
-        "night_count": session.night_count,
-        "world_entropy": session.world_entropy,
-        "message": f"Night {session.night_count} falls. Everything degrades a little more."
+        "viewport": [x0, y0, x1, y1],
+        "count": len(impacts),
+        "impacts": [
+            {"id": impact_id, "kind": impact_kind, "x": x, "y": y, "night": night}
+            for impact_id, impact_kind, x, y, night in impacts
+        ],
     }
 
 
-@router.post("/{session_id}/discover")
-def add_discovery(request, session_id: str, content: str, knowledge_type: str = "whisper"):
-    """Add a new piece of knowledge."""
-    session = GameSession.objects.get(id=session_id)
+@router.get("/{session_id}/map/tiles/{z}/{x}/{y}")
+async def map_tile(request, session_id: str, z: int, x: int, y: int):
+    """A pre-aggregated heat tile of the session's map impacts."""
+    if not 0 <= z < settings.SPATIAL_CONFIG.get('ZOOM_LEVELS', 4) or not (0 <= x < 1 << z and 0 <= y < 1 << z):
+        raise Http404("No such tile")
+    tile = await sync_to_async(spatial.heat_tile)(session_id, z, x, y)
+    return await offload(spatial.render_tile, tile)
+
+
+@router.get("/{session_id}/events")
+async def list_events(request, session_id: str, since: int = 0, limit: int = 500):
+    """The session's event log after a given sequence, for replay and analytics."""
+    if not await GameSession.objects.filter(id=session_id).aexists():
+        raise Http404("No such session")
     
-    knowledge = Knowledge.objects.create(
-        session=session,
-        knowledge_type=knowledge_type,
-        content=content,
-        night_discovered=session.night_count,
-        discovered_at=session.current_location,
+    events = (
+        GameEvent.objects.filter(session_id=session_id, sequence__gt=since)
+        .order_by('sequence')
+        .values('sequence', 'event_type', 'payload', 'created_at')[:min(limit, 5000)]
     )
-    
-    weight = knowledge.calculate_weight()
-    session.add_weight(weight)
-    
     return {
-        "knowledge_id": str(knowledge.id),
-        "weight_added": weight,
-        "total_weight": session.total_weight,
-        "movement_speed": session.movement_speed,
-        "message": f"The weight of knowledge grows heavier. Speed: {session.movement_speed:.2f}"
-    }
\ No newline at end of file
+        "session_id": session_id,
+        "events": [
+            {**event, 'created_at': event['created_at'].isoformat()}
+            async for event in events
+        ],
+    }
+
+
+@router.get("/{session_id}/replay")
+async def replay(request, session_id: str, at: Optional[int] = None):
+    """Session state rebuilt from the event log, now or as of an earlier event."""
+    state = await sync_to_async(rebuild_state)(session_id, until=at)
+    if state is None:
+        raise Http404("No such session")
+    return state
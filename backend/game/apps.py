@@ -0,0 +1,15 @@
+from django.apps import AppConfig
+
+
+class GameConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'game'
+
+    def ready(self):
+        # Push discoveries and broken treaties to connected clients
+        from . import broadcast
+        broadcast.connect_signals()
+        
+        # Index map impacts as discoveries land
+        from . import spatial
+        spatial.connect_signals()
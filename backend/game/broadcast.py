@@ -0,0 +1,128 @@
+"""
+Broadcasting degradation to connected clients.
+Every tear, every broken oath, told to all who watch.
+
+Events are small dicts with short keys, sent to per-world and per-session
+channel-layer groups once the transaction that caused them commits:
+    k  coalescing key - a later event with the same key replaces an earlier one
+    t  event type (advance, discover, move, discovery, treaty_broken)
+    s  session id, when the event belongs to one
+    v  session version, when the event came from the log
+    d  the changed data
+"""
+
+import logging
+from typing import Dict, Iterable
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.db.models.signals import post_save, pre_save
+
+logger = logging.getLogger(__name__)
+
+# Which logged events are worth pushing; conversations stay between witness and character
+BROADCAST_EVENTS = ('advance', 'discover', 'move')
+
+
+def world_group(world_id) -> str:
+    return f"world.{world_id}"
+
+
+def session_group(session_id) -> str:
+    return f"session.{session_id}"
+
+
+def publish(groups: Iterable[str], event: Dict):
+    """Send an event to channel-layer groups after the current transaction commits."""
+    layer = get_channel_layer()
+    if layer is None:
+        return
+    groups = list(groups)
+
+    def send():
+        for group in groups:
+            try:
+                async_to_sync(layer.group_send)(
+                    group, {'type': 'degradation.event', 'group': group, 'event': event},
+                )
+            except Exception:
+                # A missed push is recoverable through /changes; a failed request is not
+                logger.exception("Broadcast to %s failed", group)
+
+    transaction.on_commit(send)
+
+
+def session_event(session, event, changes: Dict):
+    """Push a logged session event to the session and its world."""
+    if event.event_type not in BROADCAST_EVENTS:
+        return
+
+    session_id = str(session.id)
+    if 'current_location_id' in changes and changes['current_location_id']:
+        changes = {**changes, 'current_location_id': str(changes['current_location_id'])}
+
+    # Night ticks and moves supersede each other; discoveries each stand alone
+    key = f"{event.event_type}:{session_id}"
+    if event.event_type == 'discover':
+        key = f"{key}:{event.sequence}"
+
+    publish(
+        [session_group(session_id), world_group(session.world_id)],
+        {'k': key, 't': event.event_type, 's': session_id, 'v': event.sequence, 'd': changes},
+    )
+
+
+def treaty_broken(world_id, treaty_id, session_id=None):
+    """Push a broken treaty - to one witness if only their copy broke, to the world otherwise."""
+    event = {'k': f"treaty_broken:{treaty_id}", 't': 'treaty_broken', 'd': {'treaty_id': str(treaty_id)}}
+    if session_id is not None:
+        event['s'] = str(session_id)
+        publish([session_group(session_id)], event)
+    else:
+        publish([world_group(world_id)], event)
+
+
+# Signal handlers - world-level events that happen outside the event log
+
+def _discovery_saved(sender, instance, created, **kwargs):
+    if not created:
+        return
+    session_id = str(instance.session_id)
+    world_id = sender.objects.filter(id=instance.id).values_list('session__world_id', flat=True).first()
+    publish(
+        [session_group(session_id), world_group(world_id)],
+        {
+            'k': f"discovery:{instance.id}",
+            't': 'discovery',
+            's': session_id,
+            'v': instance.version,
+            'd': {
+                'id': str(instance.id),
+                'discovery_type': instance.discovery_type,
+                'map_impact': instance.map_impact,
+                'impact_location': instance.impact_location,
+            },
+        },
+    )
+
+
+def _treaty_saving(sender, instance, **kwargs):
+    # Only look up the old row when this save could be the one that breaks it
+    instance._was_broken = (
+        not instance.is_broken
+        or instance._state.adding
+        or sender.objects.filter(pk=instance.pk, is_broken=True).exists()
+    )
+
+
+def _treaty_saved(sender, instance, **kwargs):
+    if instance.is_broken and not getattr(instance, '_was_broken', True):
+        treaty_broken(instance.world_id, instance.id)
+
+
+def connect_signals():
+    """Push discoveries and treaty breaks as they are saved."""
+    post_save.connect(_discovery_saved, sender='game.Discovery', dispatch_uid='broadcast_discovery_saved')
+    pre_save.connect(_treaty_saving, sender='worlds.Treaty', dispatch_uid='broadcast_treaty_saving')
+    post_save.connect(_treaty_saved, sender='worlds.Treaty', dispatch_uid='broadcast_treaty_saved')
@@ -0,0 +1,149 @@
+"""
+Websocket consumers for watching a world, or one witness, decay.
+
+Each socket joins channel-layer groups and buffers the events sent to them.
+Bursts are coalesced - an event replaces an earlier one with the same key - and
+flushed as a single frame after BROADCAST_CONFIG['COALESCE_MS'], or sooner once
+MAX_BATCH events are waiting. Frames are msgpack binary when msgpack is
+installed, unless the client connects with ?format=json.
+"""
+
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs
+import asyncio
+import json
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
+from django.core.exceptions import ValidationError
+
+from worlds.models import World
+from .broadcast import world_group, session_group
+from .models import GameSession
+
+try:
+    import msgpack
+except ImportError:  # JSON frames only
+    msgpack = None
+
+
+def _config(name: str, default):
+    return getattr(settings, 'BROADCAST_CONFIG', {}).get(name, default)
+
+
+def encode(batch: List[Dict], binary: bool) -> Dict:
+    """A frame for websocket send(): msgpack bytes or compact JSON text."""
+    frame = {'b': batch}
+    if binary:
+        return {'bytes_data': msgpack.packb(frame, use_bin_type=True)}
+    return {'text_data': json.dumps(frame, separators=(',', ':'))}
+
+
+class DegradationConsumer(AsyncWebsocketConsumer):
+    """Joins groups, coalesces their events and sends them in batches."""
+
+    async def resolve_groups(self) -> Optional[List[str]]:
+        """The groups this socket watches, or None to refuse it."""
+        raise NotImplementedError
+
+    async def connect(self):
+        self.pending: Dict[str, Dict] = {}
+        self.flush_task = None
+        self.joined: List[str] = []
+
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        requested = query.get('format', [_config('ENCODING', 'msgpack')])[0]
+        self.binary = requested == 'msgpack' and msgpack is not None
+
+        groups = await self.resolve_groups()
+        if not groups:
+            await self.close(code=4404)
+            return
+
+        for group in groups:
+            await self.channel_layer.group_add(group, self.channel_name)
+        self.joined = groups
+        await self.accept()
+
+    async def disconnect(self, code):
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+        for group in self.joined:
+            await self.channel_layer.group_discard(group, self.channel_name)
+
+    def wants(self, message: Dict) -> bool:
+        return True
+
+    async def degradation_event(self, message):
+        """Handler for 'degradation.event' group messages."""
+        if not self.wants(message):
+            return
+        event = message['event']
+        key = event.get('k')
+        self.pending.pop(key, None)  # Re-insert so the batch keeps arrival order
+        self.pending[key] = event
+
+        if len(self.pending) >= _config('MAX_BATCH', 64):
+            await self.flush()
+        elif self.flush_task is None:
+            self.flush_task = asyncio.ensure_future(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(_config('COALESCE_MS', 100) / 1000)
+        self.flush_task = None
+        await self.flush()
+
+    async def flush(self):
+        if self.flush_task is not None and self.flush_task is not asyncio.current_task():
+            self.flush_task.cancel()
+            self.flush_task = None
+        if not self.pending:
+            return
+
+        batch = list(self.pending.values())
+        self.pending = {}
+        await self.send(**encode(batch, self.binary))
+
+    async def receive(self, text_data=None, bytes_data=None):
+        pass  # Watching only; actions go through the REST API
+
+
+class WorldConsumer(DegradationConsumer):
+    """Everything happening to one world, across all its witnesses."""
+
+    async def resolve_groups(self):
+        world_id = self.scope['url_route']['kwargs']['world_id']
+        exists = await database_sync_to_async(_world_exists)(world_id)
+        return [world_group(world_id)] if exists else None
+
+
+class SessionConsumer(DegradationConsumer):
+    """One witness's nights, plus world-wide events such as broken treaties."""
+
+    async def resolve_groups(self):
+        session_id = self.scope['url_route']['kwargs']['session_id']
+        world_id = await database_sync_to_async(_session_world)(session_id)
+        if world_id is None:
+            return None
+        self.world_group = world_group(world_id)
+        return [session_group(session_id), self.world_group]
+
+    def wants(self, message: Dict) -> bool:
+        # From the world group, only events that belong to no single witness
+        return message.get('group') != self.world_group or 's' not in message['event']
+
+
+def _world_exists(world_id) -> bool:
+    try:
+        return World.objects.filter(id=world_id).exists()
+    except ValidationError:
+        return False
+
+
+def _session_world(session_id) -> Optional[str]:
+    try:
+        world_id = GameSession.objects.filter(id=session_id).values_list('world_id', flat=True).first()
+    except ValidationError:
+        return None
+    return str(world_id) if world_id else None
@@ -0,0 +1,196 @@
+"""
+The append-only event log behind every game session.
+Nothing a witness does is forgotten, only folded into what comes after.
+
+Actions append a small GameEvent and update just the GameSession columns they
+change. The session row is a projection of the log: a SessionSnapshot is taken
+every GAME_CONFIG['SNAPSHOT_INTERVAL'] events, and any state can be rebuilt
+from the nearest snapshot plus the events after it.
+
+Payloads use short keys to keep the log compact:
+    advance   {'n': nights}
+    discover  {'w': weight, 'k': knowledge_id, 'm': 'tear'|'burn'|'blood', 'at': where}
+    move      {'to': location_id}
+    converse  {'c': character_id, 'v': conversation_id, 'm': messages_exchanged}
+"""
+
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from endless_nights.caching import invalidate_on_commit, session_namespace
+from worlds.degradation import WorldDegradation, compile_pattern
+from .broadcast import session_event
+from .models import GameSession, GameEvent, SessionSnapshot
+
+
+# The GameSession columns that are projections of the log
+STATE_FIELDS = (
+    'night_count', 'total_weight', 'movement_speed',
+    'world_entropy', 'text_degradation', 'color_loss',
+    'current_location_id', 'map_tears', 'map_burns', 'map_blood',
+)
+
+MAP_FIELDS = {'tear': 'map_tears', 'burn': 'map_burns', 'blood': 'map_blood'}
+
+
+def initial_state() -> Dict:
+    """A session before anything has happened to it."""
+    return {
+        'night_count': 1,
+        'total_weight': 0.0,
+        'movement_speed': 1.0,
+        'world_entropy': 0.0,
+        'text_degradation': 0.0,
+        'color_loss': 0.0,
+        'current_location_id': None,
+        'map_tears': [],
+        'map_burns': [],
+        'map_blood': [],
+    }
+
+
+def _serialize(state: Dict) -> Dict:
+    location_id = state['current_location_id']
+    return {**state, 'current_location_id': str(location_id) if location_id else None}
+
+
+# Reducers - each folds one event into a state dict in place
+
+def _advance(state: Dict, payload: Dict, curves: WorldDegradation):
+    state['night_count'] += payload['n']
+    degraded = curves.session_state(state['night_count'])
+    for field in ('world_entropy', 'text_degradation', 'color_loss'):
+        state[field] = degraded[field]
+
+
+def _discover(state: Dict, payload: Dict, curves: WorldDegradation):
+    state['total_weight'] += payload.get('w', 0)
+    state['movement_speed'] = 1.0 / (1 + (state['total_weight'] * 0.1))
+
+    field = MAP_FIELDS.get(payload.get('m'))
+    if field:
+        state[field] = state[field] + [payload.get('at')]
+
+
+def _move(state: Dict, payload: Dict, curves: WorldDegradation):
+    state['current_location_id'] = payload['to']
+
+
+def _converse(state: Dict, payload: Dict, curves: WorldDegradation):
+    pass  # Conversations change the world, not the session row; kept for history
+
+
+REDUCERS: Dict[str, Callable] = {
+    'advance': _advance,
+    'discover': _discover,
+    'move': _move,
+    'converse': _converse,
+}
+
+
+def apply(state: Dict, event_type: str, payload: Dict, curves: Optional[WorldDegradation] = None) -> Dict:
+    """The state after one event, leaving the given state untouched."""
+    state = dict(state)
+    REDUCERS[event_type](state, payload, curves)
+    return state
+
+
+def _curves_for(session_id) -> WorldDegradation:
+    pattern = GameSession.objects.filter(id=session_id).values_list(
+        'world__degradation_pattern', flat=True
+    ).first()
+    return compile_pattern(pattern)
+
+
+def record(session: GameSession, event_type: str, payload: Dict,
+           curves: Optional[WorldDegradation] = None, rows: Iterable = ()) -> GameEvent:
+    """
+    Append an event and project it onto the session row.
+
+    The row is locked, folded forward and updated in place - only the changed
+    columns are written. The in-memory session is brought up to date. `rows`
+    are Knowledge, Discovery or Message rows the action created; they are
+    stamped with the event's sequence so clients can sync them by version.
+    """
+    if event_type == 'advance' and curves is None:
+        curves = _curves_for(session.id)
+
+    # Inside a turn's transaction this needs no savepoint of its own
+    with transaction.atomic(savepoint=False):
+        row = (
+            GameSession.objects.select_for_update()
+            .filter(id=session.id)
+            .values('version', *STATE_FIELDS)
+            .get()
+        )
+        version = row.pop('version')
+        before = _serialize(row)
+
+        # Sessions older than the log start from a snapshot of their row
+        if version == 0:
+            SessionSnapshot.objects.get_or_create(
+                session_id=session.id, sequence=0, defaults={'state': before},
+            )
+
+        after = apply(before, event_type, payload, curves)
+        changes = {field: after[field] for field in STATE_FIELDS if after[field] != before[field]}
+        sequence = version + 1
+
+        GameSession.objects.filter(id=session.id).update(
+            version=sequence, last_action_at=timezone.now(), **changes,
+        )
+        event = GameEvent.objects.create(
+            session_id=session.id, sequence=sequence, event_type=event_type, payload=payload,
+        )
+
+        stamped = defaultdict(list)
+        for row_instance in rows:
+            stamped[type(row_instance)].append(row_instance.pk)
+            row_instance.version = sequence
+        for model, pks in stamped.items():
+            model.objects.filter(pk__in=pks).update(version=sequence)
+
+        if sequence % settings.GAME_CONFIG.get('SNAPSHOT_INTERVAL', 50) == 0:
+            SessionSnapshot.objects.create(session_id=session.id, sequence=sequence, state=after)
+
+    # update() sends no signals; clients and cached reads learn of the event once it commits
+    transaction.on_commit(lambda: session_event(session, event, changes))
+    invalidate_on_commit(session_namespace(session.id))
+
+    for field in STATE_FIELDS:
+        setattr(session, field, after[field])
+    session.version = sequence
+    return event
+
+
+def rebuild_state(session_id, until: Optional[int] = None) -> Optional[Dict]:
+    """A session's state replayed from its nearest snapshot, optionally as of an earlier event."""
+    snapshots = SessionSnapshot.objects.filter(session_id=session_id)
+    events = GameEvent.objects.filter(session_id=session_id)
+    if until is not None:
+        snapshots = snapshots.filter(sequence__lte=until)
+        events = events.filter(sequence__lte=until)
+
+    snapshot = snapshots.values('sequence', 'state').first()
+    if snapshot is None:
+        if not GameSession.objects.filter(id=session_id).exists():
+            return None
+        snapshot = {'sequence': 0, 'state': initial_state()}
+
+    state = dict(snapshot['state'])
+    sequence = snapshot['sequence']
+    curves = None
+
+    for sequence, event_type, payload in (
+        events.filter(sequence__gt=sequence).order_by('sequence')
+        .values_list('sequence', 'event_type', 'payload')
+    ):
+        if event_type == 'advance' and curves is None:
+            curves = _curves_for(session_id)
+        REDUCERS[event_type](state, payload, curves)
+
+    return {'version': sequence, **state}
@@ -0,0 +1,320 @@
+"""
+Load testing: many virtual witnesses against a running server.
+A crowd wanders the same endless night, and every step is timed.
+
+Each VirtualWitness starts a session, then loops through its scenario - a
+sequence of steps such as discover, converse and advance_night - with a think
+time between requests (exponential around THINK_TIME seconds). Every request
+is recorded under its route template with its latency, status, and the query
+count and DB time from the server's Server-Timing header
+(endless_nights.instrumentation).
+
+LoadTest ramps the witnesses up, runs them for a duration (or a number of
+loops), and reports throughput plus p50/p95/p99, query counts and error rates
+per endpoint. report() is plain JSON so runs can be saved and diffed between
+commits; see `manage.py load_test`.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+import json
+import random
+import re
+import subprocess
+import threading
+import time
+
+from django.conf import settings
+
+# What a witness might say, discover or ask
+WHISPERS = (
+    "The carousel turns without riders",
+    "Someone left a lantern by the gate",
+    "The treaty was signed in salt",
+    "The bells ring one hour late",
+    "A wolf walks the river road at dusk",
+)
+
+QUESTIONS = (
+    "Who are you?",
+    "Where does this road lead?",
+    "What happened here?",
+    "Do you remember the treaty?",
+    "Have you seen the lantern?",
+)
+
+# Steps of one loop; a witness repeats its scenario until the run ends
+SCENARIOS = {
+    'night': ('discover', 'converse', 'advance_night'),
+    'wanderer': ('move', 'discover', 'advance_night'),
+    'talker': ('converse', 'converse', 'advance_night'),
+    'observer': ('state', 'world', 'advance_night'),
+}
+
+SERVER_TIMING_QUERIES = re.compile(r'db;dur=([\d.]+);desc="(\d+) queries"')
+
+
+def _config(name: str, default):
+    return getattr(settings, 'LOAD_TEST_CONFIG', {}).get(name, default)
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Samples:
+    """Every request made during a run, by route; shared by all witnesses."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.queries: Dict[str, List[int]] = defaultdict(list)
+        self.db_ms: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    def add(self, route: str, seconds: float, status: int, timing: Optional[Tuple[float, int]]):
+        with self._lock:
+            self.latencies[route].append(seconds * 1000)
+            self.statuses[route][status] += 1
+            if timing is not None:
+                self.db_ms[route].append(timing[0])
+                self.queries[route].append(timing[1])
+
+    def summary(self, elapsed: float) -> Dict:
+        with self._lock:
+            endpoints = {}
+            for route in sorted(self.latencies):
+                latencies = sorted(self.latencies[route])
+                statuses = self.statuses[route]
+                errors = sum(count for status, count in statuses.items() if not 200 <= status < 400)
+                queries = self.queries[route]
+                endpoints[route] = {
+                    'requests': len(latencies),
+                    'throughput': round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+                    'p50_ms': round(_percentile(latencies, 0.50), 2),
+                    'p95_ms': round(_percentile(latencies, 0.95), 2),
+                    'p99_ms': round(_percentile(latencies, 0.99), 2),
+                    'max_ms': round(latencies[-1], 2),
+                    'mean_queries': round(sum(queries) / len(queries), 2) if queries else None,
+                    'max_queries': max(queries) if queries else None,
+                    'p95_db_ms': round(_percentile(sorted(self.db_ms[route]), 0.95), 2) if queries else None,
+                    'errors': errors,
+                    'error_rate': round(errors / len(latencies), 4),
+                    'statuses': {str(status): count for status, count in sorted(statuses.items())},
+                }
+
+            latencies = sorted(ms for route in self.latencies.values() for ms in route)
+            requests = len(latencies)
+            errors = sum(endpoint['errors'] for endpoint in endpoints.values())
+            return {
+                'totals': {
+                    'requests': requests,
+                    'throughput': round(requests / elapsed, 3) if elapsed else 0.0,
+                    'p50_ms': round(_percentile(latencies, 0.50), 2),
+                    'p95_ms': round(_percentile(latencies, 0.95), 2),
+                    'p99_ms': round(_percentile(latencies, 0.99), 2),
+                    'queries': sum(sum(q) for q in self.queries.values()),
+                    'errors': errors,
+                    'error_rate': round(errors / requests, 4) if requests else 0.0,
+                },
+                'endpoints': endpoints,
+            }
+
+
+class VirtualWitness:
+    """One simulated player: a session, a scenario, and a think time between steps."""
+
+    def __init__(self, index: int, load_test: 'LoadTest'):
+        self.index = index
+        self.test = load_test
+        self.random = random.Random(load_test.seed * 1000 + index)
+        self.session_id = None
+        self.locations: List[str] = []
+        self.characters: List[str] = []
+        self.loops = 0
+
+    def request(self, method: str, route: str, params: Dict = None, **ids) -> Tuple[int, Optional[Dict]]:
+        """Call `route` (a template such as /game/{session_id}/state); returns (status, json)."""
+        url = self.test.url + '/api' + route.format(**ids)
+        if params:
+            url += '?' + urlencode(params)
+        request = Request(url, data=b'' if method == 'POST' else None, method=method)
+
+        started = time.perf_counter()
+        status, body, timing = 0, None, None
+        try:
+            with urlopen(request, timeout=self.test.timeout) as response:
+                status = response.status
+                timing = self._timing(response.headers.get('Server-Timing'))
+                body = json.loads(response.read() or b'null')
+        except HTTPError as exc:
+            status = exc.code
+            timing = self._timing(exc.headers.get('Server-Timing'))
+        except (URLError, OSError, ValueError):
+            status = 0  # Connection refused, timed out, or not JSON
+        self.test.samples.add(f'{method} {route}', time.perf_counter() - started, status, timing)
+        return status, body
+
+    @staticmethod
+    def _timing(header: Optional[str]) -> Optional[Tuple[float, int]]:
+        match = SERVER_TIMING_QUERIES.search(header or '')
+        return (float(match.group(1)), int(match.group(2))) if match else None
+
+    def think(self):
+        if self.test.think_time > 0:
+            self.test.stopping.wait(self.random.expovariate(1 / self.test.think_time))
+
+    def start_session(self) -> bool:
+        status, body = self.request('POST', '/game/start', {
+            'world_id': self.test.world_id, 'witness_name': f'witness-{self.index}',
+        })
+        if status != 200:
+            return False
+        self.session_id = body['session_id']
+
+        self.think()
+        status, world = self.request('GET', '/game/{session_id}/world', session_id=self.session_id)
+        if status == 200:
+            self.locations = [location['id'] for location in world['locations'] if location]
+            self.characters = [character['id'] for character in world['characters'] if character]
+        return True
+
+    # Steps; each makes one or more requests and may think between them
+
+    def state(self):
+        self.request('GET', '/game/{session_id}/state', session_id=self.session_id)
+
+    def world(self):
+        self.request('GET', '/game/{session_id}/world', session_id=self.session_id)
+
+    def move(self):
+        if self.locations:
+            self.request('POST', '/game/{session_id}/move', {
+                'location_id': self.random.choice(self.locations),
+            }, session_id=self.session_id)
+
+    def discover(self):
+        self.request('POST', '/game/{session_id}/discover', {
+            'content': self.random.choice(WHISPERS),
+        }, session_id=self.session_id)
+
+    def converse(self):
+        if not self.characters:
+            return
+        status, body = self.request('POST', '/llm/conversation/start', {
+            'session_id': self.session_id, 'character_id': self.random.choice(self.characters),
+        })
+        if status != 200:
+            return
+        conversation_id = body['conversation_id']
+        for _ in range(self.test.messages):
+            self.think()
+            self.request('POST', '/llm/conversation/{conversation_id}/message', {
+                'content': self.random.choice(QUESTIONS),
+            }, conversation_id=conversation_id)
+        self.request('POST', '/llm/conversation/{conversation_id}/end', conversation_id=conversation_id)
+
+    def advance_night(self):
+        self.request('POST', '/game/{session_id}/advance-night', session_id=self.session_id)
+
+    def run(self):
+        steps = SCENARIOS[self.test.scenario]
+        while not self.test.stopping.is_set():
+            if self.session_id is None and not self.start_session():
+                self.think()
+                continue
+            for step in steps:
+                if self.test.stopping.is_set():
+                    return
+                self.think()
+                getattr(self, step)()
+            self.loops += 1
+            if self.test.loops and self.loops >= self.test.loops:
+                return
+
+
+class LoadTest:
+    """N virtual witnesses against the server at `url`, ramped up over `ramp_up` seconds."""
+
+    def __init__(self, url: str, world_id: str, witnesses: int = None, scenario: str = None,
+                 duration: float = None, loops: int = None, ramp_up: float = None,
+                 think_time: float = None, messages: int = None, timeout: float = None, seed: int = None):
+        if (scenario or _config('SCENARIO', 'night')) not in SCENARIOS:
+            raise ValueError(f"Unknown scenario {scenario!r}; choose from {', '.join(SCENARIOS)}")
+        self.url = url.rstrip('/')
+        self.world_id = world_id
+        self.witnesses = witnesses or _config('WITNESSES', 10)
+        self.scenario = scenario or _config('SCENARIO', 'night')
+        self.duration = duration if duration is not None else _config('DURATION', 60.0)
+        self.loops = loops or 0  # 0: loop until the duration is up
+        self.ramp_up = ramp_up if ramp_up is not None else _config('RAMP_UP', 5.0)
+        self.think_time = think_time if think_time is not None else _config('THINK_TIME', 1.0)
+        self.messages = messages if messages is not None else _config('MESSAGES', 2)
+        self.timeout = timeout or _config('TIMEOUT', 30.0)
+        self.seed = seed if seed is not None else _config('SEED', 0)
+        self.samples = Samples()
+        self.stopping = threading.Event()
+        self.elapsed = 0.0
+        self.started_at = None
+
+    def run(self) -> Dict:
+        self.started_at = datetime.now(timezone.utc)
+        population = [VirtualWitness(index, self) for index in range(self.witnesses)]
+        threads = [
+            threading.Thread(target=witness.run, name=f'witness-{witness.index}', daemon=True)
+            for witness in population
+        ]
+
+        started = time.perf_counter()
+        for index, thread in enumerate(threads):
+            if self.ramp_up and index:
+                self.stopping.wait(self.ramp_up / self.witnesses)
+            thread.start()
+
+        deadline = started + self.duration if self.duration else None
+        for thread in threads:
+            remaining = None if deadline is None else max(0.0, deadline - time.perf_counter())
+            thread.join(remaining)
+        self.stopping.set()
+        for thread in threads:
+            thread.join(self.timeout)
+        self.elapsed = time.perf_counter() - started
+
+        return self.report(population)
+
+    def report(self, population: List[VirtualWitness] = ()) -> Dict:
+        return {
+            'meta': {
+                'commit': _commit(),
+                'started_at': self.started_at.isoformat() if self.started_at else None,
+                'url': self.url,
+                'world_id': self.world_id,
+                'scenario': self.scenario,
+                'witnesses': self.witnesses,
+                'duration_s': round(self.elapsed, 3),
+                'ramp_up_s': self.ramp_up,
+                'think_time_s': self.think_time,
+                'messages': self.messages,
+                'seed': self.seed,
+                'sessions': sum(1 for witness in population if witness.session_id),
+                'loops': sum(witness.loops for witness in population),
+            },
+            **self.samples.summary(self.elapsed),
+        }
+
+
+def _commit() -> Optional[str]:
+    """The checked-out commit, so saved runs can be told apart."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, timeout=5, cwd=settings.BASE_DIR,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
@@ -0,0 +1,89 @@
+"""
+Management command to load test a running server with virtual witnesses.
+How many can walk the night before it buckles?
+"""
+
+from pathlib import Path
+from urllib.request import urlopen
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from game.loadtest import SCENARIOS, LoadTest
+
+
+class Command(BaseCommand):
+    help = 'Simulate concurrent witnesses against a running server and report latency per endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help="Server to test")
+        parser.add_argument('--world', help="World id or name (default: the first listed)")
+        parser.add_argument('--witnesses', type=int, default=None, help="Concurrent virtual witnesses")
+        parser.add_argument('--scenario', choices=sorted(SCENARIOS), default=None)
+        parser.add_argument('--duration', type=float, default=None, help="Seconds to run (0: until --loops)")
+        parser.add_argument('--loops', type=int, default=None, help="Scenario loops per witness")
+        parser.add_argument('--ramp-up', type=float, default=None, help="Seconds over which witnesses join")
+        parser.add_argument('--think-time', type=float, default=None, help="Mean seconds between requests")
+        parser.add_argument('--messages', type=int, default=None, help="Messages per conversation")
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--output', help="Write the JSON report here")
+
+    def handle(self, *args, **options):
+        if options['duration'] == 0 and not options['loops']:
+            raise CommandError("--duration 0 needs --loops, or the run never ends")
+
+        url = options['url'].rstrip('/')
+        world_id = self._world(url, options['world'])
+
+        load_test = LoadTest(
+            url, world_id,
+            witnesses=options['witnesses'],
+            scenario=options['scenario'],
+            duration=options['duration'],
+            loops=options['loops'],
+            ramp_up=options['ramp_up'],
+            think_time=options['think_time'],
+            messages=options['messages'],
+            seed=options['seed'],
+        )
+        self.stdout.write(
+            f"{load_test.witnesses} witnesses, scenario '{load_test.scenario}', "
+            f"{load_test.duration or 'unlimited'}s against {url}..."
+        )
+        report = load_test.run()
+        self._print(report)
+
+        if options['output']:
+            path = Path(options['output'])
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(report, indent=2))
+            self.stdout.write(self.style.SUCCESS(f"Report written to {path}"))
+
+    def _world(self, url: str, wanted: str) -> str:
+        try:
+            with urlopen(f"{url}/api/worlds/list", timeout=10) as response:
+                worlds = json.loads(response.read())
+        except OSError as exc:
+            raise CommandError(f"Cannot reach {url}: {exc}")
+
+        for world in worlds:
+            if wanted in (None, world['id'], world['name']):
+                return world['id']
+        raise CommandError(f"No world {wanted!r} on {url}" if wanted else f"No worlds on {url}; load one first")
+
+    def _print(self, report: dict):
+        totals = report['totals']
+        self.stdout.write(
+            f"\n{totals['requests']} requests in {report['meta']['duration_s']}s "
+            f"({totals['throughput']}/s), p50 {totals['p50_ms']}ms, p95 {totals['p95_ms']}ms, "
+            f"p99 {totals['p99_ms']}ms, {totals['errors']} errors\n"
+        )
+        self.stdout.write(
+            f"{'endpoint':<52} {'reqs':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'queries':>8} {'errors':>7}"
+        )
+        for route, endpoint in report['endpoints'].items():
+            queries = '-' if endpoint['mean_queries'] is None else endpoint['mean_queries']
+            self.stdout.write(
+                f"{route:<52} {endpoint['requests']:>6} {endpoint['p50_ms']:>8} {endpoint['p95_ms']:>8} "
+                f"{endpoint['p99_ms']:>8} {queries:>8} {endpoint['error_rate']:>7.1%}"
+            )
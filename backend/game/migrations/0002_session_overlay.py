@@ -0,0 +1,34 @@
+# Generated by Django 4.2.11 on 2026-10-19 06:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SessionOverlay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('element_type', models.CharField(choices=[('location', 'Location'), ('character', 'Character'), ('object', 'Object'), ('treaty', 'Treaty')], max_length=20)),
+                ('element_id', models.UUIDField()),
+                ('integrity', models.FloatField(blank=True, null=True)),
+                ('color_saturation', models.FloatField(blank=True, null=True)),
+                ('clarity', models.FloatField(blank=True, null=True)),
+                ('memory_intact', models.FloatField(blank=True, null=True)),
+                ('condition', models.FloatField(blank=True, null=True)),
+                ('strength', models.FloatField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='overlays', to='game.gamesession')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='sessionoverlay',
+            constraint=models.UniqueConstraint(fields=('session', 'element_type', 'element_id'), name='unique_session_overlay'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.11 on 2026-10-19 06:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0002_session_overlay'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gamesession',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='SessionSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.PositiveIntegerField()),
+                ('state', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='game.gamesession')),
+            ],
+            options={
+                'ordering': ['session', '-sequence'],
+            },
+        ),
+        migrations.CreateModel(
+            name='GameEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.PositiveIntegerField()),
+                ('event_type', models.CharField(choices=[('discover', 'Discover'), ('advance', 'Advance Night'), ('converse', 'Converse'), ('move', 'Move')], max_length=20)),
+                ('payload', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='game.gamesession')),
+            ],
+            options={
+                'ordering': ['session', 'sequence'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='sessionsnapshot',
+            constraint=models.UniqueConstraint(fields=('session', 'sequence'), name='unique_session_snapshot'),
+        ),
+        migrations.AddConstraint(
+            model_name='gameevent',
+            constraint=models.UniqueConstraint(fields=('session', 'sequence'), name='unique_session_event'),
+        ),
+    ]
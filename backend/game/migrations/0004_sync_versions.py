@@ -0,0 +1,40 @@
+# Generated by Django 4.2.11 on 2026-10-19 06:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0003_session_event_log'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discovery',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='knowledge',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='discovery',
+            index=models.Index(fields=['session', 'version'], name='game_discov_session_133350_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='knowledge',
+            index=models.Index(fields=['session', 'version'], name='game_knowle_session_a988d0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['conversation', 'version'], name='game_messag_convers_df134f_idx'),
+        ),
+    ]
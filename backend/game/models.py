@@ -5,6 +5,8 @@ Where witnesses carry the weight of knowledge through degrading worlds.
 
 from django.db import models
 from django.contrib.auth.models import User
+import random
+import re
 import uuid
 from datetime import datetime
 
@@ -46,22 +48,29 @@ class GameSession(models.Model):
     map_burns = models.JSONField(default=list)  # Locations of burns
     map_blood = models.JSONField(default=list)  # Locations of blood
     
+    # Sequence of the last GameEvent; the columns above are its projection
+    version = models.PositiveIntegerField(default=0)
+    
     class Meta:
         ordering = ['-last_action_at']
     
-    def advance_night(self):
-        """The night continues, everything degrades."""
-        self.night_count += 1
-        self.world_entropy = min(1.0, self.world_entropy + 0.01)
-        self.text_degradation = min(1.0, self.text_degradation + 0.02)
-        self.color_loss = min(1.0, self.color_loss + 0.015)
-        self.save()
+    def advance_night(self, nights=1, curves=None):
+        """The night continues, everything degrades - any number of nights in one event."""
+        from .events import record
+        return record(self, 'advance', {'n': nights}, curves=curves)
     
-    def add_weight(self, amount):
+    def add_weight(self, amount, knowledge=None):
         """Knowledge has physical weight."""
-        self.total_weight += amount
-        self.movement_speed = 1.0 / (1 + (self.total_weight * 0.1))
-        self.save()
+        from .events import record
+        payload = {'w': amount}
+        if knowledge is not None:
+            payload['k'] = str(knowledge.id)
+        return record(self, 'discover', payload, rows=[knowledge] if knowledge is not None else ())
+    
+    def move_to(self, location_id):
+        """The witness walks on."""
+        from .events import record
+        return record(self, 'move', {'to': str(location_id)})
     
     def __str__(self):
         return f"{self.witness_name} in {self.world.name} (Night {self.night_count})"
@@ -101,9 +110,13 @@ class Knowledge(models.Model):
     discovered_at = models.ForeignKey('worlds.Location', on_delete=models.SET_NULL, null=True)
     discovered_time = models.DateTimeField(auto_now_add=True)
     night_discovered = models.IntegerField(default=1)
+    version = models.PositiveIntegerField(default=0)  # Session version that added it
     
     class Meta:
         ordering = ['-discovered_time']
+        indexes = [
+            models.Index(fields=['session', 'version']),
+        ]
     
     def calculate_weight(self):
         """Calculate the true weight of this knowledge."""
@@ -151,6 +164,28 @@ class Conversation(models.Model):
         return f"Conversation with {self.character.name} (Night {self.night_occurred})"
 
 
+def degrade_text(text, level):
+    """Text as it reaches the witness at a degradation level; pieces of a stream degrade alike."""
+    if level < 0.1:
+        return text
+    elif level < 0.3:
+        # Remove adjectives
+        return re.sub(r'\b(very|quite|rather|really|extremely)\b', '', text)
+    elif level < 0.5:
+        # Start losing vowels
+        return ''.join(
+            c if random.random() > level or c not in 'aeiou' else '·' 
+            for c in text
+        )
+    elif level < 0.7:
+        # Fragment into pieces
+        words = text.split()
+        return ' '.join(w[:len(w)//2] + '...' for w in words)
+    else:
+        # Only shadows remain
+        return '█' * (len(text) // 3)
+
+
 class Message(models.Model):
     """A single message in a conversation."""
     
@@ -176,36 +211,17 @@ class Message(models.Model):
     knowledge_gained = models.ForeignKey(Knowledge, on_delete=models.SET_NULL, null=True, blank=True)
     
     sent_at = models.DateTimeField(auto_now_add=True)
+    version = models.PositiveIntegerField(default=0)  # Session version that added it
     
     class Meta:
         ordering = ['sent_at']
+        indexes = [
+            models.Index(fields=['conversation', 'version']),
+        ]
     
     def degrade_text(self, level):
         """Apply degradation to the message text."""
-        import re
-        import random
-        
-        text = self.original_content
-        
-        if level < 0.1:
-            self.degraded_content = text
-        elif level < 0.3:
-            # Remove adjectives
-            self.degraded_content = re.sub(r'\b(very|quite|rather|really|extremely)\b', '', text)
-        elif level < 0.5:
-            # Start losing vowels
-            self.degraded_content = ''.join(
-                c if random.random() > level or c not in 'aeiou' else '·' 
-                for c in text
-            )
-        elif level < 0.7:
-            # Fragment into pieces
-            words = text.split()
-            self.degraded_content = ' '.join(w[:len(w)//2] + '...' for w in words)
-        else:
-            # Only shadows remain
-            self.degraded_content = '█' * (len(text) // 3)
-        
+        self.degraded_content = degrade_text(self.original_content, level)
         self.degradation_level = level
         self.save()
     
@@ -249,9 +265,100 @@ class Discovery(models.Model):
     # When
     discovered_at = models.DateTimeField(auto_now_add=True)
     night_discovered = models.IntegerField()
+    version = models.PositiveIntegerField(default=0)  # Session version that added it
     
     class Meta:
         ordering = ['-discovered_at']
+        indexes = [
+            models.Index(fields=['session', 'version']),
+        ]
+    
+    def __str__(self):
+        return f"{self.discovery_type}: {self.description[:50]}..."
+
+class SessionOverlay(models.Model):
+    """
+    What one witness's nights have done to a world element.
+    Only the degraded values are stored; the shared world stays pristine.
+    """
+    
+    session = models.ForeignKey(GameSession, on_delete=models.CASCADE, related_name='overlays')
+    element_type = models.CharField(
+        max_length=20,
+        choices=[
+            ('location', 'Location'),
+            ('character', 'Character'),
+            ('object', 'Object'),
+            ('treaty', 'Treaty'),
+        ]
+    )
+    element_id = models.UUIDField()
+    
+    # Sparse deltas - null means "as the world has it"
+    integrity = models.FloatField(null=True, blank=True)
+    color_saturation = models.FloatField(null=True, blank=True)
+    clarity = models.FloatField(null=True, blank=True)
+    memory_intact = models.FloatField(null=True, blank=True)
+    condition = models.FloatField(null=True, blank=True)
+    strength = models.FloatField(null=True, blank=True)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['session', 'element_type', 'element_id'],
+                name='unique_session_overlay',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.element_type} {self.element_id} as seen by {self.session_id}"
+
+
+class GameEvent(models.Model):
+    """
+    One thing that happened to a witness, in the order it happened.
+    The log is append-only; a session's columns are a projection of it.
+    """
+    
+    session = models.ForeignKey(GameSession, on_delete=models.CASCADE, related_name='events')
+    sequence = models.PositiveIntegerField()
+    event_type = models.CharField(
+        max_length=20,
+        choices=[
+            ('discover', 'Discover'),
+            ('advance', 'Advance Night'),
+            ('converse', 'Converse'),
+            ('move', 'Move'),
+        ]
+    )
+    payload = models.JSONField(default=dict)  # Short keys; see game.events
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['session', 'sequence']
+        constraints = [
+            models.UniqueConstraint(fields=['session', 'sequence'], name='unique_session_event'),
+        ]
+    
+    def __str__(self):
+        return f"{self.event_type} #{self.sequence} ({self.session_id})"
+
+
+class SessionSnapshot(models.Model):
+    """A session's projected state as of one event, so replays start close to the end."""
+    
+    session = models.ForeignKey(GameSession, on_delete=models.CASCADE, related_name='snapshots')
+    sequence = models.PositiveIntegerField()
+    state = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['session', '-sequence']
+        constraints = [
+            models.UniqueConstraint(fields=['session', 'sequence'], name='unique_session_snapshot'),
+        ]
     
     def __str__(self):
-        return f"{self.discovery_type}: {self.description[:50]}..."
\ No newline at end of file
+        return f"Snapshot #{self.sequence} ({self.session_id})"
@@ -0,0 +1,237 @@
+"""
+Copy-on-write degradation for game sessions.
+Each witness wears down their own copy of the world; the original stays whole.
+
+The shared Location/Character/Object/Treaty rows are never written by the
+game loop. Degradation is stored per (session, element) in SessionOverlay and
+layered over the pristine world snapshot on read.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+from django.utils import timezone
+
+from endless_nights.caching import invalidate_on_commit, session_namespace
+from worlds.degradation import WorldDegradation, compile_pattern
+from worlds.models import Object, Treaty
+from worlds.snapshot import get_snapshot
+from .broadcast import treaty_broken
+from .models import SessionOverlay
+
+
+# Which columns each element type may carry in an overlay
+OVERLAY_FIELDS = {
+    'location': ('integrity', 'color_saturation', 'clarity'),
+    'character': ('memory_intact',),
+    'object': ('condition',),
+    'treaty': ('strength',),
+}
+
+ALL_OVERLAY_FIELDS = tuple(sorted({f for fields in OVERLAY_FIELDS.values() for f in fields}))
+
+
+def load_overlay(session_id) -> Dict[Tuple[str, str], Dict[str, float]]:
+    """Every delta a session has made, keyed by (element_type, element_id)."""
+    rows = SessionOverlay.objects.filter(session_id=session_id).values_list(
+        'element_type', 'element_id', *ALL_OVERLAY_FIELDS
+    )
+
+    overlay = {}
+    for element_type, element_id, *values in rows:
+        overlay[(element_type, str(element_id))] = {
+            field: value
+            for field, value in zip(ALL_OVERLAY_FIELDS, values)
+            if value is not None
+        }
+    return overlay
+
+
+def merge(base: Optional[Dict], overlay: Dict, element_type: str) -> Optional[Dict]:
+    """Layer a session's deltas over a pristine element dict."""
+    if base is None:
+        return None
+    delta = overlay.get((element_type, str(base['id'])))
+    return {**base, **delta} if delta else base
+
+
+def merged_world(session) -> Dict:
+    """The world as this session's witness sees it: snapshot plus overlay."""
+    snapshot = get_snapshot(session.world_id)
+    if snapshot is None:
+        return {'locations': [], 'characters': []}
+
+    overlay = load_overlay(session.id)
+    return {
+        'locations': [
+            merge(snapshot.location(loc_id), overlay, 'location')
+            for loc_id in snapshot.location_ids
+        ],
+        'characters': [
+            merge(snapshot.character(char_id), overlay, 'character')
+            for char_id in snapshot.character_ids
+        ],
+    }
+
+
+def _write(session, element_type: str, element_id, values: Dict[str, float]):
+    """Upsert one overlay row in a single statement."""
+    _write_all(session, [(element_type, element_id, values)])
+
+
+def _write_all(session, entries: List[Tuple[str, str, Dict[str, float]]]):
+    """Upsert (element_type, element_id, values) overlay rows in a single statement."""
+    if not entries:
+        return
+    now = timezone.now()
+    SessionOverlay.objects.bulk_create(
+        [
+            SessionOverlay(
+                session_id=session.id,
+                element_type=element_type,
+                element_id=element_id,
+                updated_at=now,
+                **values,
+            )
+            for element_type, element_id, values in entries
+        ],
+        update_conflicts=True,
+        unique_fields=['session', 'element_type', 'element_id'],
+        # Each row only ever carries its own type's columns; the rest stay null
+        update_fields=sorted({field for _, _, values in entries for field in values}) + ['updated_at'],
+    )
+    # bulk_create sends no signals, so cached session reads are invalidated here, once committed
+    invalidate_on_commit(session_namespace(session.id))
+
+
+def element_state(session, element_type: str, element_id, snapshot=None) -> Optional[Dict]:
+    """An element's state for this session, read without touching its row."""
+    delta = (
+        SessionOverlay.objects
+        .filter(session_id=session.id, element_type=element_type, element_id=element_id)
+        .values(*OVERLAY_FIELDS[element_type])
+        .first()
+    ) or {}
+
+    if element_type in ('location', 'character'):
+        snapshot = snapshot or get_snapshot(session.world_id)
+        base = None
+        if snapshot is not None:
+            getter = snapshot.location if element_type == 'location' else snapshot.character
+            base = getter(element_id)
+    else:
+        model = Object if element_type == 'object' else Treaty
+        base = model.objects.filter(id=element_id, world_id=session.world_id).values(
+            'id', *OVERLAY_FIELDS[element_type]
+        ).first()
+
+    if base is None:
+        return None
+    return {**base, **{field: value for field, value in delta.items() if value is not None}}
+
+
+def _weakened(session, element_type: str, element_id, before: Dict, values: Dict) -> Dict:
+    """The element after its new values, telling the witness if a treaty just broke."""
+    result = {**before, **values}
+    if element_type == 'treaty':
+        result['is_broken'] = values['strength'] == 0
+        if result['is_broken'] and before['strength'] > 0:
+            treaty_broken(session.world_id, element_id, session_id=session.id)
+    return result
+
+
+def decay(session, element_type: str, element_id, losses: Dict[str, float], snapshot=None) -> Optional[Dict]:
+    """Subtract per-field losses from this session's copy of an element."""
+    state = element_state(session, element_type, element_id, snapshot)
+    if state is None:
+        return None
+
+    values = {field: max(0, state[field] - loss) for field, loss in losses.items()}
+    _write(session, element_type, element_id, values)
+    return _weakened(session, element_type, element_id, state, values)
+
+
+def decay_over_nights(session, element_type: str, element_id, from_night: int, nights: float,
+                      curves: Optional[WorldDegradation] = None, snapshot=None) -> Optional[Dict]:
+    """Apply the world's degradation curves for a stretch of nights (or part of one) in one write."""
+    if curves is None:
+        snapshot = snapshot or get_snapshot(session.world_id)
+        curves = compile_pattern(snapshot.degradation_pattern if snapshot else None)
+    losses = curves.element_deltas(element_type, from_night, nights)
+    return decay(session, element_type, element_id, losses, snapshot)
+
+
+def elements_in_play(session, snapshot, overlay: Dict) -> List[Tuple[str, str]]:
+    """
+    What the nights wear down for this witness: the location they stand in,
+    the characters, objects and treaties there, and everything their copy of
+    the world has already worn.
+    """
+    elements = dict.fromkeys(overlay)
+    here = session.current_location_id
+    if here:
+        characters = snapshot.characters_at(here) if snapshot else []
+        elements.setdefault(('location', str(here)))
+        for character_id in characters:
+            elements.setdefault(('character', character_id))
+        for object_id in Object.objects.filter(world_id=session.world_id, location_id=here).values_list('id', flat=True):
+            elements.setdefault(('object', str(object_id)))
+        if characters:
+            treaties = (
+                Treaty.objects.filter(world_id=session.world_id, parties__id__in=characters)
+                .values_list('id', flat=True).distinct()
+            )
+            for treaty_id in treaties:
+                elements.setdefault(('treaty', str(treaty_id)))
+    return list(elements)
+
+
+def _bases(session, elements: List[Tuple[str, str]], snapshot) -> Dict[Tuple[str, str], Dict]:
+    """Pristine state of each element: locations and characters from the snapshot, the rest in a query per type."""
+    bases = {}
+    wanted = {'object': [], 'treaty': []}
+    for element_type, element_id in elements:
+        if element_type in wanted:
+            wanted[element_type].append(element_id)
+        elif snapshot is not None:
+            getter = snapshot.location if element_type == 'location' else snapshot.character
+            bases[(element_type, element_id)] = getter(element_id)
+
+    for element_type, ids in wanted.items():
+        if ids:
+            model = Object if element_type == 'object' else Treaty
+            for row in model.objects.filter(id__in=ids, world_id=session.world_id).values(
+                'id', *OVERLAY_FIELDS[element_type]
+            ):
+                bases[(element_type, str(row['id']))] = row
+    return bases
+
+
+def decay_night(session, from_night: int, nights: int,
+                curves: Optional[WorldDegradation] = None, snapshot=None) -> int:
+    """
+    Wear down everything in play (see elements_in_play) by the world's curves
+    for a stretch of nights, in one write; returns how many elements decayed.
+    """
+    snapshot = snapshot or get_snapshot(session.world_id)
+    if curves is None:
+        curves = compile_pattern(snapshot.degradation_pattern if snapshot else None)
+
+    overlay = load_overlay(session.id)
+    elements = elements_in_play(session, snapshot, overlay)
+    bases = _bases(session, elements, snapshot)
+    losses = {element_type: curves.element_deltas(element_type, from_night, nights) for element_type in OVERLAY_FIELDS}
+
+    entries = []
+    weakened = []
+    for element_type, element_id in elements:
+        state = merge(bases.get((element_type, element_id)), overlay, element_type)
+        if state is None:
+            continue
+        values = {field: max(0, state[field] - loss) for field, loss in losses[element_type].items()}
+        entries.append((element_type, element_id, values))
+        weakened.append((element_type, element_id, state, values))
+
+    _write_all(session, entries)
+    for element_type, element_id, state, values in weakened:
+        _weakened(session, element_type, element_id, state, values)
+    return len(entries)
@@ -0,0 +1,12 @@
+"""
+Websocket routes for watching worlds and sessions.
+"""
+
+from django.urls import path
+
+from . import consumers
+
+websocket_urlpatterns = [
+    path('ws/worlds/<str:world_id>/', consumers.WorldConsumer.as_asgi()),
+    path('ws/sessions/<str:session_id>/', consumers.SessionConsumer.as_asgi()),
+]
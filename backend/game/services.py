@@ -0,0 +1,169 @@
+"""
+Game actions, independent of how they are requested.
+One endpoint or one turn of many - the night treats them the same.
+
+Each action takes a TurnContext, which carries the session and the world
+context it needs (degradation curves, snapshot, conversations and characters
+touched so far). Single-action endpoints build a context per request; the
+/turn endpoint builds one and runs every action against it.
+"""
+
+from typing import Dict, Optional
+
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+
+from llm import pregen
+from worlds.degradation import WorldDegradation, compile_pattern
+from worlds.models import Character
+from worlds.snapshot import WorldSnapshot, get_snapshot
+from .models import GameSession, Knowledge, Conversation
+from .overlay import decay_night, element_state
+
+
+class TurnContext:
+    """Everything a turn reads more than once, read once."""
+
+    def __init__(self, session: GameSession):
+        self.session = session
+        self.conversations: Dict[str, Conversation] = {}
+        self.last_conversation: Optional[Conversation] = None
+        self._characters: Dict[str, Character] = {}
+        self._curves = None
+        self._snapshot = None
+
+    @classmethod
+    def load(cls, session_id) -> 'TurnContext':
+        return cls(get_object_or_404(GameSession.objects.select_related('world'), id=session_id))
+
+    @classmethod
+    async def aload(cls, session_id) -> 'TurnContext':
+        try:
+            return cls(await GameSession.objects.select_related('world').aget(id=session_id))
+        except GameSession.DoesNotExist:
+            raise Http404("No such session")
+
+    @property
+    def curves(self) -> WorldDegradation:
+        if self._curves is None:
+            self._curves = compile_pattern(self.session.world.degradation_pattern)
+        return self._curves
+
+    @property
+    def snapshot(self) -> Optional[WorldSnapshot]:
+        if self._snapshot is None:
+            self._snapshot = get_snapshot(self.session.world_id)
+        return self._snapshot
+
+    def character(self, character_id) -> Character:
+        """The character row, with only what prompts and replies need."""
+        character_id = str(character_id)
+        if character_id not in self._characters:
+            self._characters[character_id] = get_object_or_404(
+                Character.objects.only('id', 'world_id', 'onlyworlds_id', 'name', 'memory_intact', 'personality_prompt'),
+                id=character_id, world_id=self.session.world_id,
+            )
+        return self._characters[character_id]
+
+    def conversation(self, conversation_id=None) -> Conversation:
+        """A conversation of this session; the one started last in this turn if no id is given."""
+        if conversation_id is None:
+            if self.last_conversation is None:
+                raise Http404("No conversation to continue")
+            return self.last_conversation
+
+        conversation_id = str(conversation_id)
+        if conversation_id not in self.conversations:
+            conversation = get_object_or_404(
+                Conversation.objects.select_related('character', 'conversationcontext'),
+                id=conversation_id, session_id=self.session.id,
+            )
+            conversation.session = self.session
+            self.remember(conversation)
+        return self.conversations[conversation_id]
+
+    def remember(self, conversation: Conversation):
+        self.conversations[str(conversation.id)] = conversation
+        self.last_conversation = conversation
+
+
+def advance(ctx: TurnContext, nights: int = 1) -> Dict:
+    """Advance one or more nights; skipping ahead costs the same as a single night."""
+    session = ctx.session
+    nights = max(1, nights)
+
+    from_night = session.night_count
+    session.advance_night(nights, ctx.curves)
+    pregen.schedule(session)
+
+    # Degrade this witness's copy of the world: where they stand, who and what is
+    # there, and everything they have already worn down
+    decayed = decay_night(session, from_night, nights, ctx.curves, ctx.snapshot)
+
+    falls = f"Night {session.night_count} falls." if nights == 1 else f"{nights} nights pass. Night {session.night_count} falls."
+    return {
+        "night_count": session.night_count,
+        "world_entropy": session.world_entropy,
+        "text_degradation": session.text_degradation,
+        "color_loss": session.color_loss,
+        "stage": ctx.curves.session_state(session.night_count)['stage'],
+        "elements_decayed": decayed,
+        "message": f"{falls} Everything degrades a little more."
+    }
+
+
+def discover(ctx: TurnContext, content: str, knowledge_type: str = "whisper") -> Dict:
+    """Add a new piece of knowledge."""
+    session = ctx.session
+
+    knowledge = Knowledge(
+        session=session,
+        knowledge_type=knowledge_type,
+        content=content,
+        night_discovered=session.night_count,
+        discovered_at_id=session.current_location_id,
+    )
+
+    # Weighing saves the new row, so it is inserted once with its weight
+    weight = knowledge.calculate_weight()
+    session.add_weight(weight, knowledge)
+
+    return {
+        "knowledge_id": str(knowledge.id),
+        "weight_added": weight,
+        "total_weight": session.total_weight,
+        "movement_speed": session.movement_speed,
+        "message": f"The weight of knowledge grows heavier. Speed: {session.movement_speed:.2f}"
+    }
+
+
+def move(ctx: TurnContext, location_id: str) -> Dict:
+    """Walk to another location in the world."""
+    session = ctx.session
+
+    location = ctx.snapshot.location(location_id) if ctx.snapshot else None
+    if location is None:
+        raise Http404("No such location in this world")
+
+    session.move_to(location['id'])
+    pregen.cancel(session.id)
+
+    return {
+        "current_location": location['id'],
+        "location": element_state(session, 'location', location['id'], ctx.snapshot),
+        "message": f"You carry your burden to {location['name']}."
+    }
+
+
+def session_summary(session: GameSession) -> Dict:
+    """The session fields a client shows after acting."""
+    return {
+        "night_count": session.night_count,
+        "total_weight": session.total_weight,
+        "movement_speed": session.movement_speed,
+        "world_entropy": session.world_entropy,
+        "text_degradation": session.text_degradation,
+        "color_loss": session.color_loss,
+        "current_location": str(session.current_location_id) if session.current_location_id else None,
+        "version": session.version,
+    }
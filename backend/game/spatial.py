@@ -0,0 +1,275 @@
+"""
+Spatial index and heat tiles for the living map.
+Where the map was torn, burned and bloodied - found without reading all of it.
+
+Map impacts come from Discovery rows (map_impact plus impact_location, a point
+in normalised map space: {'x': 0..1, 'y': 0..1} or [x, y]). Per session they
+are held in a uniform grid, cached, so viewport queries touch only the cells
+they overlap. Heat tiles aggregate impacts into TILE_BINS x TILE_BINS bins at
+zoom levels 0..ZOOM_LEVELS-1 (zoom z has 2^z x 2^z tiles) and are built on
+first request.
+
+A new Discovery updates the cached grid and the one cached tile per zoom level
+that contains it, instead of throwing them away. Anything else - an edited or
+deleted Discovery, a contended update - drops the session's map generation,
+and everything is rebuilt lazily.
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+
+KINDS = ('tear', 'burn', 'blood')
+
+# (discovery_id, kind, x, y, night)
+Impact = Tuple[str, str, float, float, int]
+
+
+def _config(name: str, default):
+    return getattr(settings, 'SPATIAL_CONFIG', {}).get(name, default)
+
+
+def parse_point(value) -> Optional[Tuple[float, float]]:
+    """A free-form impact_location as an (x, y) point clamped to the map, or None."""
+    if isinstance(value, dict):
+        x, y = value.get('x'), value.get('y')
+    elif isinstance(value, (list, tuple)) and len(value) >= 2:
+        x, y = value[0], value[1]
+    else:
+        return None
+    try:
+        x, y = float(x), float(y)
+    except (TypeError, ValueError):
+        return None
+    return min(1.0, max(0.0, x)), min(1.0, max(0.0, y))
+
+
+def tile_for(x: float, y: float, zoom: int) -> Tuple[int, int]:
+    n = 1 << zoom
+    return min(n - 1, int(x * n)), min(n - 1, int(y * n))
+
+
+class SpatialGrid:
+    """A uniform grid of map impacts; each cell lists the impacts inside it."""
+
+    __slots__ = ('size', 'cells', 'count')
+
+    def __init__(self, size: int):
+        self.size = size
+        self.cells: Dict[Tuple[int, int], List[Impact]] = {}
+        self.count = 0
+
+    def cell(self, x: float, y: float) -> Tuple[int, int]:
+        n = self.size
+        return min(n - 1, int(x * n)), min(n - 1, int(y * n))
+
+    def insert(self, impact: Impact):
+        self.cells.setdefault(self.cell(impact[2], impact[3]), []).append(impact)
+        self.count += 1
+
+    def query(self, x0: float, y0: float, x1: float, y1: float,
+              kinds: Optional[Iterable[str]] = None) -> List[Impact]:
+        """Every impact inside the viewport, optionally of some kinds only."""
+        cx0, cy0 = self.cell(x0, y0)
+        cx1, cy1 = self.cell(x1, y1)
+        kinds = set(kinds) if kinds else None
+
+        # Walk the viewport's cells, or the occupied cells if there are fewer of those
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) <= len(self.cells):
+            cells = (
+                self.cells.get((cx, cy), ())
+                for cx in range(cx0, cx1 + 1)
+                for cy in range(cy0, cy1 + 1)
+            )
+        else:
+            cells = (
+                impacts for (cx, cy), impacts in self.cells.items()
+                if cx0 <= cx <= cx1 and cy0 <= cy <= cy1
+            )
+
+        return [
+            impact
+            for impacts in cells
+            for impact in impacts
+            if x0 <= impact[2] <= x1 and y0 <= impact[3] <= y1
+            and (kinds is None or impact[1] in kinds)
+        ]
+
+
+# Cache layout - everything for a session hangs off its current map generation
+
+def _generation_key(session_id) -> str:
+    return f"session:{session_id}:map:gen"
+
+
+def _stamp_key(session_id) -> str:
+    return f"session:{session_id}:map:stamp"
+
+
+def _grid_key(session_id, generation) -> str:
+    return f"session:{session_id}:map:{generation}:grid"
+
+
+def _tile_key(session_id, generation, zoom: int, tx: int, ty: int) -> str:
+    return f"session:{session_id}:map:{generation}:tile:{zoom}:{tx}:{ty}"
+
+
+def _bump(key: str) -> int:
+    if cache.add(key, 1, None):
+        return 1
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+        return 1
+
+
+def build_grid(session_id) -> SpatialGrid:
+    """Index every map impact of a session, with one query."""
+    from .models import Discovery
+
+    grid = SpatialGrid(_config('GRID_SIZE', 64))
+    rows = (
+        Discovery.objects.filter(session_id=session_id, map_impact__in=KINDS)
+        .order_by()
+        .values_list('id', 'map_impact', 'impact_location', 'night_discovered')
+    )
+    for discovery_id, kind, location, night in rows:
+        point = parse_point(location)
+        if point is not None:
+            grid.insert((str(discovery_id), kind, point[0], point[1], night))
+    return grid
+
+
+def get_grid(session_id) -> SpatialGrid:
+    """The session's grid, from the cache when it is there."""
+    generation = cache.get(_generation_key(session_id), 0)
+    grid = cache.get(_grid_key(session_id, generation))
+    if grid is not None:
+        return grid
+
+    # Only cache the build if no impact landed while it ran
+    stamp = cache.get(_stamp_key(session_id), 0)
+    grid = build_grid(session_id)
+    if cache.get(_stamp_key(session_id), 0) == stamp:
+        cache.set(_grid_key(session_id, generation), grid, _config('TIMEOUT', 3600))
+    return grid
+
+
+def _bin_for(impact: Impact, zoom: int, tx: int, ty: int, bins: int) -> Tuple[int, int]:
+    n = 1 << zoom
+    bx = min(bins - 1, int((impact[2] * n - tx) * bins))
+    by = min(bins - 1, int((impact[3] * n - ty) * bins))
+    return max(0, bx), max(0, by)
+
+
+def _add_to_tile(tile: Dict, impact: Impact):
+    bx, by = _bin_for(impact, tile['z'], tile['x'], tile['y'], tile['bins'])
+    counts = tile['heat'].setdefault(f"{bx}:{by}", [0, 0, 0])
+    counts[KINDS.index(impact[1])] += 1
+    tile['total'] += 1
+
+
+def build_tile(grid: SpatialGrid, zoom: int, tx: int, ty: int) -> Dict:
+    """Aggregate the impacts of one tile into heat bins."""
+    span = 1.0 / (1 << zoom)
+    tile = {'z': zoom, 'x': tx, 'y': ty, 'bins': _config('TILE_BINS', 16), 'total': 0, 'heat': {}}
+    for impact in grid.query(tx * span, ty * span, (tx + 1) * span, (ty + 1) * span):
+        # Points on a shared edge belong to exactly one tile
+        if tile_for(impact[2], impact[3], zoom) == (tx, ty):
+            _add_to_tile(tile, impact)
+    return tile
+
+
+def heat_tile(session_id, zoom: int, tx: int, ty: int) -> Dict:
+    """One heat tile, built from the grid on first request and cached."""
+    generation = cache.get(_generation_key(session_id), 0)
+    key = _tile_key(session_id, generation, zoom, tx, ty)
+    tile = cache.get(key)
+    if tile is None:
+        stamp = cache.get(_stamp_key(session_id), 0)
+        tile = build_tile(get_grid(session_id), zoom, tx, ty)
+        if cache.get(_stamp_key(session_id), 0) == stamp:
+            cache.set(key, tile, _config('TIMEOUT', 3600))
+    return tile
+
+
+def render_tile(tile: Dict) -> Dict:
+    """A tile as sent to clients: non-empty bins as [bx, by, tears, burns, blood] rows."""
+    cells = []
+    peak = 0
+    for key, counts in tile['heat'].items():
+        bx, by = key.split(':')
+        cells.append([int(bx), int(by), *counts])
+        peak = max(peak, sum(counts))
+    cells.sort()
+    return {
+        'z': tile['z'], 'x': tile['x'], 'y': tile['y'],
+        'bins': tile['bins'], 'total': tile['total'], 'max': peak,
+        'cells': cells,
+    }
+
+
+def add_impact(session_id, impact: Impact):
+    """Fold one new impact into whatever is cached for the session."""
+    _bump(_stamp_key(session_id))
+
+    lock_key = f"session:{session_id}:map:lock"
+    if not cache.add(lock_key, 1, 5):
+        # Someone else is updating; rather rebuild than risk losing an impact
+        invalidate_map(session_id)
+        return
+
+    try:
+        generation = cache.get(_generation_key(session_id), 0)
+        timeout = _config('TIMEOUT', 3600)
+
+        grid_key = _grid_key(session_id, generation)
+        grid = cache.get(grid_key)
+        if grid is not None:
+            grid.insert(impact)
+            cache.set(grid_key, grid, timeout)
+
+        for zoom in range(_config('ZOOM_LEVELS', 4)):
+            tx, ty = tile_for(impact[2], impact[3], zoom)
+            key = _tile_key(session_id, generation, zoom, tx, ty)
+            tile = cache.get(key)
+            if tile is not None:
+                _add_to_tile(tile, impact)
+                cache.set(key, tile, timeout)
+    finally:
+        cache.delete(lock_key)
+
+
+def invalidate_map(session_id):
+    """Forget the session's grid and every tile at once by moving to a new generation."""
+    _bump(_generation_key(session_id))
+
+
+# Signal handlers - keep the index in step with Discovery rows
+
+def _discovery_saved(sender, instance, created, **kwargs):
+    session_id = str(instance.session_id)
+    if not created:
+        transaction.on_commit(lambda: invalidate_map(session_id))
+        return
+
+    point = parse_point(instance.impact_location)
+    if instance.map_impact not in KINDS or point is None:
+        return
+    impact = (str(instance.id), instance.map_impact, point[0], point[1], instance.night_discovered)
+    transaction.on_commit(lambda: add_impact(session_id, impact))
+
+
+def _discovery_deleted(sender, instance, **kwargs):
+    session_id = str(instance.session_id)
+    transaction.on_commit(lambda: invalidate_map(session_id))
+
+
+def connect_signals():
+    """Index map impacts as discoveries land."""
+    post_save.connect(_discovery_saved, sender='game.Discovery', dispatch_uid='spatial_discovery_saved')
+    post_delete.connect(_discovery_deleted, sender='game.Discovery', dispatch_uid='spatial_discovery_deleted')
@@ -0,0 +1,117 @@
+"""
+Delta sync for clients following a session.
+Send only what the night has changed since the witness last looked.
+
+Every event bumps GameSession.version, and the Knowledge, Discovery and
+Message rows an action creates carry the version that added them. A client
+holding version v asks for everything newer; if nothing is, the request waits
+on the session's cache namespace stamp - a cache read, not a query - until
+something changes or the timeout runs out. await_changes() does the same
+for async views, sleeping on the event loop instead of in a thread.
+"""
+
+from typing import Dict, Optional
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from endless_nights.caching import anamespace_stamp, namespace_stamp, session_namespace
+from .events import STATE_FIELDS
+from .models import GameSession, GameEvent, Knowledge, Discovery, Message
+
+
+# Which session fields each event type can change
+CHANGED_FIELDS = {
+    'advance': ('night_count', 'world_entropy', 'text_degradation', 'color_loss'),
+    'discover': ('total_weight', 'movement_speed', 'map_tears', 'map_burns', 'map_blood'),
+    'move': ('current_location_id',),
+    'converse': (),
+}
+
+
+def _config(name: str, default):
+    return settings.GAME_CONFIG.get(name, default)
+
+
+def changes_since(session_id, since: int) -> Optional[Dict]:
+    """Changed fields and new rows after version `since`, or None for an unknown session."""
+    session = GameSession.objects.filter(id=session_id).values('version', *STATE_FIELDS).first()
+    if session is None:
+        return None
+
+    version = session.pop('version')
+    if version == since:
+        return {'version': version, 'changed': {}, 'knowledge': [], 'discoveries': [], 'messages': []}
+
+    # A client starting fresh (or ahead of the server after a reset) gets everything
+    if since <= 0 or since > version:
+        fields = set(STATE_FIELDS)
+        since = -1
+    else:
+        event_types = (
+            GameEvent.objects.filter(session_id=session_id, sequence__gt=since)
+            .order_by()
+            .values_list('event_type', flat=True)
+            .distinct()
+        )
+        fields = {field for event_type in event_types for field in CHANGED_FIELDS[event_type]}
+
+    changed = {field: session[field] for field in STATE_FIELDS if field in fields}
+    if changed.get('current_location_id'):
+        changed['current_location_id'] = str(changed['current_location_id'])
+
+    knowledge = Knowledge.objects.filter(session_id=session_id, version__gt=since).values(
+        'id', 'knowledge_type', 'content', 'total_weight', 'night_discovered', 'version',
+    )
+    discoveries = Discovery.objects.filter(session_id=session_id, version__gt=since).values(
+        'id', 'discovery_type', 'description', 'map_impact', 'impact_location', 'night_discovered', 'version',
+    )
+    messages = Message.objects.filter(conversation__session_id=session_id, version__gt=since).values(
+        'id', 'conversation_id', 'speaker', 'degraded_content', 'degradation_level', 'version',
+    )
+
+    return {
+        'version': version,
+        'changed': changed,
+        'knowledge': [{**row, 'id': str(row['id'])} for row in knowledge],
+        'discoveries': [{**row, 'id': str(row['id'])} for row in discoveries],
+        'messages': [
+            {**row, 'id': str(row['id']), 'conversation_id': str(row['conversation_id'])}
+            for row in messages
+        ],
+    }
+
+
+def wait_for_changes(session_id, since: int, timeout: float) -> Optional[Dict]:
+    """Long-poll: return as soon as the session moves past `since`, or when time runs out."""
+    namespaces = [session_namespace(session_id)]
+    interval = _config('LONG_POLL_INTERVAL', 0.25)
+    deadline = time.monotonic() + timeout
+
+    while True:
+        stamp = namespace_stamp(namespaces)
+        result = changes_since(session_id, since)
+        if result is None or result['version'] != since or time.monotonic() >= deadline:
+            return result
+
+        # Every recorded event bumps the session namespace; wait for that instead of querying
+        while time.monotonic() < deadline and namespace_stamp(namespaces) == stamp:
+            time.sleep(interval)
+
+
+async def await_changes(session_id, since: int, timeout: float) -> Optional[Dict]:
+    """wait_for_changes for async views: waiting holds no thread, only a timer."""
+    namespaces = [session_namespace(session_id)]
+    interval = _config('LONG_POLL_INTERVAL', 0.25)
+    deadline = time.monotonic() + timeout
+
+    while True:
+        stamp = await anamespace_stamp(namespaces)
+        result = await sync_to_async(changes_since)(session_id, since)
+        if result is None or result['version'] != since or time.monotonic() >= deadline:
+            return result
+
+        while time.monotonic() < deadline and await anamespace_stamp(namespaces) == stamp:
+            await asyncio.sleep(min(interval, max(0.0, deadline - time.monotonic())))
@@ -0,0 +1,141 @@
+"""
+Tests for the game loop, against the in-memory channel layer.
+Watching one witness's copy of the world come apart.
+"""
+
+import json
+import uuid
+from unittest import mock
+
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.test import TransactionTestCase, override_settings
+
+from llm.metering import meter
+from worlds.models import Character, Location, Treaty, World
+from .models import GameSession
+from .routing import websocket_urlpatterns
+from .services import TurnContext, advance
+from .turns import ACTIONS, TurnAction, run_turn
+
+
+def _advance(session_id):
+    return advance(TurnContext.load(session_id))
+
+
+def _world():
+    """A world of one location, two characters standing in it and a treaty between them."""
+    world = World.objects.create(name="Efteling", description="")
+    location = Location.objects.create(world=world, name="Sprookjesbos", description="")
+    parties = [
+        Character.objects.create(world=world, name=name, description="", current_location=location)
+        for name in ("Holle Bolle Gijs", "Langnek")
+    ]
+    # Weaker than one night of wear
+    treaty = Treaty.objects.create(world=world, name="Pact", description="", strength=0.01)
+    treaty.parties.set(parties)
+    session = GameSession.objects.create(world=world, witness_name="Witness", current_location=location)
+    return world, location, parties, treaty, session
+
+
+@override_settings(
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    BROADCAST_CONFIG={'ENCODING': 'json', 'COALESCE_MS': 10, 'MAX_BATCH': 64},
+    PREGEN_CONFIG={'ENABLED': False},
+)
+class TreatyBreakTests(TransactionTestCase):
+
+    def setUp(self):
+        self.world, self.location, parties, self.treaty, self.session = _world()
+
+    async def connect(self, path):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), path)
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def events(self, communicator):
+        frame = json.loads(await communicator.receive_from(timeout=2))
+        return frame['b']
+
+    async def test_advance_breaks_the_treaty_for_this_witness_only(self):
+        session_socket = await self.connect(f'/ws/sessions/{self.session.id}/')
+        world_socket = await self.connect(f'/ws/worlds/{self.world.id}/')
+
+        await database_sync_to_async(_advance)(self.session.id)
+
+        broken = [event for event in await self.events(session_socket) if event['t'] == 'treaty_broken']
+        self.assertEqual(len(broken), 1)
+        self.assertEqual(broken[0]['d'], {'treaty_id': str(self.treaty.id)})
+        self.assertEqual(broken[0]['s'], str(self.session.id))
+
+        # The world hears about the night, not about a treaty that only broke in one copy
+        world_events = await self.events(world_socket)
+        self.assertNotIn('treaty_broken', [event['t'] for event in world_events])
+
+        treaty = await Treaty.objects.aget(id=self.treaty.id)
+        self.assertFalse(treaty.is_broken)
+        self.assertEqual(treaty.strength, 0.01)
+
+        await session_socket.disconnect()
+        await world_socket.disconnect()
+
+    async def test_broken_treaty_is_announced_once(self):
+        session_socket = await self.connect(f'/ws/sessions/{self.session.id}/')
+
+        await database_sync_to_async(_advance)(self.session.id)
+        await self.events(session_socket)
+        await database_sync_to_async(_advance)(self.session.id)
+
+        later = await self.events(session_socket)
+        self.assertNotIn('treaty_broken', [event['t'] for event in later])
+
+        await session_socket.disconnect()
+
+
+@override_settings(PREGEN_CONFIG={'ENABLED': False})
+class TurnTests(TransactionTestCase):
+
+    def setUp(self):
+        self.world, self.location, self.parties, _, self.session = _world()
+
+    def tearDown(self):
+        # Write the conversation's token usage while the test database is still there
+        meter.flush()
+
+    def turn(self, *actions):
+        return run_turn(TurnContext.load(self.session.id), [TurnAction(**action) for action in actions])
+
+    def nights(self):
+        return GameSession.objects.get(id=self.session.id).night_count
+
+    def test_failure_rolls_back_its_stretch(self):
+        result = self.turn(
+            {'action': 'advance_night'},
+            {'action': 'move', 'location_id': str(uuid.uuid4())},
+        )
+
+        self.assertEqual(result['results'], [])
+        self.assertEqual(result['failed']['index'], 1)
+        self.assertEqual(self.nights(), 1)
+        self.assertEqual(result['session']['night_count'], 1)
+
+    def test_unexpected_error_is_reported_with_what_committed(self):
+        def broken(ctx, action):
+            raise RuntimeError("the night tore")
+
+        with mock.patch.dict(ACTIONS, discover=broken), self.assertLogs('game.turns', 'ERROR'):
+            result = self.turn(
+                {'action': 'advance_night'},
+                {'action': 'start_conversation', 'character_id': str(self.parties[0].id)},
+                {'action': 'advance_night'},
+                {'action': 'discover', 'content': "A lost shoe"},
+            )
+
+        self.assertEqual([r['action'] for r in result['results']], ['advance_night', 'start_conversation'])
+        self.assertEqual(result['failed'], {
+            'index': 3, 'action': 'discover', 'error': "The action could not be completed",
+        })
+        self.assertEqual(self.nights(), 2)
+        self.assertEqual(result['session']['night_count'], 2)
@@ -0,0 +1,131 @@
+"""
+Whole turns in one request.
+A witness acts, speaks and waits; the night answers once.
+
+A turn is an ordered list of actions run against a single TurnContext, so the
+session, the world's curves and snapshot, and any conversation touched are
+loaded once for the lot.
+
+Consecutive actions that need no provider - discoveries, moves, nights, ended
+conversations - commit together in one short transaction. A conversation waits
+on its provider with no transaction open and commits its exchange on its own,
+so the session row (on SQLite, the whole database) is never locked while a
+character thinks.
+
+If an action fails, for any reason, the turn stops there. The stretch of
+actions it belongs to is rolled back, and everything committed before that
+stretch stands. The failure is reported alongside the committed results, so a
+client retries from the failed index rather than repeating the whole turn.
+"""
+
+from contextlib import nullcontext
+from typing import Callable, Dict, Iterator, List, Literal, Optional, Tuple
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.http import Http404
+from ninja import Schema
+from pydantic import Field, model_validator
+
+from llm import services as llm_services
+from . import services
+from .services import TurnContext
+
+logger = logging.getLogger(__name__)
+
+
+class TurnAction(Schema):
+    action: Literal['discover', 'move', 'start_conversation', 'message', 'end_conversation', 'advance_night']
+    content: Optional[str] = None
+    knowledge_type: str = 'whisper'
+    location_id: Optional[str] = None
+    character_id: Optional[str] = None
+    conversation_id: Optional[str] = None  # Defaults to the conversation started earlier in the turn
+    nights: int = Field(1, ge=1)
+
+    @model_validator(mode='after')
+    def check_arguments(self):
+        required = REQUIRED_ARGUMENTS.get(self.action)
+        if required and getattr(self, required) is None:
+            raise ValueError(f"'{self.action}' needs '{required}'")
+        return self
+
+
+class TurnRequest(Schema):
+    actions: List[TurnAction] = Field(..., min_length=1)
+
+    @model_validator(mode='after')
+    def check_length(self):
+        limit = settings.GAME_CONFIG.get('MAX_TURN_ACTIONS', 20)
+        if len(self.actions) > limit:
+            raise ValueError(f"A turn may hold at most {limit} actions")
+        return self
+
+
+REQUIRED_ARGUMENTS = {
+    'discover': 'content',
+    'move': 'location_id',
+    'start_conversation': 'character_id',
+    'message': 'content',
+}
+
+
+ACTIONS: Dict[str, Callable[[TurnContext, TurnAction], Dict]] = {
+    'discover': lambda ctx, a: services.discover(ctx, a.content, a.knowledge_type),
+    'move': lambda ctx, a: services.move(ctx, a.location_id),
+    'advance_night': lambda ctx, a: services.advance(ctx, a.nights),
+    'start_conversation': lambda ctx, a: llm_services.start_conversation(ctx, a.character_id),
+    'message': lambda ctx, a: llm_services.send_message(ctx, ctx.conversation(a.conversation_id), a.content),
+    'end_conversation': lambda ctx, a: llm_services.end_conversation(ctx, ctx.conversation(a.conversation_id)),
+}
+
+
+# Actions that ask a provider; they write only once the reply is in, in their own transaction
+CONVERSING = {'start_conversation', 'message'}
+
+
+def _stretches(actions: List[TurnAction]) -> Iterator[List[Tuple[int, TurnAction]]]:
+    """Indexed actions in the groups they commit in: each conversing action alone, the rest in runs."""
+    stretch = []
+    for index, action in enumerate(actions):
+        if action.action in CONVERSING:
+            if stretch:
+                yield stretch
+                stretch = []
+            yield [(index, action)]
+        else:
+            stretch.append((index, action))
+    if stretch:
+        yield stretch
+
+
+def run_turn(ctx: TurnContext, actions: List[TurnAction]) -> Dict:
+    """Run the actions in order until one fails, and report the session as it ends."""
+    results = []
+    failed = None
+    for stretch in _stretches(actions):
+        done = []
+        conversing = stretch[0][1].action in CONVERSING
+        try:
+            with nullcontext() if conversing else transaction.atomic():
+                for index, action in stretch:
+                    done.append({'action': action.action, **ACTIONS[action.action](ctx, action)})
+        except Exception as exc:
+            if isinstance(exc, Http404):
+                error = str(exc)
+            else:
+                logger.exception("Turn action %d (%s) failed for session %s", index, action.action, ctx.session.id)
+                error = "The action could not be completed"
+            failed = {'index': index, 'action': action.action, 'error': error}
+            # Forget what the rolled-back stretch did to the session in memory
+            ctx.session.refresh_from_db()
+            break
+        results.extend(done)
+
+    return {
+        "session_id": str(ctx.session.id),
+        "results": results,
+        "failed": failed,
+        "session": services.session_summary(ctx.session),
+    }
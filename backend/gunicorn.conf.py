@@ -0,0 +1,42 @@
+"""
+Gunicorn configuration for The Endless Nights Engine.
+One master lights the lamps; the workers it forks read by the same light.
+
+    gunicorn -c gunicorn.conf.py endless_nights.asgi:application
+
+Workers are uvicorn's: each runs one event loop serving the async game and
+LLM views, so thousands of waiting witnesses need neither thousands of
+workers nor thousands of threads. Set GUNICORN_WORKER_CLASS=sync to serve
+endless_nights.wsgi instead - but WSGI gathers an async stream into one
+response, so the streamed replies (message/stream) then arrive all at once.
+
+The application is loaded once in the master (preload_app) and warmed up
+there (endless_nights.warmup) before any worker is forked, so the schema,
+routers, tokenizer tables and world snapshots are shared copy-on-write.
+"""
+
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'uvicorn.workers.UvicornWorker')
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', '4'))  # sync workers only
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+preload_app = True
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '2000'))  # Recycle slowly-leaking workers
+max_requests_jitter = 200
+
+
+def when_ready(server):
+    # The app is loaded by now (preload_app); build the shared structures before forking
+    from django.conf import settings
+    from endless_nights import warmup
+
+    if settings.WARMUP_CONFIG.get('ENABLED', True):
+        result = warmup.warm()
+        server.log.info(
+            "Warmed up in %sms, %s KiB preloaded, RSS %s KiB",
+            result['total_ms'], result['preloaded_kb'], result['rss_after_kb'],
+        )
+
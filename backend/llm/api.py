@@ -1,120 +1,118 @@
 """
 API endpoints for LLM character interactions.
+
+The views are async, so a witness waiting on a provider's reply costs the
+process a coroutine, not a thread (see the a-prefixed twins in services).
 """
 
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
 from ninja import Router
 from typing import Optional
-from .models import ConversationContext, CharacterMemory
-from game.models import Conversation, Message
-from worlds.models import Character
+from endless_nights.caching import read_through, character_namespace
+from .models import CharacterMemory
+from game.services import TurnContext
+from . import metering, response_cache, routing, services
 
 router = Router()
 
 
 @router.post("/conversation/start")
-def start_conversation(request, session_id: str, character_id: str):
+async def start_conversation(request, session_id: str, character_id: str):
     """Start a conversation with a character."""
-    from game.models import GameSession
-    
-    session = GameSession.objects.get(id=session_id)
-    character = Character.objects.get(id=character_id)
-    
-    conversation = Conversation.objects.create(
-        session=session,
-        character=character,
-        location=session.current_location,
-        night_occurred=session.night_count,
-        text_clarity=max(0.1, 1.0 - session.text_degradation),
-        response_coherence=max(0.1, character.memory_intact),
-    )
-    
-    # Create context
-    context = ConversationContext.objects.create(
-        conversation=conversation,
-        degradation_level=session.text_degradation,
-        coherence_target=conversation.response_coherence,
-        truth_tendency=0.5,  # Could be based on character traits
-    )
-    
-    context.generate_prompt()
-    
-    return {
-        "conversation_id": str(conversation.id),
-        "character_name": character.name,
-        "text_clarity": conversation.text_clarity,
-        "response_coherence": conversation.response_coherence,
-        "message": f"You approach {character.name}. They look at you with eyes that have seen {session.night_count} endless nights."
-    }
+    return await services.astart_conversation(await TurnContext.aload(session_id), character_id)
 
 
 @router.post("/conversation/{conversation_id}/message")
-def send_message(request, conversation_id: str, content: str):
+async def send_message(request, conversation_id: str, content: str):
     """Send a message to a character."""
-    conversation = Conversation.objects.get(id=conversation_id)
-    
-    # Create witness message
-    witness_message = Message.objects.create(
-        conversation=conversation,
-        speaker='witness',
-        original_content=content,
-        degraded_content=content,  # Witness text doesn't degrade on input
-    )
-    
-    # Generate character response (placeholder)
-    # This would use the LLM provider to generate response
-    response_content = f"[{conversation.character.name} responds through the weight of endless nights]"
-    
-    # Create character response
-    character_message = Message.objects.create(
-        conversation=conversation,
-        speaker='character',
-        original_content=response_content,
-        degraded_content=response_content,
+    ctx = await services.aconversation_context(conversation_id)
+    return await services.asend_message(ctx, ctx.last_conversation, content)
+
+
+@router.post("/conversation/{conversation_id}/message/stream")
+async def stream_message(request, conversation_id: str, content: str):
+    """
+    Send a message to a character and stream the reply as server-sent events.
+
+    Streams only under ASGI (endless_nights.asgi); a WSGI server buffers the
+    whole reply before sending it.
+    """
+    ctx = await services.aconversation_context(conversation_id)
+    response = StreamingHttpResponse(
+        await services.astream_message(ctx, ctx.last_conversation, content),
+        content_type='text/event-stream',
     )
-    
-    # Apply degradation
-    character_message.degrade_text(conversation.session.text_degradation)
-    
-    return {
-        "witness_message": content,
-        "character_response": character_message.degraded_content,
-        "degradation_level": conversation.session.text_degradation,
-    }
+    response['Cache-Control'] = 'no-cache'
+    return response
 
 
 @router.post("/conversation/{conversation_id}/end")
-def end_conversation(request, conversation_id: str):
+async def end_conversation(request, conversation_id: str):
     """End a conversation."""
-    conversation = Conversation.objects.get(id=conversation_id)
-    conversation.is_active = False
-    conversation.save()
-    
-    # Character forgets a little
-    conversation.character.forget(0.02)
-    
-    return {
-        "conversation_id": str(conversation.id),
-        "character_memory": conversation.character.memory_intact,
-        "message": f"{conversation.character.name} turns away, already forgetting."
-    }
+    ctx = await services.aconversation_context(conversation_id)
+    return await sync_to_async(services.end_conversation)(ctx, ctx.last_conversation)
 
 
 @router.get("/character/{character_id}/memories")
-def get_character_memories(request, character_id: str):
+async def get_character_memories(request, character_id: str):
     """Get a character's accessible memories."""
-    memories = CharacterMemory.objects.filter(
+    def load():
+        memories = CharacterMemory.objects.filter(
+            character_id=character_id,
+            accessibility__gt=0.1,  # Only somewhat accessible memories
+            is_suppressed=False,
+        )
+        
+        return [
+            {
+                "id": str(m.id),
+                "type": m.memory_type,
+                "content": m.content if m.clarity > 0.5 else "[unclear memory]",
+                "clarity": m.clarity,
+                "accessibility": m.accessibility,
+            }
+            for m in memories
+        ]
+    
+    return await sync_to_async(read_through)(
+        'character_memories', load,
+        namespaces=[character_namespace(character_id)],
         character_id=character_id,
-        accessibility__gt=0.1,  # Only somewhat accessible memories
-        is_suppressed=False,
     )
-    
-    return [
-        {
-            "id": str(m.id),
-            "type": m.memory_type,
-            "content": m.content if m.clarity > 0.5 else "[unclear memory]",
-            "clarity": m.clarity,
-            "accessibility": m.accessibility,
-        }
-        for m in memories
-    ]
\ No newline at end of file
+
+
+@router.get("/response-cache/stats")
+async def get_response_cache_stats(request):
+    """Response cache hit rate and provider latency for this process."""
+    return response_cache.cache_stats()
+
+
+@router.get("/usage")
+async def get_usage(
+    request,
+    provider: Optional[str] = None,
+    world_id: Optional[str] = None,
+    session_id: Optional[str] = None,
+    character_id: Optional[str] = None,
+    day: Optional[str] = None,
+    speculative: Optional[bool] = None,
+):
+    """Tokens, cost and latency spent, filtered by any of provider, world, session, character, day or speculative."""
+    filters = {
+        name: value
+        for name, value in [
+            ('provider', provider), ('world_id', world_id), ('session_id', session_id),
+            ('character_id', character_id), ('day', day),
+        ]
+        if value
+    }
+    if speculative is not None:
+        filters['speculative'] = speculative
+    return await sync_to_async(metering.usage)(**filters)
+
+
+@router.get("/providers/health")
+async def get_provider_health(request):
+    """Rolling latency, error rate and circuit state per provider, for this process."""
+    return routing.health_report()
@@ -0,0 +1,175 @@
+"""
+Bounded conversation context for the LLM.
+Characters remember the last few exchanges clearly; the rest fades into a gist.
+
+The last WINDOW_TURNS turns (a witness message and its reply) are sent
+verbatim. Older messages are folded, a few at a time as they leave the window,
+into a running summary stored on ConversationContext, which is itself kept
+under SUMMARY_BUDGET tokens. Each request reads only the window, so prompt
+size - and the work to build it - stays flat however long the conversation.
+"""
+
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+
+from endless_nights.lazy import lazy_import
+from game.models import Conversation, Message
+from worlds.relations import relationship_state
+from .models import ConversationContext
+
+tiktoken = lazy_import('tiktoken')
+
+FORGOTTEN = "(Earlier, much was said that is now lost.)"
+
+
+def _config(name: str, default):
+    return getattr(settings, 'LLM_CONFIG', {}).get(name, default)
+
+
+@lru_cache(maxsize=8)
+def get_encoding(name: str):
+    """A tiktoken encoding, or None when tiktoken or its BPE files are unavailable."""
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception:
+        # Missing package, or no network to fetch the BPE files; estimate instead
+        return None
+
+
+def count_tokens(text: str, encoding: Optional[str] = None) -> int:
+    """Tokens in a text, exact with tiktoken, about four characters a token without."""
+    if not text:
+        return 0
+    enc = get_encoding(encoding or _config('TOKENIZER', 'cl100k_base'))
+    if enc is None:
+        return (len(text) + 3) // 4
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def open_conversation(session, character, state: Dict) -> Tuple[Conversation, ConversationContext]:
+    """
+    A new conversation with a character and the context it starts from, unsaved.
+
+    `character` is the Character row and `state` its state in this session's
+    overlay; the prompt is rendered but nothing is written.
+    """
+    conversation = Conversation(
+        session=session,
+        character=character,
+        location_id=session.current_location_id,
+        night_occurred=session.night_count,
+        text_clarity=max(0.1, 1.0 - session.text_degradation),
+        response_coherence=max(0.1, state['memory_intact']),
+    )
+    context = ConversationContext(
+        conversation=conversation,
+        degradation_level=session.text_degradation,
+        coherence_target=conversation.response_coherence,
+        truth_tendency=0.5,  # Could be based on character traits
+        character_state={'memory_intact': state['memory_intact']},
+        relationship_state=relationship_state(str(session.world_id), character.onlyworlds_id),
+    )
+    context.render_prompt()
+    return conversation, context
+
+
+def _gist(text: str, words: int = 24) -> str:
+    """The first sentence of a message, cut to a handful of words."""
+    sentence = text.strip().split('\n', 1)[0]
+    for end in '.!?':
+        if end in sentence:
+            sentence = sentence.split(end, 1)[0] + end
+            break
+    parts = sentence.split()
+    return ' '.join(parts[:words]) + (' ...' if len(parts) > words else '')
+
+
+def summarize(summary: str, messages: Sequence[Tuple[str, str]], character_name: str) -> str:
+    """Fold messages into a running summary, one line of gist per message."""
+    lines = summary.splitlines() if summary else []
+    for speaker, text in messages:
+        who = 'The witness' if speaker == 'witness' else character_name
+        lines.append(f"{who}: {_gist(text)}")
+    return '\n'.join(lines)
+
+
+def trim_summary(summary: str, budget: int) -> Tuple[str, int]:
+    """Drop the oldest summary lines until it fits the budget; returns (summary, tokens)."""
+    lines = [line for line in summary.splitlines() if line != FORGOTTEN]
+    dropped = False
+    text = summary
+    tokens = count_tokens(text)
+    while tokens > budget and len(lines) > 1:
+        lines.pop(0)
+        dropped = True
+        text = '\n'.join([FORGOTTEN] + lines)
+        tokens = count_tokens(text)
+    if dropped or summary.startswith(FORGOTTEN):
+        text = '\n'.join([FORGOTTEN] + lines)
+        tokens = count_tokens(text)
+    return text, tokens
+
+
+class ConversationWindow:
+    """The slice of a conversation an LLM gets to see, under a token budget."""
+
+    def __init__(self, context, conversation=None):
+        self.context = context
+        self.conversation = conversation or context.conversation
+
+    def window_messages(self) -> List[Tuple[str, str]]:
+        """Messages not yet folded into the summary, oldest first."""
+        return list(
+            Message.objects.filter(conversation_id=self.conversation.id)
+            .order_by('sent_at')
+            .values_list('speaker', 'original_content')[self.context.summarized_messages:]
+        )
+
+    def system_prompt(self) -> str:
+        if not self.context.summary:
+            return self.context.active_prompt
+        return f"{self.context.active_prompt}\n\nWhat came before, half-remembered:\n{self.context.summary}"
+
+    def prompt(self, new_message: str) -> Dict:
+        """
+        System prompt, recent turns and the new message, fitted to the budget.
+
+        Turns that do not fit are left out from the oldest end; they reach the
+        summary when fold() runs after the reply.
+        """
+        budget = _config('TOKEN_BUDGET', 3000) - _config('RESPONSE_RESERVE', 500)
+        system = self.system_prompt()
+        used = count_tokens(system) + count_tokens(new_message)
+
+        kept = []
+        for speaker, text in reversed(self.window_messages()):
+            tokens = count_tokens(text)
+            if used + tokens > budget:
+                break
+            kept.append((speaker, text))
+            used += tokens
+        kept.reverse()
+
+        messages = [
+            {'role': 'user' if speaker == 'witness' else 'assistant', 'content': text}
+            for speaker, text in kept
+        ]
+        messages.append({'role': 'user', 'content': new_message})
+        return {'character': self.conversation.character.name, 'system': system, 'messages': messages, 'tokens': used}
+
+    def fold(self):
+        """Fold whatever has slipped out of the window into the summary."""
+        window = self.window_messages()
+        overflow = len(window) - _config('WINDOW_TURNS', 6) * 2
+        if overflow <= 0:
+            return
+
+        summary = summarize(self.context.summary, window[:overflow], self.conversation.character.name)
+        summary, tokens = trim_summary(summary, _config('SUMMARY_BUDGET', 400))
+
+        self.context.summary = summary
+        self.context.summary_tokens = tokens
+        self.context.summarized_messages += overflow
+        self.context.save(update_fields=['summary', 'summary_tokens', 'summarized_messages', 'updated_at'])
@@ -0,0 +1,73 @@
+"""
+Management command to run the mock LLM server.
+A voice in the dark that answers on cue, for load tests without a network.
+"""
+
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand
+
+from llm.mock_server import MockModel, MockServer
+from llm.models import LLMProvider
+from llm.providers import reset
+
+
+class Command(BaseCommand):
+    help = 'Run the deterministic mock LLM server (OpenAI and Anthropic APIs, streaming included)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default=None)
+        parser.add_argument('--port', type=int, default=None)
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--latency', default=None,
+                            help="Time to first token, e.g. fixed:0.2, uniform:0.1,0.5, lognormal:0.3,0.5, pareto:0.2,2.5")
+        parser.add_argument('--tokens-per-second', type=float, default=None)
+        parser.add_argument('--error-rate', type=float, default=None)
+        parser.add_argument('--min-tokens', type=int, default=None)
+        parser.add_argument('--max-tokens', type=int, default=None)
+        parser.add_argument('--register', metavar='NAME',
+                            help="Create or update a 'local' LLMProvider with this name pointing at the server")
+        parser.add_argument('--default', action='store_true', help="Make the registered provider the default")
+
+    def handle(self, *args, **options):
+        model = MockModel(
+            seed=options['seed'],
+            latency=options['latency'],
+            tokens_per_second=options['tokens_per_second'],
+            error_rate=options['error_rate'],
+            min_tokens=options['min_tokens'],
+            max_tokens=options['max_tokens'],
+        )
+        server = MockServer(model, host=options['host'], port=options['port'])
+
+        try:
+            asyncio.run(self._serve(server, model, options))
+        except KeyboardInterrupt:
+            self.stdout.write(f"Stopped after {server.requests} requests ({server.failures} failed)")
+
+    async def _serve(self, server: MockServer, model: MockModel, options):
+        # Bound before registering, so --port 0 registers the port it was given
+        await server.listen()
+        if options['register']:
+            await sync_to_async(self._register)(options['register'], server.url, options['default'])
+
+        self.stdout.write(self.style.SUCCESS(f"Mock LLM listening on {server.url} {model.describe()}"))
+        await server.serve()
+
+    def _register(self, name: str, url: str, default: bool):
+        provider, created = LLMProvider.objects.update_or_create(
+            name=name,
+            defaults={
+                'provider_type': 'local',
+                'endpoint': url,
+                'model_name': 'mock',
+                'is_active': True,
+            },
+        )
+        if default:
+            LLMProvider.objects.exclude(pk=provider.pk).update(is_default=False)
+            provider.is_default = True
+            provider.save(update_fields=['is_default'])
+        reset()
+        self.stdout.write(f"{'Registered' if created else 'Updated'} LLMProvider '{name}' -> {url}")
@@ -0,0 +1,268 @@
+"""
+Token accounting and budgets for LLM calls.
+Every word a character speaks is paid for; when the purse is empty, they repeat themselves.
+
+Each provider call is counted - prompt and completion tokens, as the provider
+reports them or by tiktoken - and its cost priced from the LLMProvider's
+cost_per_1k_tokens. Two kinds of counter are kept:
+
+- Cache counters (session tokens, provider tokens today), bumped on every call
+  and shared between processes, so budgets are enforced as calls happen.
+- Aggregates per (day, provider, world, session, character), accumulated in
+  process and flushed to TokenUsage in batches by a background thread, every
+  FLUSH_INTERVAL seconds or as soon as FLUSH_SIZE calls are pending.
+
+The router (llm.routing) skips providers past their daily token_budget, which
+sends calls down the default's fallback chain, and check_session() refuses
+outright once the session's SESSION_TOKEN_BUDGET is spent; callers then serve
+a cached reply.
+
+Speculative calls (llm.pregen) are counted apart, against the session's
+PREGEN_TOKEN_BUDGET: lines prepared ahead of the witness never spend what
+the witness's own questions may use.
+"""
+
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Optional, Tuple
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import F, Sum
+
+from .context import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Chat formats wrap every message in a few tokens of framing
+MESSAGE_OVERHEAD = 4
+
+# (day, provider, world_id, session_id, character_id, speculative)
+UsageKey = Tuple[str, str, Optional[str], Optional[str], Optional[str], bool]
+COUNTERS = ('calls', 'prompt_tokens', 'completion_tokens', 'cost', 'latency_ms', 'fallbacks')
+
+
+class BudgetExhausted(Exception):
+    """No provider may be called: the session or every provider in the chain is over budget."""
+
+
+def _config(name: str, default):
+    return getattr(settings, 'METERING_CONFIG', {}).get(name, default)
+
+
+def _session_key(session_id, speculative: bool = False) -> str:
+    return f"llm:usage:{'pregen' if speculative else 'session'}:{session_id}"
+
+
+def _provider_key(provider_name: str, day: str) -> str:
+    return f"llm:usage:provider:{provider_name}:{day}"
+
+
+def prompt_tokens(prompt: Dict) -> int:
+    messages = prompt['messages']
+    return (
+        count_tokens(prompt['system'])
+        + sum(count_tokens(message['content']) for message in messages)
+        + MESSAGE_OVERHEAD * (len(messages) + 1)
+    )
+
+
+def _add(key: str, amount: int, timeout: int, seed):
+    """Add to a cache counter, seeding it from the database if it went missing."""
+    if cache.get(key) is None and cache.add(key, seed() + amount, timeout):
+        return
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        # Evicted between the check and the increment
+        cache.set(key, seed() + amount, timeout)
+
+
+def _stored_tokens(**filters) -> int:
+    from .models import TokenUsage
+    totals = TokenUsage.objects.filter(**filters).aggregate(
+        prompt=Sum('prompt_tokens'), completion=Sum('completion_tokens'),
+    )
+    return (totals['prompt'] or 0) + (totals['completion'] or 0)
+
+
+def session_tokens(session_id, speculative: bool = False) -> int:
+    """Tokens a session has spent so far, on the witness's calls or on speculative ones."""
+    key = _session_key(session_id, speculative)
+    tokens = cache.get(key)
+    if tokens is None:
+        tokens = _stored_tokens(session_id=session_id, speculative=speculative)
+        cache.add(key, tokens, _config('COUNTER_TIMEOUT', 24 * 60 * 60))
+    return tokens
+
+
+def provider_tokens(provider_name: str, day: str = None) -> int:
+    """Tokens a provider has spent today (or on `day`)."""
+    day = day or date.today().isoformat()
+    tokens = cache.get(_provider_key(provider_name, day))
+    if tokens is None:
+        tokens = _stored_tokens(provider=provider_name, day=day)
+        cache.add(_provider_key(provider_name, day), tokens, _config('COUNTER_TIMEOUT', 24 * 60 * 60))
+    return tokens
+
+
+def check_session(session, speculative: bool = False):
+    """Raise BudgetExhausted once a session has spent its tokens (its speculative ones, if asked)."""
+    budget = _config('PREGEN_TOKEN_BUDGET' if speculative else 'SESSION_TOKEN_BUDGET', None)
+    if session is not None and budget and session_tokens(session.id, speculative) >= budget:
+        kind = 'speculative ' if speculative else ''
+        raise BudgetExhausted(f"Session {session.id} has spent its {budget} {kind}tokens")
+
+
+def within_budget(provider) -> bool:
+    """Whether a provider may still be called today."""
+    limit = getattr(provider.config, 'token_budget', None)
+    return not limit or provider_tokens(provider.name) < limit
+
+
+class UsageMeter:
+    """Usage aggregates waiting to be written, and the thread that writes them."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Dict[UsageKey, Dict] = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+        self._calls = 0
+        self._wake = threading.Event()
+        self._flusher = None
+
+    def add(self, key: UsageKey, **amounts):
+        with self._lock:
+            counters = self._pending[key]
+            for name, amount in amounts.items():
+                counters[name] += amount
+            self._calls += 1
+            full = self._calls >= _config('FLUSH_SIZE', 200)
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._run, name='usage-flush', daemon=True)
+                self._flusher.start()
+        if full:
+            self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(_config('FLUSH_INTERVAL', 5.0))
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Flushing token usage failed")
+            finally:
+                close_old_connections()
+
+    def flush(self) -> int:
+        """Write pending aggregates, one row per key; returns how many keys were written."""
+        from .models import TokenUsage
+
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+            self._calls = 0
+        if not pending:
+            return 0
+
+        try:
+            with transaction.atomic():
+                for (day, provider, world_id, session_id, character_id, speculative), counters in pending.items():
+                    match = TokenUsage.objects.filter(
+                        day=day, provider=provider, world_id=world_id,
+                        session_id=session_id, character_id=character_id, speculative=speculative,
+                    )
+                    if not match.update(**{name: F(name) + amount for name, amount in counters.items()}):
+                        TokenUsage.objects.create(
+                            day=day, provider=provider, world_id=world_id,
+                            session_id=session_id, character_id=character_id, speculative=speculative,
+                            **counters,
+                        )
+        except Exception:
+            # Put the counts back rather than lose them; the next flush retries
+            with self._lock:
+                for key, counters in pending.items():
+                    for name, amount in counters.items():
+                        self._pending[key][name] += amount
+            raise
+        return len(pending)
+
+
+meter = UsageMeter()
+
+
+@atexit.register
+def _flush_at_exit():
+    try:
+        meter.flush()
+    except Exception:
+        logger.warning("Token usage lost at exit", exc_info=True)
+
+
+def record(provider, prompt: Dict, completion, seconds: float, session=None, character_id=None,
+           fallback: bool = False, speculative: bool = False):
+    """Count one provider call against its session and provider, and queue it for TokenUsage."""
+    used_prompt = completion.prompt_tokens or prompt_tokens(prompt)
+    used_completion = completion.completion_tokens or count_tokens(completion.text)
+    tokens = used_prompt + used_completion
+    cost = tokens / 1000 * (getattr(provider.config, 'cost_per_1k_tokens', 0.0) or 0.0)
+    day = date.today().isoformat()
+    timeout = _config('COUNTER_TIMEOUT', 24 * 60 * 60)
+
+    _add(_provider_key(provider.name, day), tokens, timeout,
+         lambda: _stored_tokens(provider=provider.name, day=day))
+    if session is not None:
+        _add(_session_key(session.id, speculative), tokens, timeout,
+             lambda: _stored_tokens(session_id=session.id, speculative=speculative))
+
+    meter.add(
+        (
+            day,
+            provider.name,
+            str(session.world_id) if session is not None else None,
+            str(session.id) if session is not None else None,
+            str(character_id) if character_id else None,
+            speculative,
+        ),
+        calls=1,
+        prompt_tokens=used_prompt,
+        completion_tokens=used_completion,
+        cost=cost,
+        latency_ms=seconds * 1000,
+        fallbacks=int(fallback),
+    )
+
+
+def _provider_totals(row: Dict) -> Dict:
+    # latency_ms is stored summed over calls; report it as a mean, as the overall totals do
+    totals = {name: row[name] for name in COUNTERS if name != 'latency_ms'}
+    calls = row['calls'] or 0
+    totals['mean_latency_ms'] = round((row['latency_ms'] or 0.0) / calls, 2) if calls else 0.0
+    return totals
+
+
+def usage(**filters) -> Dict:
+    """Stored usage totals, overall and per provider, for any of day/provider/world/session/character/speculative."""
+    from .models import TokenUsage
+
+    meter.flush()
+    rows = TokenUsage.objects.filter(**filters)
+    sums = {name: Sum(name) for name in COUNTERS}
+    totals = rows.aggregate(**sums)
+    calls = totals['calls'] or 0
+    return {
+        'filters': {name: str(value) for name, value in filters.items()},
+        'calls': calls,
+        'prompt_tokens': totals['prompt_tokens'] or 0,
+        'completion_tokens': totals['completion_tokens'] or 0,
+        'cost': round(totals['cost'] or 0.0, 6),
+        'mean_latency_ms': round((totals['latency_ms'] or 0.0) / calls, 2) if calls else 0.0,
+        'fallbacks': totals['fallbacks'] or 0,
+        'providers': {
+            row['provider']: _provider_totals(row)
+            for row in rows.values('provider').annotate(**sums).order_by('provider')
+        },
+    }
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.11 on 2026-10-19 06:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('llm', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversationcontext',
+            name='summarized_messages',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='conversationcontext',
+            name='summary',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='conversationcontext',
+            name='summary_tokens',
+            field=models.IntegerField(default=0),
+        ),
+    ]
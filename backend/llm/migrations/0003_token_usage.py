@@ -0,0 +1,49 @@
+# Generated by Django 4.2.11 on 2026-10-19 06:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('llm', '0002_conversation_window'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='llmprovider',
+            name='cost_per_1k_tokens',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='llmprovider',
+            name='fallback',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='fallback_for', to='llm.llmprovider'),
+        ),
+        migrations.AddField(
+            model_name='llmprovider',
+            name='token_budget',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='TokenUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('provider', models.CharField(max_length=100)),
+                ('world_id', models.UUIDField(blank=True, null=True)),
+                ('session_id', models.UUIDField(blank=True, null=True)),
+                ('character_id', models.UUIDField(blank=True, null=True)),
+                ('calls', models.PositiveIntegerField(default=0)),
+                ('prompt_tokens', models.PositiveIntegerField(default=0)),
+                ('completion_tokens', models.PositiveIntegerField(default=0)),
+                ('cost', models.FloatField(default=0.0)),
+                ('latency_ms', models.FloatField(default=0.0)),
+                ('fallbacks', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day', 'provider'], name='llm_tokenus_day_5c2507_idx'), models.Index(fields=['session_id'], name='llm_tokenus_session_e28705_idx'), models.Index(fields=['world_id', 'day'], name='llm_tokenus_world_i_15e797_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.11 on 2026-10-19 07:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('llm', '0003_token_usage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tokenusage',
+            name='speculative',
+            field=models.BooleanField(default=False),
+        ),
+    ]
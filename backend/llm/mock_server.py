@@ -0,0 +1,320 @@
+"""
+A mock LLM server for load and latency testing.
+A character that always answers, never learns, and keeps to the same story.
+
+MockServer speaks enough of the OpenAI chat completions API
+(POST /v1/chat/completions) and the Anthropic messages API (POST /v1/messages)
+for the SDK-backed providers, streaming included, so an LLMProvider of type
+'local' pointed at it behaves like a real one without a network:
+
+- Replies are deterministic: the words are drawn from a generator seeded by
+  the server seed and a hash of the prompt, so the same prompt always gets
+  the same answer.
+- Time to first token follows a configurable distribution, tokens then
+  arrive at TOKENS_PER_SECOND, and ERROR_RATE of requests fail. These draws
+  come from a second generator seeded only by the server seed, so a run
+  replays identically.
+
+Run it with `manage.py run_mock_llm`, or in-process with MockServer(...).start().
+"""
+
+from typing import Callable, Dict, List, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+from .context import count_tokens
+
+VOCABULARY = (
+    "night lantern carousel forest remember forget weight knowledge witness "
+    "treaty broken faded silent road ruin ember crown wolf river bell tower "
+    "ash mirror thread stone gate hollow shadow candle salt iron promise "
+    "name stranger long ago perhaps never again always once still only "
+    "I you we they it was is will be not no yes the a of in under beyond"
+).split()
+
+Distribution = Callable[[random.Random], float]
+
+
+def _config(name: str, default):
+    return getattr(settings, 'MOCK_LLM_CONFIG', {}).get(name, default)
+
+
+def parse_distribution(spec: str) -> Distribution:
+    """
+    A latency distribution, in seconds, from a spec such as:
+
+    fixed:0.2, uniform:0.1,0.5, normal:0.3,0.05, lognormal:0.3,0.5 (median, sigma)
+    or pareto:0.2,2.5 (scale, alpha - a heavy tail).
+    """
+    kind, _, args = spec.partition(':')
+    values = [float(v) for v in args.split(',') if v]
+    if kind == 'fixed':
+        return lambda rng: values[0]
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == 'normal':
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == 'lognormal':
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1])
+    if kind == 'pareto':
+        return lambda rng: values[0] * rng.paretovariate(values[1])
+    raise ValueError(f"Unknown latency distribution '{spec}'")
+
+
+class MockModel:
+    """What the mock server says, how long it takes, and when it fails."""
+
+    def __init__(self, seed: int = None, latency: str = None, tokens_per_second: float = None,
+                 error_rate: float = None, min_tokens: int = None, max_tokens: int = None):
+        self.seed = _config('SEED', 0) if seed is None else seed
+        self.latency_spec = latency or _config('LATENCY', 'lognormal:0.3,0.5')
+        self.latency = parse_distribution(self.latency_spec)
+        self.tokens_per_second = tokens_per_second or _config('TOKENS_PER_SECOND', 60.0)
+        self.error_rate = _config('ERROR_RATE', 0.0) if error_rate is None else error_rate
+        self.min_tokens = min_tokens or _config('MIN_TOKENS', 16)
+        self.max_tokens = max_tokens or _config('MAX_TOKENS', 96)
+        self._timing = random.Random(self.seed)
+        self._lock = threading.Lock()
+
+    def words(self, prompt: Dict, limit: int = None) -> List[str]:
+        """The reply to a prompt, as tokens (words with their leading space)."""
+        digest = hashlib.sha256(json.dumps([self.seed, prompt], sort_keys=True).encode()).digest()
+        rng = random.Random(digest)
+        count = rng.randint(self.min_tokens, self.max_tokens)
+        if limit:
+            count = min(count, limit)
+
+        words = []
+        for i in range(count):
+            word = rng.choice(VOCABULARY)
+            if i == 0 or words[-1].endswith(('.', '?')):
+                word = word.capitalize()
+            if i == count - 1:
+                word += '.'
+            elif rng.random() < 0.1:
+                word += rng.choice('.,?')
+            words.append(word if i == 0 else ' ' + word)
+        return words
+
+    def timing(self) -> Tuple[float, bool]:
+        """(seconds to first token, whether this request fails) for the next request."""
+        with self._lock:
+            return self.latency(self._timing), self._timing.random() < self.error_rate
+
+    def describe(self) -> Dict:
+        return {
+            'seed': self.seed,
+            'latency': self.latency_spec,
+            'tokens_per_second': self.tokens_per_second,
+            'error_rate': self.error_rate,
+            'tokens': [self.min_tokens, self.max_tokens],
+        }
+
+
+class MockServer:
+    """An asyncio HTTP/1.1 server in front of a MockModel."""
+
+    def __init__(self, model: MockModel = None, host: str = None, port: int = None):
+        self.model = model or MockModel()
+        self.host = host or _config('HOST', '127.0.0.1')
+        self.port = _config('PORT', 8808) if port is None else port
+        self.requests = 0
+        self.failures = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server = None
+        self._ready = threading.Event()
+
+    @property
+    def url(self) -> str:
+        """Base URL for an LLMProvider endpoint (the SDKs add the API paths)."""
+        return f"http://{self.host}:{self.port}/v1"
+
+    async def listen(self):
+        """Bind the socket; from here on `port` (and `url`) are real, even when port 0 was asked for."""
+        self._loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(self._connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+
+    async def serve(self):
+        if self._server is None:
+            await self.listen()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def start(self) -> 'MockServer':
+        """Serve from a background thread of this process; returns once listening."""
+        thread = threading.Thread(target=lambda: asyncio.run(self._serve_quietly()), daemon=True)
+        thread.start()
+        self._ready.wait(5)
+        return self
+
+    async def _serve_quietly(self):
+        try:
+            await self.serve()
+        except asyncio.CancelledError:
+            pass
+
+    def stop(self):
+        if self._loop is not None and self._server is not None:
+            self._loop.call_soon_threadsafe(self._server.close)
+
+    # HTTP
+
+    async def _connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length') or 0)
+                body = json.loads(await reader.readexactly(length)) if length else {}
+                await self._dispatch(method, path.split('?', 1)[0], body, writer)
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method: str, path: str, body: Dict, writer: asyncio.StreamWriter):
+        if method == 'GET' and path in ('/health', '/v1/health'):
+            await self._json(writer, 200, {
+                'status': 'ok', 'requests': self.requests, 'failures': self.failures,
+                **self.model.describe(),
+            })
+        elif method == 'POST' and path == '/v1/chat/completions':
+            await self._completion(writer, body, anthropic=False)
+        elif method == 'POST' and path == '/v1/messages':
+            await self._completion(writer, body, anthropic=True)
+        else:
+            await self._json(writer, 404, {'error': {'type': 'not_found', 'message': path}})
+
+    async def _write_head(self, writer, status: int, headers: Dict):
+        reason = {200: 'OK', 404: 'Not Found', 500: 'Internal Server Error', 529: 'Overloaded'}[status]
+        head = f"HTTP/1.1 {status} {reason}\r\n" + ''.join(f"{k}: {v}\r\n" for k, v in headers.items())
+        writer.write((head + "\r\n").encode('latin-1'))
+
+    async def _json(self, writer, status: int, payload: Dict):
+        data = json.dumps(payload).encode()
+        await self._write_head(writer, status, {
+            'Content-Type': 'application/json', 'Content-Length': len(data),
+        })
+        writer.write(data)
+        await writer.drain()
+
+    async def _event(self, writer, data: Dict, event: str = None):
+        text = (f"event: {event}\n" if event else '') + f"data: {json.dumps(data)}\n\n"
+        chunk = text.encode()
+        writer.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+        await writer.drain()
+
+    # Completions
+
+    async def _completion(self, writer, body: Dict, anthropic: bool):
+        self.requests += 1
+        messages = body.get('messages', [])
+        system = body.get('system', '')
+        prompt = {'system': system, 'messages': messages}
+        prompt_tokens = count_tokens(system) + sum(count_tokens(str(m.get('content', ''))) for m in messages)
+
+        first_token, fails = self.model.timing()
+        if fails:
+            self.failures += 1
+            await asyncio.sleep(first_token / 2)
+            if anthropic:
+                await self._json(writer, 529, {'type': 'error', 'error': {'type': 'overloaded_error', 'message': 'Injected failure'}})
+            else:
+                await self._json(writer, 500, {'error': {'type': 'server_error', 'message': 'Injected failure'}})
+            return
+
+        words = self.model.words(prompt, body.get('max_tokens'))
+        per_token = 1.0 / self.model.tokens_per_second
+        await asyncio.sleep(first_token)
+
+        if not body.get('stream'):
+            await asyncio.sleep(per_token * (len(words) - 1))
+            text = ''.join(words)
+            if anthropic:
+                payload = {
+                    'id': f"msg_{uuid.uuid4().hex[:24]}", 'type': 'message', 'role': 'assistant',
+                    'model': body.get('model', 'mock'), 'stop_reason': 'end_turn',
+                    'content': [{'type': 'text', 'text': text}],
+                    'usage': {'input_tokens': prompt_tokens, 'output_tokens': len(words)},
+                }
+            else:
+                payload = {
+                    'id': f"chatcmpl-{uuid.uuid4().hex[:24]}", 'object': 'chat.completion',
+                    'created': int(time.time()), 'model': body.get('model', 'mock'),
+                    'choices': [{'index': 0, 'finish_reason': 'stop',
+                                 'message': {'role': 'assistant', 'content': text}}],
+                    'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': len(words),
+                              'total_tokens': prompt_tokens + len(words)},
+                }
+            await self._json(writer, 200, payload)
+            return
+
+        await self._write_head(writer, 200, {
+            'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache',
+            'Transfer-Encoding': 'chunked',
+        })
+        if anthropic:
+            await self._stream_anthropic(writer, body, words, prompt_tokens, per_token)
+        else:
+            await self._stream_openai(writer, body, words, prompt_tokens, per_token)
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def _stream_openai(self, writer, body, words, prompt_tokens, per_token):
+        base = {
+            'id': f"chatcmpl-{uuid.uuid4().hex[:24]}", 'object': 'chat.completion.chunk',
+            'created': int(time.time()), 'model': body.get('model', 'mock'),
+        }
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(per_token)
+            delta = {'role': 'assistant', 'content': word} if i == 0 else {'content': word}
+            await self._event(writer, {**base, 'choices': [{'index': 0, 'delta': delta, 'finish_reason': None}]})
+        await self._event(writer, {
+            **base, 'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': len(words),
+                      'total_tokens': prompt_tokens + len(words)},
+        })
+        chunk = b"data: [DONE]\n\n"
+        writer.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+
+    async def _stream_anthropic(self, writer, body, words, prompt_tokens, per_token):
+        await self._event(writer, {'type': 'message_start', 'message': {
+            'id': f"msg_{uuid.uuid4().hex[:24]}", 'type': 'message', 'role': 'assistant',
+            'model': body.get('model', 'mock'), 'content': [], 'stop_reason': None,
+            'usage': {'input_tokens': prompt_tokens, 'output_tokens': 0},
+        }}, 'message_start')
+        await self._event(writer, {'type': 'content_block_start', 'index': 0,
+                                   'content_block': {'type': 'text', 'text': ''}}, 'content_block_start')
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(per_token)
+            await self._event(writer, {'type': 'content_block_delta', 'index': 0,
+                                       'delta': {'type': 'text_delta', 'text': word}}, 'content_block_delta')
+        await self._event(writer, {'type': 'content_block_stop', 'index': 0}, 'content_block_stop')
+        await self._event(writer, {'type': 'message_delta', 'delta': {'stop_reason': 'end_turn'},
+                                   'usage': {'output_tokens': len(words)}}, 'message_delta')
+        await self._event(writer, {'type': 'message_stop'}, 'message_stop')
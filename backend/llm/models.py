@@ -114,17 +114,30 @@ class ConversationContext(models.Model):
     # Generated personality
     active_prompt = models.TextField()
     
+    # Rolling window - older turns folded into a bounded summary (see llm.context)
+    summary = models.TextField(blank=True)
+    summary_tokens = models.IntegerField(default=0)
+    summarized_messages = models.IntegerField(default=0)  # Messages folded so far, oldest first
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     def generate_prompt(self):
         """Generate the active prompt for this conversation."""
+        prompt = self.render_prompt()
+        self.save()
+        return prompt
+    
+    def render_prompt(self):
+        """Build the active prompt without saving - for contexts that may never be stored."""
         character = self.conversation.character
         night = self.conversation.night_occurred
+        # The session's own view of the character wins over the shared row
+        memory_intact = self.character_state.get('memory_intact', character.memory_intact)
         
         prompt = f"""You are {character.name} in a world that has been through {night} endless nights.
         
-Your memories are {character.memory_intact * 100:.0f}% intact.
+Your memories are {memory_intact * 100:.0f}% intact.
 The world is {self.conversation.session.world_entropy * 100:.0f}% degraded.
 
 {character.personality_prompt}
@@ -137,7 +150,6 @@ Sometimes you forget. Sometimes you pretend to forget.
 The difference doesn't matter anymore."""
         
         self.active_prompt = prompt
-        self.save()
         return prompt
     
     def __str__(self):
@@ -171,10 +183,48 @@ class LLMProvider(models.Model):
     is_active = models.BooleanField(default=True)
     is_default = models.BooleanField(default=False)
     
+    # Spend - see llm.metering
+    cost_per_1k_tokens = models.FloatField(default=0.0)
+    token_budget = models.PositiveIntegerField(null=True, blank=True)  # Tokens per day; empty = unlimited
+    fallback = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='fallback_for',
+    )  # Cheaper provider used once the budget is spent
+    
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         ordering = ['name']
     
     def __str__(self):
-        return f"{self.name} ({self.provider_type})"
\ No newline at end of file
+        return f"{self.name} ({self.provider_type})"
+
+
+class TokenUsage(models.Model):
+    """Tokens spent per provider, world, session and character, per day."""
+    
+    day = models.DateField()
+    provider = models.CharField(max_length=100)  # LLMProvider name, or a built-in provider
+    
+    # Plain ids, not foreign keys - what was spent stays spent when a session goes
+    world_id = models.UUIDField(null=True, blank=True)
+    session_id = models.UUIDField(null=True, blank=True)
+    character_id = models.UUIDField(null=True, blank=True)
+    speculative = models.BooleanField(default=False)  # Pre-generated lines, on their own budget
+    
+    calls = models.PositiveIntegerField(default=0)
+    prompt_tokens = models.PositiveIntegerField(default=0)
+    completion_tokens = models.PositiveIntegerField(default=0)
+    cost = models.FloatField(default=0.0)
+    latency_ms = models.FloatField(default=0.0)  # Summed; divide by calls
+    fallbacks = models.PositiveIntegerField(default=0)  # Calls served by a fallback provider
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['day', 'provider']),
+            models.Index(fields=['session_id']),
+            models.Index(fields=['world_id', 'day']),
+        ]
+    
+    def __str__(self):
+        return f"{self.provider} on {self.day}: {self.prompt_tokens + self.completion_tokens} tokens"
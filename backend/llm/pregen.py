@@ -0,0 +1,213 @@
+"""
+Speculative pre-generation of character lines.
+Before the witness speaks, the night has already whispered what they will hear.
+
+When a night falls, the characters at the witness's location - and then those
+one connection away - are the likeliest to be spoken to next. schedule() queues
+a low-priority plan for the session; a background worker turns it into jobs
+that ask the provider for each character's opening line and their replies to
+the questions witnesses ask most, under the session's degradation as it is
+now. The lines go into the response cache under the very keys
+start_conversation and send_message look up, so a match is served at once and
+a miss costs nothing extra.
+
+Jobs run on a small pool of daemon threads in this process. Each carries the
+session's position (night and location) from when it was queued, mirrored in
+the cache; moving away or another night replaces the position, and jobs that
+no longer match are dropped before they reach the provider.
+"""
+
+from collections import defaultdict
+from typing import Callable, Dict, List
+import itertools
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import Count
+
+from game.models import GameSession, Message
+from game.overlay import element_state
+from worlds.models import Character, Location
+from worlds.snapshot import get_snapshot
+from . import response_cache, routing
+from .context import open_conversation
+
+logger = logging.getLogger(__name__)
+
+# Lower runs first: planning, then lines for characters here, then next door
+PLAN, HERE, NEARBY = 0, 10, 20
+
+
+def _config(name: str, default):
+    return getattr(settings, 'PREGEN_CONFIG', {}).get(name, default)
+
+
+def _position_key(session_id) -> str:
+    return f"session:{session_id}:pregen"
+
+
+def position(session) -> str:
+    return f"{session.night_count}:{session.current_location_id}"
+
+
+_queue: 'queue.PriorityQueue' = queue.PriorityQueue()
+_order = itertools.count()
+_workers: List[threading.Thread] = []
+_workers_lock = threading.Lock()
+
+
+def _ensure_workers():
+    with _workers_lock:
+        while len(_workers) < _config('WORKERS', 1):
+            worker = threading.Thread(target=_work, name=f"pregen-{len(_workers)}", daemon=True)
+            worker.start()
+            _workers.append(worker)
+
+
+def _enqueue(priority: int, run: Callable[[Dict], None], job: Dict):
+    if _queue.qsize() >= _config('QUEUE_SIZE', 1000):
+        logger.info("Pre-generation queue full; dropping job for session %s", job['session_id'])
+        return
+    _ensure_workers()
+    _queue.put((priority, next(_order), run, job))
+
+
+def _work():
+    while True:
+        _, _, run, job = _queue.get()
+        try:
+            if cache.get(_position_key(job['session_id'])) == job['position']:
+                run(job)
+        except Exception:
+            logger.exception("Pre-generation failed for session %s", job['session_id'])
+        finally:
+            close_old_connections()
+            _queue.task_done()
+
+
+def schedule(session):
+    """Queue pre-generation for the characters the witness will likely speak to next."""
+    if not _config('ENABLED', True) or not session.current_location_id:
+        return
+
+    job = {'session_id': str(session.id), 'position': position(session)}
+    cache.set(_position_key(job['session_id']), job['position'], _config('TIMEOUT', 60 * 60))
+    transaction.on_commit(lambda: _enqueue(PLAN, _plan, job))
+
+
+def cancel(session_id):
+    """Drop whatever is still queued for a session - the witness has walked on."""
+    cache.delete(_position_key(session_id))
+
+
+def nearby_characters(session, snapshot) -> List[tuple]:
+    """(priority, character id) for characters here, then one connection away."""
+    here = snapshot.characters_at(session.current_location_id)
+    nearby = []
+    if _config('NEIGHBOURS', True):
+        connected = Location.connected_to.through.objects.filter(
+            from_location_id=session.current_location_id,
+        ).values_list('to_location_id', flat=True)
+        for location_id in connected:
+            nearby.extend(c for c in snapshot.characters_at(location_id) if c not in here)
+
+    chosen = [(HERE, c) for c in here] + [(NEARBY, c) for c in nearby]
+    return chosen[:_config('MAX_CHARACTERS', 6)]
+
+
+def likely_questions(character_ids) -> Dict[str, List[str]]:
+    """Per character, what witnesses ask most, topped up with the usual questions."""
+    per_character = _config('QUESTIONS', 3)
+    asked = (
+        Message.objects.filter(speaker='witness', conversation__character_id__in=character_ids)
+        .values_list('conversation__character_id', 'original_content')
+        .annotate(n=Count('id'))
+        .order_by('-n')[:per_character * len(character_ids) * 4]
+    )
+
+    questions = defaultdict(list)
+    for character_id, content, _ in asked:
+        seen = questions[str(character_id)]
+        if len(seen) < per_character and content not in seen:
+            seen.append(content)
+
+    for character_id in character_ids:
+        seen = questions[str(character_id)]
+        for question in _config('COMMON_QUESTIONS', ()):
+            if len(seen) >= per_character:
+                break
+            if question not in seen:
+                seen.append(question)
+    return questions
+
+
+def _plan(job: Dict):
+    session = GameSession.objects.select_related('world').get(id=job['session_id'])
+    if position(session) != job['position']:
+        return
+
+    snapshot = get_snapshot(session.world_id)
+    chosen = nearby_characters(session, snapshot)
+    if not chosen:
+        return
+
+    rows = {
+        str(character.id): character
+        for character in Character.objects.only(
+            'id', 'world_id', 'onlyworlds_id', 'name', 'memory_intact', 'personality_prompt',
+        ).filter(id__in=[c for _, c in chosen])
+    }
+    questions = likely_questions(list(rows))
+
+    for priority, character_id in chosen:
+        character = rows.get(character_id)
+        state = element_state(session, 'character', character_id, snapshot)
+        if character is None or state is None or not state.get('alive', True):
+            continue
+
+        conversation, context = open_conversation(session, character, state)
+        line = {
+            **job,
+            'session': session,
+            'character_id': character_id,
+            'character': character.name,
+            'system': context.active_prompt,
+            'state': response_cache.context_state(context),
+            'degradation': session.text_degradation,
+            'coherence': conversation.response_coherence,
+        }
+        # The opening line first; it is needed the moment a conversation starts
+        _enqueue(priority, _line, {**line, 'message': ''})
+        for question in questions.get(character_id, ()):
+            _enqueue(priority + 1, _line, {**line, 'message': question})
+
+
+def _line(job: Dict):
+    prompt = {
+        'character': job['character'],
+        'system': job['system'],
+        'messages': [{'role': 'user', 'content': job['message']}] if job['message'] else [],
+    }
+    try:
+        response_cache.pregenerate(
+            job['character_id'], job['state'], job['message'],
+            job['degradation'], job['coherence'],
+            lambda: routing.complete(prompt, job['session'], job['character_id'], speculative=True),
+        )
+    except routing.UNAVAILABLE:
+        # Speculation is the first thing to go when money runs short or providers fail
+        pass
+
+
+def drain(timeout: float = None):
+    """Wait for queued work to finish (management commands and benchmarks)."""
+    if timeout is None:
+        _queue.join()
+        return
+    done = threading.Event()
+    threading.Thread(target=lambda: (_queue.join(), done.set()), daemon=True).start()
+    done.wait(timeout)
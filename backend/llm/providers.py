@@ -0,0 +1,219 @@
+"""
+LLM providers behind a single call.
+Every character speaks through the same borrowed mouth.
+
+A provider turns a prompt built by llm.context (system, messages, character)
+into reply text. Calls are async so a hedged request that loses the race can
+be cancelled outright (see llm.routing). The pool is the active default
+LLMProvider row, its `fallback` chain, then any other active rows; without any
+rows, LLM_CONFIG['PROVIDER'] names a built-in provider.
+
+Each provider keeps one SDK client per event loop, so connections are reused
+between calls, and the SDK never retries on its own: a failure goes straight
+back to the router, which fails over, hedges and trips breakers knowing it.
+"""
+
+from typing import AsyncIterator, Dict, Iterable, List, NamedTuple, Optional
+import asyncio
+import threading
+import time
+import weakref
+
+from django.conf import settings
+
+from endless_nights.lazy import lazy_import
+
+anthropic = lazy_import('anthropic')
+openai = lazy_import('openai')
+
+# Anthropic needs a user turn to answer; a character speaking first is answering this
+APPROACH = "(The witness approaches.)"
+
+
+class Completion(NamedTuple):
+    text: str
+    prompt_tokens: Optional[int] = None  # As reported by the provider, when it does
+    completion_tokens: Optional[int] = None
+
+
+class Provider:
+    """Something that can answer a prompt; `config` is its LLMProvider row, if any."""
+
+    name = 'base'
+
+    def __init__(self, config=None):
+        self.config = config
+        if config is not None:
+            self.name = config.name
+        # Clients hold connections bound to the loop that opened them
+        self._clients = weakref.WeakKeyDictionary()
+
+    def client(self):
+        """The SDK client for the running loop; rebuilt only when the row's connection changes."""
+        loop = asyncio.get_running_loop()
+        options = self._client_options()
+        cached = self._clients.get(loop)
+        if cached is None or cached[0] != options:
+            cached = (options, self._connect(**options))
+            self._clients[loop] = cached
+        return cached[1]
+
+    def _client_options(self) -> Dict:
+        return {
+            'base_url': self.config.endpoint or None,
+            'timeout': settings.LLM_CONFIG.get('TIMEOUT', 30),
+            'max_retries': 0,  # The router retries, on another provider if it can
+        }
+
+    def _connect(self, **options):
+        raise NotImplementedError
+
+    async def complete(self, prompt: Dict) -> Completion:
+        raise NotImplementedError
+
+    async def stream(self, prompt: Dict) -> AsyncIterator[str]:
+        """The reply in pieces as it is generated; providers that cannot stream send it whole."""
+        yield (await self.complete(prompt)).text
+
+    def _messages(self, prompt: Dict) -> List[Dict]:
+        return prompt['messages'] or [{'role': 'user', 'content': APPROACH}]
+
+
+class PlaceholderProvider(Provider):
+    """Answers without a model; the character only gestures at a reply."""
+
+    name = 'placeholder'
+
+    async def complete(self, prompt: Dict) -> Completion:
+        return Completion(f"[{prompt['character']} responds through the weight of endless nights]")
+
+
+class AnthropicProvider(Provider):
+    name = 'anthropic'
+
+    def _client_options(self) -> Dict:
+        return {**super()._client_options(), 'api_key': self.config.api_key or settings.ANTHROPIC_API_KEY}
+
+    def _connect(self, **options):
+        return anthropic.AsyncAnthropic(**options)
+
+    def _arguments(self, prompt: Dict) -> Dict:
+        return {
+            'model': self.config.model_name,
+            'max_tokens': self.config.max_tokens,
+            'temperature': self.config.temperature,
+            'system': prompt['system'],
+            'messages': self._messages(prompt),
+        }
+
+    async def complete(self, prompt: Dict) -> Completion:
+        reply = await self.client().messages.create(**self._arguments(prompt))
+        return Completion(
+            ''.join(block.text for block in reply.content if block.type == 'text'),
+            reply.usage.input_tokens,
+            reply.usage.output_tokens,
+        )
+
+    async def stream(self, prompt: Dict) -> AsyncIterator[str]:
+        async with self.client().messages.stream(**self._arguments(prompt)) as reply:
+            async for text in reply.text_stream:
+                yield text
+
+
+class OpenAIProvider(Provider):
+    """OpenAI, or any server speaking its chat completions API ('local' providers, llm.mock_server)."""
+
+    name = 'openai'
+
+    def _client_options(self) -> Dict:
+        return {**super()._client_options(), 'api_key': self.config.api_key or settings.OPENAI_API_KEY or 'none'}
+
+    def _connect(self, **options):
+        return openai.AsyncOpenAI(**options)
+
+    def _arguments(self, prompt: Dict) -> Dict:
+        return {
+            'model': self.config.model_name,
+            'max_tokens': self.config.max_tokens,
+            'temperature': self.config.temperature,
+            'messages': [{'role': 'system', 'content': prompt['system']}, *self._messages(prompt)],
+        }
+
+    async def complete(self, prompt: Dict) -> Completion:
+        reply = await self.client().chat.completions.create(**self._arguments(prompt))
+        usage = reply.usage
+        return Completion(
+            reply.choices[0].message.content or '',
+            usage.prompt_tokens if usage else None,
+            usage.completion_tokens if usage else None,
+        )
+
+    async def stream(self, prompt: Dict) -> AsyncIterator[str]:
+        chunks = await self.client().chat.completions.create(**self._arguments(prompt), stream=True)
+        async for chunk in chunks:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+# Built-in providers by name, and providers for LLMProvider rows by provider_type
+PROVIDERS = {
+    'placeholder': PlaceholderProvider,
+}
+
+PROVIDER_TYPES = {
+    'anthropic': AnthropicProvider,
+    'openai': OpenAIProvider,
+    'local': OpenAIProvider,
+}
+
+
+def provider_for(row) -> Provider:
+    return PROVIDER_TYPES[row.provider_type](row)
+
+
+_pool = {'providers': None, 'loaded_at': 0.0}
+_pool_lock = threading.Lock()
+
+
+def _load_pool(previous: Iterable[Provider] = ()) -> List[Provider]:
+    from .models import LLMProvider
+
+    rows = list(LLMProvider.objects.filter(is_active=True).order_by('-is_default', 'name'))
+    by_id = {row.id: row for row in rows}
+
+    # The default first, then down its fallback chain, then whatever else is active
+    ordered = []
+    row = next((r for r in rows if r.is_default), None)
+    while row is not None and row not in ordered:
+        ordered.append(row)
+        row = by_id.get(row.fallback_id)
+    ordered.extend(r for r in rows if r not in ordered)
+
+    # Rows still in the pool keep their provider, and with it their open connections
+    kept = {(type(p), p.config.id): p for p in previous if p.config is not None}
+    pool = []
+    for row in ordered:
+        provider = kept.get((PROVIDER_TYPES[row.provider_type], row.id))
+        if provider is None:
+            provider = provider_for(row)
+        else:
+            provider.config, provider.name = row, row.name
+        pool.append(provider)
+    return pool
+
+
+def get_pool() -> List[Provider]:
+    """Providers in the order they are tried (re-read from LLMProvider once a minute)."""
+    with _pool_lock:
+        if time.monotonic() - _pool['loaded_at'] > settings.LLM_CONFIG.get('PROVIDER_REFRESH', 60):
+            _pool['providers'] = _load_pool(_pool['providers'] or ())
+            _pool['loaded_at'] = time.monotonic()
+        pool = _pool['providers']
+
+    return pool or [PROVIDERS[settings.LLM_CONFIG.get('PROVIDER', 'placeholder')]()]
+
+
+def reset():
+    """Forget the cached pool; the next call reads LLMProvider again."""
+    with _pool_lock:
+        _pool['loaded_at'] = 0.0
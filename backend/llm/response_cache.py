@@ -0,0 +1,387 @@
+"""
+Response cache in front of the LLM providers.
+Ask the same character the same thing, and they tell you what they told the last witness.
+
+Replies are keyed by character, a hash of the character's state in the
+conversation, the witness's message (normalised), and the session's
+text_degradation and the conversation's response_coherence quantised into
+buckets. Conversation history is deliberately not part of the key: in these
+nights characters repeat themselves, and the Efteling world is played over and
+over with the same questions.
+
+Entries live in Redis (TTL, plus LRU eviction down to MAX_ENTRIES) when
+REDIS_URL is set and the redis package is installed, and in a per-process LRU
+otherwise or whenever Redis fails. Each entry holds up to VARIANTS replies; on
+a hit, RESAMPLE_RATE is the chance of asking the provider anyway and adding
+the answer, so cached characters do not become parrots.
+"""
+
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import unicodedata
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .routing import UNAVAILABLE
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'llm:response'
+LRU_INDEX = f'{KEY_PREFIX}:lru'
+
+
+def _config(name: str, default):
+    return getattr(settings, 'RESPONSE_CACHE_CONFIG', {}).get(name, default)
+
+
+def normalize_message(text: str) -> str:
+    """Case, punctuation and spacing folded away: 'Where is the Lantern?!' == 'where is the lantern'."""
+    text = unicodedata.normalize('NFKC', text).casefold()
+    return ' '.join(re.sub(r'[^\w\s]', ' ', text).split())
+
+
+def bucket(value: float) -> int:
+    """The bucket a 0..1 level falls in, BUCKET wide."""
+    return int(max(0.0, min(1.0, value)) / _config('BUCKET', 0.1) + 1e-9)
+
+
+def _quantize(value):
+    if isinstance(value, float):
+        return bucket(value)
+    if isinstance(value, dict):
+        return {key: _quantize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_quantize(item) for item in value]
+    return value
+
+
+def state_hash(state: Dict) -> str:
+    """A short hash of character state, with levels quantised like the degradation buckets."""
+    encoded = json.dumps(_quantize(state), sort_keys=True, default=str)
+    return hashlib.sha1(encoded.encode()).hexdigest()[:16]
+
+
+def context_state(context) -> Dict:
+    """What of a conversation's context shapes a reply, as hashed into the key."""
+    return {
+        'character': context.character_state,
+        'relationships': context.relationship_state,
+        'truth': context.truth_tendency,
+        'personality': context.conversation.character.personality_prompt,
+    }
+
+
+def response_key(character_id, state: Dict, message: str, degradation: float, coherence: float) -> str:
+    digest = hashlib.sha1(normalize_message(message).encode()).hexdigest()[:20]
+    return f"{KEY_PREFIX}:{character_id}:{state_hash(state)}:{bucket(degradation)}:{bucket(coherence)}:{digest}"
+
+
+class ResponseCacheMetrics:
+    """Hit/miss counters and provider latency, kept in-process."""
+
+    EVENTS = ('hits', 'misses', 'resamples', 'stores', 'pregenerated', 'evictions', 'errors')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def record(self, event: str, amount: int = 1):
+        with self._lock:
+            self._counts[event] += amount
+
+    def record_call(self, seconds: float):
+        with self._lock:
+            self._provider_calls += 1
+            self._provider_seconds += seconds
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            counts = dict(self._counts)
+            calls, seconds = self._provider_calls, self._provider_seconds
+
+        lookups = counts['hits'] + counts['resamples'] + counts['misses']
+        mean_latency = seconds / calls if calls else 0.0
+        return {
+            **counts,
+            'hit_rate': round(counts['hits'] / lookups, 4) if lookups else 0.0,
+            'provider_calls': calls,
+            'provider_mean_ms': round(mean_latency * 1000, 2),
+            'provider_seconds_saved': round(counts['hits'] * mean_latency, 3),  # Estimated
+        }
+
+    def reset(self):
+        with self._lock:
+            self._counts = dict.fromkeys(self.EVENTS, 0)
+            self._provider_calls = 0
+            self._provider_seconds = 0.0
+
+
+metrics = ResponseCacheMetrics()
+
+
+class LocalStore:
+    """A per-process LRU with expiry."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[str, Tuple[float, List[str]]]' = OrderedDict()
+
+    def get(self, key: str) -> Optional[List[str]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, variants: List[str], timeout: int):
+        evicted = 0
+        with self._lock:
+            self._entries[key] = (time.time() + timeout, variants)
+            self._entries.move_to_end(key)
+            while len(self._entries) > _config('MAX_ENTRIES', 50000):
+                self._entries.popitem(last=False)
+                evicted += 1
+        if evicted:
+            metrics.record('evictions', evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisStore:
+    """Entries as Redis strings with a TTL; a sorted set of last use drives LRU eviction."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, key: str) -> Optional[List[str]]:
+        raw = self.client.get(key)
+        if raw is None:
+            return None
+        self.client.zadd(LRU_INDEX, {key: time.time()})
+        return json.loads(raw)
+
+    def set(self, key: str, variants: List[str], timeout: int):
+        now = time.time()
+        pipe = self.client.pipeline()
+        pipe.set(key, json.dumps(variants), ex=timeout)
+        pipe.zadd(LRU_INDEX, {key: now})
+        # Entries unused for a whole TTL have expired on their own
+        pipe.zremrangebyscore(LRU_INDEX, '-inf', now - timeout)
+        pipe.zcard(LRU_INDEX)
+        size = pipe.execute()[-1]
+
+        overflow = size - _config('MAX_ENTRIES', 50000)
+        if overflow > 0:
+            stale = [member for member, _ in self.client.zpopmin(LRU_INDEX, overflow)]
+            if stale:
+                self.client.delete(*stale)
+                metrics.record('evictions', len(stale))
+
+    def clear(self):
+        keys = self.client.zrange(LRU_INDEX, 0, -1)
+        if keys:
+            self.client.delete(*keys)
+        self.client.delete(LRU_INDEX)
+
+
+_local = LocalStore()
+_redis = None
+
+
+def _stores():
+    """Redis first when it is configured, the local store always as the fallback."""
+    global _redis
+    if _redis is None:
+        _redis = False
+        url = _config('REDIS_URL', os.getenv('REDIS_URL'))
+        if url:
+            try:
+                import redis
+                _redis = RedisStore(redis.Redis.from_url(url, decode_responses=True, socket_timeout=0.5))
+            except ImportError:
+                logger.warning("REDIS_URL is set but redis is not installed; caching replies in-process")
+    return (_redis, _local) if _redis else (_local,)
+
+
+def _get(key: str) -> Optional[List[str]]:
+    for store in _stores():
+        try:
+            return store.get(key)
+        except Exception:
+            metrics.record('errors')
+            logger.warning("Response cache read failed", exc_info=True)
+    return None
+
+
+def _set(key: str, variants: List[str]):
+    for store in _stores():
+        try:
+            store.set(key, variants, _config('TIMEOUT', 24 * 60 * 60))
+            metrics.record('stores')
+            return
+        except Exception:
+            metrics.record('errors')
+            logger.warning("Response cache write failed", exc_info=True)
+
+
+def _generate(generate: Callable[[], str]) -> str:
+    started = time.perf_counter()
+    content = generate()
+    metrics.record_call(time.perf_counter() - started)
+    return content
+
+
+async def _agenerate(generate: Callable[[], Awaitable[str]]) -> str:
+    started = time.perf_counter()
+    content = await generate()
+    metrics.record_call(time.perf_counter() - started)
+    return content
+
+
+def cached_response(
+    character_id,
+    state: Dict,
+    message: str,
+    degradation: float,
+    coherence: float,
+    generate: Callable[[], str],
+) -> Tuple[str, bool]:
+    """A reply for the message, from the cache when possible; returns (content, cached)."""
+    if not _config('ENABLED', True):
+        return _generate(generate), False
+
+    key = response_key(character_id, state, message, degradation, coherence)
+    variants = _get(key)
+
+    if variants is None:
+        metrics.record('misses')
+        content = _generate(generate)
+        _set(key, [content])
+        return content, False
+
+    if random.random() < _config('RESAMPLE_RATE', 0.2):
+        # Ask again, and keep the newest VARIANTS answers - unless no provider may answer
+        try:
+            content = _generate(generate)
+        except UNAVAILABLE:
+            pass
+        else:
+            metrics.record('resamples')
+            _set(key, (variants + [content])[-_config('VARIANTS', 3):])
+            return content, False
+
+    metrics.record('hits')
+    return random.choice(variants), True
+
+
+async def acached_response(
+    character_id,
+    state: Dict,
+    message: str,
+    degradation: float,
+    coherence: float,
+    generate: Callable[[], Awaitable[str]],
+) -> Tuple[str, bool]:
+    """cached_response for async callers, awaiting the provider on their event loop."""
+    if not _config('ENABLED', True):
+        return await _agenerate(generate), False
+
+    # The stores may be a network away; read and write them off the loop
+    get, put = sync_to_async(_get, thread_sensitive=False), sync_to_async(_set, thread_sensitive=False)
+    key = response_key(character_id, state, message, degradation, coherence)
+    variants = await get(key)
+
+    if variants is None:
+        metrics.record('misses')
+        content = await _agenerate(generate)
+        await put(key, [content])
+        return content, False
+
+    if random.random() < _config('RESAMPLE_RATE', 0.2):
+        try:
+            content = await _agenerate(generate)
+        except UNAVAILABLE:
+            pass
+        else:
+            metrics.record('resamples')
+            await put(key, (variants + [content])[-_config('VARIANTS', 3):])
+            return content, False
+
+    metrics.record('hits')
+    return random.choice(variants), True
+
+
+def lookup(character_id, state: Dict, message: str, degradation: float, coherence: float) -> Optional[str]:
+    """
+    A cached reply, or None when the caller should ask a provider - on a miss,
+    or when the variety policy wants a fresh answer. For streamed replies,
+    which are stored with store() once they end.
+    """
+    if not _config('ENABLED', True):
+        return None
+
+    variants = _get(response_key(character_id, state, message, degradation, coherence))
+    if variants is None:
+        metrics.record('misses')
+        return None
+    if random.random() < _config('RESAMPLE_RATE', 0.2):
+        metrics.record('resamples')
+        return None
+    metrics.record('hits')
+    return random.choice(variants)
+
+
+def store(character_id, state: Dict, message: str, degradation: float, coherence: float, content: str):
+    """Add a reply to the cache, keeping the newest VARIANTS for its key."""
+    if not _config('ENABLED', True):
+        return
+    key = response_key(character_id, state, message, degradation, coherence)
+    _set(key, ((_get(key) or []) + [content])[-_config('VARIANTS', 3):])
+
+
+def pregenerate(
+    character_id,
+    state: Dict,
+    message: str,
+    degradation: float,
+    coherence: float,
+    generate: Callable[[], str],
+) -> bool:
+    """Store a reply ahead of the question, unless one is cached already; True if it generated."""
+    key = response_key(character_id, state, message, degradation, coherence)
+    if _get(key) is not None:
+        return False
+    _set(key, [_generate(generate)])
+    metrics.record('pregenerated')
+    return True
+
+
+def clear():
+    """Drop every cached reply (the local store, and Redis when configured)."""
+    for store in _stores():
+        try:
+            store.clear()
+        except Exception:
+            logger.warning("Response cache clear failed", exc_info=True)
+
+
+def cache_stats() -> Dict:
+    return {
+        'store': 'redis' if _stores()[0] is not _local else 'local',
+        **metrics.snapshot(),
+    }
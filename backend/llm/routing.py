@@ -0,0 +1,329 @@
+"""
+Routing LLM calls across providers: hedging, failover and circuit breaking.
+When one voice falters, another answers - and the slower is silenced.
+
+Every attempt feeds a rolling window of latencies and outcomes per provider,
+from which p50/p95 and the error rate are read. A call goes to the first
+healthy provider in the pool that is within budget. If it has not answered by
+its own p95 (HEDGE_AFTER until there are MIN_SAMPLES to go on), the same prompt
+goes to the next one as well; the first answer wins and the other request is
+cancelled, its time so far kept as a latency it took at least. A provider
+that fails is failed over at once.
+
+The circuit breaker ejects a provider after CONSECUTIVE_FAILURES failures in a
+row, or once its error rate over the window reaches ERROR_THRESHOLD (with at
+least MIN_CALLS calls). After COOLDOWN seconds it is let back in half-open: the
+next call decides whether it closes again or goes back out.
+"""
+
+from collections import deque
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import threading
+import time
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+
+from . import metering
+from .metering import BudgetExhausted
+from .providers import Completion, Provider, get_pool
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+
+
+class ProviderUnavailable(Exception):
+    """Every provider tried failed or timed out."""
+
+
+# Either way the character cannot be asked right now
+UNAVAILABLE = (BudgetExhausted, ProviderUnavailable)
+
+
+def _config(name: str, default):
+    return getattr(settings, 'ROUTING_CONFIG', {}).get(name, default)
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class ProviderHealth:
+    """A provider's recent calls, and the state of its circuit breaker."""
+
+    def __init__(self):
+        self.samples = deque(maxlen=_config('WINDOW', 100))  # (seconds, ok); ok is None when cancelled
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.hedges = 0  # Calls to this provider that were hedged
+
+    def latencies(self) -> List[float]:
+        # A cancelled call took at least as long as it ran; leaving it out would flatter the p95
+        return sorted(seconds for seconds, ok in self.samples if ok is not False)
+
+    def error_rate(self) -> float:
+        if not self.samples:
+            return 0.0
+        return sum(1 for _, ok in self.samples if ok is False) / len(self.samples)
+
+    def record(self, seconds: float, ok: Optional[bool]):
+        """One call's outcome; ok=None is a call cancelled before it answered, which passes no verdict."""
+        self.samples.append((seconds, ok))
+        if ok is None:
+            return
+        if ok:
+            self.consecutive_failures = 0
+            self.state = CLOSED
+            return
+
+        self.consecutive_failures += 1
+        tripped = (
+            self.state == HALF_OPEN
+            or self.consecutive_failures >= _config('CONSECUTIVE_FAILURES', 5)
+            or (len(self.samples) >= _config('MIN_CALLS', 10)
+                and self.error_rate() >= _config('ERROR_THRESHOLD', 0.5))
+        )
+        if tripped and self.state != OPEN:
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def available(self) -> bool:
+        if self.state == OPEN and time.monotonic() - self.opened_at >= _config('COOLDOWN', 30):
+            self.state = HALF_OPEN
+        return self.state != OPEN
+
+    def hedge_delay(self) -> float:
+        """How long to wait for this provider before asking another as well."""
+        latencies = self.latencies()
+        if len(latencies) < _config('MIN_SAMPLES', 20):
+            delay = _config('HEDGE_AFTER', 2.0)
+        else:
+            delay = _percentile(latencies, 0.95)
+        return max(_config('HEDGE_MIN', 0.05), delay)
+
+
+class HealthRegistry:
+    """ProviderHealth per provider name, shared by every thread of the process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._health: Dict[str, ProviderHealth] = {}
+
+    def _get(self, name: str) -> ProviderHealth:
+        if name not in self._health:
+            self._health[name] = ProviderHealth()
+        return self._health[name]
+
+    def record(self, name: str, seconds: float, ok: Optional[bool]):
+        with self._lock:
+            health = self._get(name)
+            was = health.state
+            health.record(seconds, ok)
+            if health.state == OPEN and was != OPEN:
+                logger.warning("Provider %s ejected (error rate %.0f%%)", name, health.error_rate() * 100)
+
+    def available(self, name: str) -> bool:
+        with self._lock:
+            return self._get(name).available()
+
+    def hedge_delay(self, name: str) -> float:
+        with self._lock:
+            return self._get(name).hedge_delay()
+
+    def hedged(self, name: str):
+        with self._lock:
+            self._get(name).hedges += 1
+
+    def report(self) -> Dict:
+        with self._lock:
+            items = list(self._health.items())
+            report = {}
+            for name, health in items:
+                latencies = health.latencies()
+                report[name] = {
+                    'state': health.state,
+                    'samples': len(health.samples),
+                    'p50_ms': round(_percentile(latencies, 0.5) * 1000, 1) if latencies else None,
+                    'p95_ms': round(_percentile(latencies, 0.95) * 1000, 1) if latencies else None,
+                    'error_rate': round(health.error_rate(), 4),
+                    'hedge_after_ms': round(health.hedge_delay() * 1000, 1),
+                    'hedges': health.hedges,
+                }
+            return report
+
+    def reset(self):
+        with self._lock:
+            self._health.clear()
+
+
+health = HealthRegistry()
+
+
+def candidates(session=None, speculative: bool = False) -> List[Provider]:
+    """Providers worth trying, in order: within budget, and not ejected if it can be helped."""
+    metering.check_session(session, speculative)
+
+    affordable = [provider for provider in get_pool() if metering.within_budget(provider)]
+    if not affordable:
+        raise BudgetExhausted("Every provider is over its daily budget")
+
+    # With every provider ejected, asking one is still better than not asking
+    return [p for p in affordable if health.available(p.name)] or affordable
+
+
+async def race(providers: List[Provider], prompt: Dict) -> Tuple[Provider, Completion, float, bool]:
+    """
+    Ask the first provider, hedging with the next one past its p95 and failing
+    over on errors; returns (provider, completion, seconds, hedged).
+    """
+    waiting = list(providers)
+    running: Dict[asyncio.Task, Tuple[Provider, float]] = {}
+    hedging = _config('HEDGING', True)
+    hedged = False
+    deadline = time.monotonic() + settings.LLM_CONFIG.get('TIMEOUT', 30)
+    errors = []
+
+    def launch():
+        provider = waiting.pop(0)
+        running[asyncio.ensure_future(provider.complete(prompt))] = (provider, time.monotonic())
+
+    launch()
+    try:
+        while running:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                for task, (provider, started) in running.items():
+                    health.record(provider.name, time.monotonic() - started, ok=False)
+                    task.cancel()
+                running.clear()
+                raise ProviderUnavailable("No provider answered in time")
+
+            # Only a lone request is hedged, and only once
+            hedge_at = None
+            if hedging and not hedged and waiting and len(running) == 1:
+                provider, started = next(iter(running.values()))
+                hedge_at = started + health.hedge_delay(provider.name) - time.monotonic()
+            wait = remaining if hedge_at is None else max(0.0, min(remaining, hedge_at))
+
+            done, _ = await asyncio.wait(running, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                if hedge_at is not None and hedge_at <= wait:
+                    hedged = True
+                    health.hedged(provider.name)
+                    launch()
+                continue
+
+            for task in done:
+                provider, started = running.pop(task)
+                seconds = time.monotonic() - started
+                if task.exception() is not None:
+                    health.record(provider.name, seconds, ok=False)
+                    errors.append(f"{provider.name}: {task.exception()!r}")
+                    continue
+                health.record(provider.name, seconds, ok=True)
+                return provider, task.result(), seconds, hedged
+
+            # Everyone running failed; fail over to the next in line
+            if not running and waiting:
+                launch()
+    finally:
+        # Cancel the loser (or everything, on the way out with an error)
+        for task, (provider, started) in running.items():
+            task.cancel()
+            health.record(provider.name, time.monotonic() - started, ok=None)
+
+    raise ProviderUnavailable("; ".join(errors) or "No provider to ask")
+
+
+def complete(prompt: Dict, session=None, character_id=None, speculative: bool = False) -> str:
+    """
+    Reply text for a prompt from the fastest healthy provider, metered; a
+    speculative call is metered against the session's pre-generation budget.
+
+    Raises BudgetExhausted when the session or every provider is over budget,
+    and ProviderUnavailable when nobody answered.
+    """
+    pool = candidates(session, speculative)
+    provider, completion, seconds, hedged = async_to_sync(race)(pool, prompt)
+    metering.record(
+        provider, prompt, completion, seconds,
+        session=session, character_id=character_id, fallback=provider is not pool[0], speculative=speculative,
+    )
+    return completion.text
+
+
+async def acomplete(prompt: Dict, session=None, character_id=None) -> str:
+    """complete() for async callers: the race runs on the caller's event loop."""
+    pool = await sync_to_async(candidates)(session)
+    provider, completion, seconds, hedged = await race(pool, prompt)
+    await sync_to_async(metering.record)(
+        provider, prompt, completion, seconds,
+        session=session, character_id=character_id, fallback=provider is not pool[0],
+    )
+    return completion.text
+
+
+async def _stream(providers: List[Provider], prompt: Dict) -> AsyncIterator[Tuple]:
+    """
+    ('chunk', text)... then ('done', provider, text, seconds); raises
+    ProviderUnavailable when nobody answered, or one broke off mid-reply.
+    """
+    errors = []
+    for provider in providers:
+        started = time.monotonic()
+        parts = []
+        try:
+            async for text in provider.stream(prompt):
+                parts.append(text)
+                yield ('chunk', text)
+        except Exception as exc:
+            health.record(provider.name, time.monotonic() - started, ok=False)
+            if parts:
+                # Half a reply has gone out; another provider cannot take it over
+                raise ProviderUnavailable(f"{provider.name}: {exc!r}")
+            errors.append(f"{provider.name}: {exc!r}")
+            continue
+
+        seconds = time.monotonic() - started
+        health.record(provider.name, seconds, ok=True)
+        yield ('done', provider, ''.join(parts), seconds)
+        return
+    raise ProviderUnavailable("; ".join(errors) or "No provider to ask")
+
+
+async def astream(prompt: Dict, session=None, character_id=None) -> AsyncIterator[str]:
+    """
+    Reply text in pieces as the first healthy provider produces it, metered
+    once it ends.
+
+    Streams fail over only until the first piece has been sent; they are not
+    hedged. Closing the iterator early stops reading from the provider.
+    """
+    pool = await sync_to_async(candidates)(session)
+    events = _stream(pool, prompt)
+    timeout = settings.LLM_CONFIG.get('TIMEOUT', 30)
+    try:
+        while True:
+            try:
+                kind, *rest = await asyncio.wait_for(events.__anext__(), timeout)
+            except asyncio.TimeoutError:
+                raise ProviderUnavailable("The provider stopped answering")
+            if kind == 'chunk':
+                yield rest[0]
+            else:
+                provider, text, seconds = rest
+                await sync_to_async(metering.record)(
+                    provider, prompt, Completion(text), seconds,
+                    session=session, character_id=character_id, fallback=provider is not pool[0],
+                )
+                return
+    finally:
+        await events.aclose()
+
+
+def health_report() -> Dict:
+    return health.report()
@@ -0,0 +1,335 @@
+"""
+Conversation actions, independent of how they are requested.
+They share a TurnContext with the game actions, so a turn that talks and then
+waits a night reads the session only once.
+
+The a-prefixed twins serve async views: reads and writes go through the async
+ORM or the request's database thread, the provider is awaited on the event
+loop, and degrading the reply is done on the CPU pool (endless_nights.offload).
+"""
+
+from typing import AsyncIterator, Dict
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.http import Http404
+from django.utils import timezone
+
+from game.events import record
+from game.models import Conversation, Message, degrade_text
+from game.overlay import decay_over_nights, element_state
+from endless_nights.offload import offload
+from game.services import TurnContext
+from . import response_cache, routing
+from .context import ConversationWindow, open_conversation
+from .models import ConversationContext
+
+
+def _open(ctx: TurnContext, character_id: str):
+    """An unsaved conversation with a character as this witness knows them; returns (conversation, context, character)."""
+    session = ctx.session
+
+    # Read the character as this witness knows them, without touching its row
+    character = element_state(session, 'character', character_id, ctx.snapshot)
+    if character is None:
+        raise Http404("No such character in this world")
+
+    return (*open_conversation(session, ctx.character(character['id']), character), character)
+
+
+def _store_opening(ctx: TurnContext, conversation: Conversation, context: ConversationContext,
+                   character: Dict, opening: Message):
+    """Insert the conversation, its context (prompt included) and opening line, and record them."""
+    with transaction.atomic():
+        conversation.save()
+        context.save()
+        opening.save()
+        record(ctx.session, 'converse', {'c': character['id'], 'v': str(conversation.id)}, rows=[opening])
+    ctx.remember(conversation)
+
+
+def _character_message(conversation: Conversation, text: str, degraded: str, level: float) -> Message:
+    """The character's line, degraded, not yet inserted."""
+    return Message(
+        conversation=conversation,
+        speaker='character',
+        original_content=text,
+        degraded_content=degraded,
+        degradation_level=level,
+    )
+
+
+def _opening_prompt(character: Dict, context: ConversationContext) -> Dict:
+    return {'character': character['name'], 'system': context.active_prompt, 'messages': []}
+
+
+def _started(session, conversation: Conversation, character: Dict, opening: Message, cached: bool) -> Dict:
+    return {
+        "conversation_id": str(conversation.id),
+        "character_name": character['name'],
+        "text_clarity": conversation.text_clarity,
+        "response_coherence": conversation.response_coherence,
+        "opening_line": opening.degraded_content,
+        "cached": cached,
+        "message": f"You approach {character['name']}. They look at you with eyes that have seen {session.night_count} endless nights."
+    }
+
+
+def start_conversation(ctx: TurnContext, character_id: str) -> Dict:
+    """Start a conversation with a character."""
+    session = ctx.session
+    conversation, context, character = _open(ctx, character_id)
+
+    # The character speaks first - often a line pre-generated when the night fell.
+    # Nothing is written until the reply is in, so no transaction waits on a provider.
+    text, cached = _reply(conversation, context, '', _opening_prompt(character, context))
+    opening = _character_message(
+        conversation, text, degrade_text(text, session.text_degradation), session.text_degradation,
+    )
+    _store_opening(ctx, conversation, context, character, opening)
+
+    return _started(session, conversation, character, opening, cached)
+
+
+async def astart_conversation(ctx: TurnContext, character_id: str) -> Dict:
+    """start_conversation for async views."""
+    session = ctx.session
+    conversation, context, character = await sync_to_async(_open)(ctx, character_id)
+
+    text, cached = await _areply(conversation, context, '', _opening_prompt(character, context))
+    opening = _character_message(
+        conversation, text, await offload(degrade_text, text, session.text_degradation), session.text_degradation,
+    )
+    await sync_to_async(_store_opening)(ctx, conversation, context, character, opening)
+
+    return _started(session, conversation, character, opening, cached)
+
+
+def _reply(conversation: Conversation, context: ConversationContext, content: str, prompt: Dict):
+    """The character's reply, from the response cache or the provider; returns (text, cached)."""
+    session = conversation.session
+    try:
+        return response_cache.cached_response(
+            conversation.character_id,
+            response_cache.context_state(context),
+            content,
+            session.text_degradation,
+            conversation.response_coherence,
+            lambda: routing.complete(prompt, session, conversation.character_id),
+        )
+    except routing.UNAVAILABLE:
+        # Nothing cached, and no provider may answer (budget spent, or all failing)
+        return settings.METERING_CONFIG['SILENCE'].format(name=conversation.character.name), False
+
+
+async def _areply(conversation: Conversation, context: ConversationContext, content: str, prompt: Dict):
+    """_reply for async views: the provider is awaited, no thread waits on it."""
+    session = conversation.session
+    try:
+        return await response_cache.acached_response(
+            conversation.character_id,
+            response_cache.context_state(context),
+            content,
+            session.text_degradation,
+            conversation.response_coherence,
+            lambda: routing.acomplete(prompt, session, conversation.character_id),
+        )
+    except routing.UNAVAILABLE:
+        return settings.METERING_CONFIG['SILENCE'].format(name=conversation.character.name), False
+
+
+def _record_exchange(session, conversation: Conversation, window: ConversationWindow, rows):
+    record(session, 'converse', {'v': str(conversation.id), 'm': 2}, rows=rows)
+    window.fold()
+
+
+def _store_exchange(session, conversation: Conversation, window: ConversationWindow,
+                    content: str, character_message: Message):
+    """Insert the witness's message and the character's reply, and record them, in one short transaction."""
+    with transaction.atomic():
+        witness_message = Message.objects.create(
+            conversation=conversation,
+            speaker='witness',
+            original_content=content,
+            degraded_content=content,  # Witness text doesn't degrade on input
+        )
+        character_message.save()
+        _record_exchange(session, conversation, window, [witness_message, character_message])
+
+
+def _exchanged(session, content: str, character_message: Message, prompt: Dict, cached: bool) -> Dict:
+    return {
+        "witness_message": content,
+        "character_response": character_message.degraded_content,
+        "degradation_level": session.text_degradation,
+        "context_tokens": prompt['tokens'],
+        "cached": cached,
+    }
+
+
+def send_message(ctx: TurnContext, conversation: Conversation, content: str) -> Dict:
+    """Send a message to a character."""
+    session = ctx.session
+    context = conversation.conversationcontext
+
+    # What the provider is sent: summary, recent turns and this message, under budget
+    window = ConversationWindow(context, conversation)
+    prompt = window.prompt(content)
+
+    # Repeated questions are answered from the response cache. Nothing is
+    # written until the reply is in, so no transaction waits on a provider.
+    response_content, cached = _reply(conversation, context, content, prompt)
+
+    character_message = _character_message(
+        conversation, response_content,
+        degrade_text(response_content, session.text_degradation), session.text_degradation,
+    )
+    _store_exchange(session, conversation, window, content, character_message)
+
+    return _exchanged(session, content, character_message, prompt, cached)
+
+
+async def asend_message(ctx: TurnContext, conversation: Conversation, content: str) -> Dict:
+    """send_message for async views."""
+    session = ctx.session
+    context = conversation.conversationcontext
+
+    window = ConversationWindow(context, conversation)
+    prompt = await sync_to_async(window.prompt)(content)
+
+    # As in send_message, nothing is written until the reply is in
+    response_content, cached = await _areply(conversation, context, content, prompt)
+
+    character_message = _character_message(
+        conversation, response_content,
+        await offload(degrade_text, response_content, session.text_degradation), session.text_degradation,
+    )
+    await sync_to_async(_store_exchange)(session, conversation, window, content, character_message)
+
+    return _exchanged(session, content, character_message, prompt, cached)
+
+
+def _event(name: str, data: Dict) -> str:
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+
+def _degrade_piece(piece: str, level: float) -> str:
+    # Keep the spacing between streamed words, whatever happens to the words
+    stripped = piece.lstrip()
+    return piece[:len(piece) - len(stripped)] + degrade_text(stripped, level)
+
+
+def _store_streamed(session, conversation: Conversation, window: ConversationWindow,
+                    content: str, reply: str, degraded: str) -> Message:
+    character_message = _character_message(conversation, reply, degraded, session.text_degradation)
+    _store_exchange(session, conversation, window, content, character_message)
+    return character_message
+
+
+async def astream_message(ctx: TurnContext, conversation: Conversation, content: str) -> AsyncIterator[str]:
+    """
+    Send a message and stream the reply as server-sent events.
+
+    'chunk' events carry the reply as the witness sees it, piece by piece; a
+    'done' event follows once both messages are stored. If the witness leaves
+    mid-stream, nothing is stored. Pieces are a few words each and are
+    degraded as they pass; the provider is read on the event loop.
+    """
+    session = ctx.session
+    context = conversation.conversationcontext
+    window = ConversationWindow(context, conversation)
+    prompt = await sync_to_async(window.prompt)(content)
+    key = (
+        conversation.character_id, response_cache.context_state(context), content,
+        session.text_degradation, conversation.response_coherence,
+    )
+    cached = await sync_to_async(response_cache.lookup, thread_sensitive=False)(*key)
+
+    async def pieces():
+        if cached is not None:
+            yield cached
+        else:
+            async for piece in routing.astream(prompt, session, conversation.character_id):
+                yield piece
+
+    async def events():
+        original, degraded = [], []
+        complete = True
+        try:
+            async for piece in pieces():
+                original.append(piece)
+                degraded.append(_degrade_piece(piece, session.text_degradation))
+                yield _event('chunk', {'text': degraded[-1]})
+        except routing.UNAVAILABLE as exc:
+            complete = False
+            if not original:
+                original.append(settings.METERING_CONFIG['SILENCE'].format(name=conversation.character.name))
+                degraded.append(original[-1])
+                yield _event('chunk', {'text': original[-1]})
+            else:
+                yield _event('error', {'detail': str(exc)})
+
+        reply = ''.join(original)
+        if cached is None and complete:
+            await sync_to_async(response_cache.store, thread_sensitive=False)(*key, reply)
+
+        character_message = await sync_to_async(_store_streamed)(
+            session, conversation, window, content, reply, ''.join(degraded),
+        )
+        yield _event('done', _exchanged(session, content, character_message, prompt, cached is not None))
+
+    return events()
+
+
+def end_conversation(ctx: TurnContext, conversation: Conversation) -> Dict:
+    """End a conversation."""
+    conversation.is_active = False
+    conversation.ended_at = timezone.now()
+    conversation.save(update_fields=['is_active', 'ended_at'])
+
+    # Character forgets a little - along the world's memory curve, in this witness's world only
+    session = ctx.session
+    character = decay_over_nights(
+        session, 'character', conversation.character_id, session.night_count,
+        settings.GAME_CONFIG.get('CONVERSATION_NIGHTS', 0.4), ctx.curves, ctx.snapshot,
+    )
+
+    return {
+        "conversation_id": str(conversation.id),
+        "character_memory": character['memory_intact'] if character else None,
+        "message": f"{conversation.character.name} turns away, already forgetting."
+    }
+
+
+def conversation_context(conversation_id: str) -> TurnContext:
+    """A context for a request that names only a conversation."""
+    try:
+        conversation = (
+            Conversation.objects
+            .select_related('session__world', 'character', 'conversationcontext')
+            .get(id=conversation_id)
+        )
+    except Conversation.DoesNotExist:
+        raise Http404("No such conversation")
+
+    ctx = TurnContext(conversation.session)
+    ctx.remember(conversation)
+    return ctx
+
+
+async def aconversation_context(conversation_id: str) -> TurnContext:
+    """conversation_context for async views."""
+    try:
+        conversation = await (
+            Conversation.objects
+            .select_related('session__world', 'character', 'conversationcontext')
+            .aget(id=conversation_id)
+        )
+    except Conversation.DoesNotExist:
+        raise Http404("No such conversation")
+
+    ctx = TurnContext(conversation.session)
+    ctx.remember(conversation)
+    return ctx
@@ -0,0 +1,248 @@
+"""
+Tests for LLM routing, against local providers with scripted delays.
+Voices that answer late, or not at all, exactly when told to.
+"""
+
+import asyncio
+import time
+
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from . import providers, routing
+from .models import LLMProvider
+from .providers import Completion, OpenAIProvider, Provider
+from .routing import CLOSED, HALF_OPEN, OPEN, ProviderUnavailable, race
+
+
+class ScriptedProvider(Provider):
+    """Answers after each scripted delay in turn, or raises when the step is an exception."""
+
+    def __init__(self, name: str, *script):
+        super().__init__()
+        self.name = name
+        self.script = list(script)
+        self.calls = 0
+        self.cancelled = 0
+
+    async def complete(self, prompt):
+        step = self.script[min(self.calls, len(self.script) - 1)]
+        self.calls += 1
+        if isinstance(step, Exception):
+            raise step
+        try:
+            await asyncio.sleep(step)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return Completion(f"{self.name} answers")
+
+
+PROMPT = {'character': 'Hugo', 'system': '', 'messages': []}
+
+ROUTING = {
+    'HEDGING': True,
+    'WINDOW': 100,
+    'MIN_SAMPLES': 20,
+    'HEDGE_AFTER': 0.05,
+    'HEDGE_MIN': 0.01,
+    'CONSECUTIVE_FAILURES': 3,
+    'ERROR_THRESHOLD': 0.5,
+    'MIN_CALLS': 10,
+    'COOLDOWN': 0.1,
+}
+
+
+def run_race(*providers):
+    return asyncio.run(race(list(providers), PROMPT))
+
+
+@override_settings(ROUTING_CONFIG=ROUTING, LLM_CONFIG={**settings.LLM_CONFIG, 'TIMEOUT': 0.5})
+class RaceTests(SimpleTestCase):
+
+    def setUp(self):
+        routing.health.reset()
+
+    def test_fast_provider_is_not_hedged(self):
+        first, second = ScriptedProvider('first', 0.01), ScriptedProvider('second', 0.01)
+
+        provider, completion, seconds, hedged = run_race(first, second)
+
+        self.assertIs(provider, first)
+        self.assertEqual(completion.text, "first answers")
+        self.assertFalse(hedged)
+        self.assertEqual(second.calls, 0)
+
+    def test_slow_provider_is_hedged_and_the_loser_cancelled(self):
+        slow, fast = ScriptedProvider('slow', 0.3), ScriptedProvider('fast', 0.01)
+
+        provider, completion, seconds, hedged = run_race(slow, fast)
+
+        self.assertIs(provider, fast)
+        self.assertTrue(hedged)
+        self.assertEqual(slow.cancelled, 1)
+        self.assertEqual(routing.health.report()['slow']['hedges'], 1)
+
+    def test_cancelled_loser_counts_towards_latency(self):
+        slow, fast = ScriptedProvider('slow', 0.3), ScriptedProvider('fast', 0.01)
+
+        run_race(slow, fast)
+
+        report = routing.health.report()['slow']
+        self.assertEqual(report['samples'], 1)
+        self.assertEqual(report['error_rate'], 0.0)
+        self.assertGreaterEqual(report['p95_ms'], ROUTING['HEDGE_AFTER'] * 1000)
+
+    def test_error_fails_over_to_the_next_provider(self):
+        broken, working = ScriptedProvider('broken', RuntimeError("down")), ScriptedProvider('working', 0.01)
+
+        provider, completion, seconds, hedged = run_race(broken, working)
+
+        self.assertIs(provider, working)
+        self.assertFalse(hedged)
+        self.assertEqual(routing.health.report()['broken']['error_rate'], 1.0)
+
+    def test_timeout_fails_every_running_provider(self):
+        first, second = ScriptedProvider('first', 2.0), ScriptedProvider('second', 2.0)
+
+        started = time.monotonic()
+        with self.assertRaises(ProviderUnavailable):
+            run_race(first, second)
+
+        self.assertLess(time.monotonic() - started, 1.0)
+        self.assertEqual(first.cancelled + second.cancelled, 2)
+        report = routing.health.report()
+        self.assertEqual(report['first']['error_rate'], 1.0)
+        self.assertEqual(report['second']['error_rate'], 1.0)
+
+    def test_every_provider_failing_names_them_all(self):
+        first, second = ScriptedProvider('first', RuntimeError("a")), ScriptedProvider('second', ValueError("b"))
+
+        with self.assertRaisesMessage(ProviderUnavailable, "first"):
+            run_race(first, second)
+        self.assertEqual(second.calls, 1)
+
+
+@override_settings(ROUTING_CONFIG=ROUTING, LLM_CONFIG={**settings.LLM_CONFIG, 'TIMEOUT': 0.5})
+class CircuitBreakerTests(SimpleTestCase):
+
+    def setUp(self):
+        routing.health.reset()
+
+    def state(self, name):
+        return routing.health.report()[name]['state']
+
+    def test_consecutive_failures_open_the_breaker(self):
+        broken = ScriptedProvider('broken', RuntimeError("down"))
+
+        for _ in range(ROUTING['CONSECUTIVE_FAILURES']):
+            with self.assertRaises(ProviderUnavailable):
+                run_race(broken)
+
+        self.assertEqual(self.state('broken'), OPEN)
+        self.assertFalse(routing.health.available('broken'))
+
+    def test_half_open_failure_reopens(self):
+        broken = ScriptedProvider('broken', RuntimeError("down"))
+        for _ in range(ROUTING['CONSECUTIVE_FAILURES']):
+            with self.assertRaises(ProviderUnavailable):
+                run_race(broken)
+
+        time.sleep(ROUTING['COOLDOWN'])
+        self.assertTrue(routing.health.available('broken'))
+        self.assertEqual(self.state('broken'), HALF_OPEN)
+
+        # One failure is enough to send a half-open provider back out
+        with self.assertRaises(ProviderUnavailable):
+            run_race(broken)
+        self.assertEqual(self.state('broken'), OPEN)
+        self.assertFalse(routing.health.available('broken'))
+
+    def test_half_open_success_closes(self):
+        flaky = ScriptedProvider('flaky', *[RuntimeError("down")] * ROUTING['CONSECUTIVE_FAILURES'], 0.01)
+        for _ in range(ROUTING['CONSECUTIVE_FAILURES']):
+            with self.assertRaises(ProviderUnavailable):
+                run_race(flaky)
+
+        time.sleep(ROUTING['COOLDOWN'])
+        self.assertTrue(routing.health.available('flaky'))
+
+        provider, completion, seconds, hedged = run_race(flaky)
+        self.assertIs(provider, flaky)
+        self.assertEqual(self.state('flaky'), CLOSED)
+
+    def test_cancelled_calls_pass_no_verdict(self):
+        broken = ScriptedProvider('broken', RuntimeError("down"))
+        for _ in range(ROUTING['CONSECUTIVE_FAILURES'] - 1):
+            with self.assertRaises(ProviderUnavailable):
+                run_race(broken)
+
+        # A hedged loser neither resets nor adds to the failures in a row
+        routing.health.record('broken', 0.2, ok=None)
+        with self.assertRaises(ProviderUnavailable):
+            run_race(broken)
+        self.assertEqual(self.state('broken'), OPEN)
+
+
+class CountingProvider(OpenAIProvider):
+    """Builds a stand-in for the SDK client, counting how often it has to."""
+
+    def __init__(self, config=None):
+        super().__init__(config)
+        self.connected = []
+
+    def _connect(self, **options):
+        self.connected.append(options)
+        return object()
+
+
+class ProviderClientTests(TestCase):
+
+    def setUp(self):
+        self.row = LLMProvider.objects.create(
+            name='local', provider_type='local', endpoint='http://localhost:8001/v1', model_name='mock',
+        )
+
+    def clients(self, provider, calls=2):
+        async def use():
+            return [provider.client() for _ in range(calls)]
+        return asyncio.run(use())
+
+    def test_client_is_reused_and_never_retries(self):
+        provider = CountingProvider(self.row)
+
+        first, second = self.clients(provider)
+
+        self.assertIs(first, second)
+        self.assertEqual(len(provider.connected), 1)
+        self.assertEqual(provider.connected[0]['max_retries'], 0)
+
+    def test_each_event_loop_gets_its_own_client(self):
+        provider = CountingProvider(self.row)
+
+        self.clients(provider)
+        self.clients(provider)
+
+        self.assertEqual(len(provider.connected), 2)
+
+    def test_changed_endpoint_reconnects(self):
+        provider = CountingProvider(self.row)
+
+        async def use():
+            first = provider.client()
+            provider.config.endpoint = 'http://localhost:8002/v1'
+            return first, provider.client()
+
+        first, second = asyncio.run(use())
+
+        self.assertIsNot(first, second)
+        self.assertEqual(provider.connected[1]['base_url'], 'http://localhost:8002/v1')
+
+    def test_reloaded_pool_keeps_its_providers(self):
+        first = providers._load_pool()
+        LLMProvider.objects.filter(id=self.row.id).update(model_name='mock-2')
+
+        second = providers._load_pool(first)
+
+        self.assertIs(second[0], first[0])
+        self.assertEqual(second[0].config.model_name, 'mock-2')
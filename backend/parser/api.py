@@ -6,6 +6,7 @@ from ninja import Router
 from ninja.files import UploadedFile
 from typing import Optional
 from .models import ParseSession, ExtractedEntity
+from . import ner
 import uuid
 
 router = Router()
@@ -56,6 +57,7 @@ def get_parse_status(request, session_id: str):
             "resources": session.resources_defined,
             "world": session.world_created,
         },
+        "extraction_status": session.extraction_status or None,
         "entity_count": session.extracted_entities.count(),
         "world_id": str(session.world.id) if session.world else None,
         "error": session.error_log if session.error_log else None,
@@ -63,21 +65,20 @@ def get_parse_status(request, session_id: str):
 
 
 @router.post("/{session_id}/extract")
-def extract_entities(request, session_id: str):
-    """Extract entities from source material."""
+def extract_entities(request, session_id: str, model: Optional[str] = None):
+    """Queue entity extraction from source material (named-entity recognition); follow it at /status."""
     session = ParseSession.objects.get(id=session_id)
     
-    # Placeholder for actual extraction logic
-    # This would use NLP/LLM to extract entities
-    
-    session.extraction_complete = True
-    session.entities_identified = True
-    session.save()
+    try:
+        queued = ner.submit(session, model=model)
+    except ValueError as exc:
+        return {"error": str(exc)}
     
+    session.refresh_from_db(fields=['extraction_status'])
     return {
         "session_id": str(session.id),
-        "status": "extracted",
-        "message": "Entities extracted from source material."
+        "status": session.extraction_status,
+        "message": "Extraction queued." if queued else "Extraction is already under way."
     }
 
 
@@ -93,6 +94,7 @@ def get_extracted_entities(request, session_id: str):
             "name": e.name,
             "description": e.description,
             "importance": e.importance_score,
+            "mentions": len(e.mentions),
             "is_witness_candidate": e.is_witness_candidate,
         }
         for e in entities
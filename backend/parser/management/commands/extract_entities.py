@@ -0,0 +1,72 @@
+"""
+Management command to run named-entity extraction on a parse session or a file.
+Read the whole book in the dark, and come back with names.
+"""
+
+from pathlib import Path
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from parser import ner
+from parser.models import ParseSession
+
+
+class Command(BaseCommand):
+    help = 'Extract character, location and institution candidates with spaCy NER'
+
+    def add_arguments(self, parser):
+        parser.add_argument('session', nargs='?', help="Parse session id; its candidates are stored")
+        parser.add_argument('--file', help="Extract from a text file instead, storing nothing")
+        parser.add_argument('--model', help="spaCy model (default: NER_CONFIG['MODEL'], others from NER_CONFIG['MODELS'])")
+        parser.add_argument('--n-process', type=int, default=None, help="Processes for nlp.pipe")
+        parser.add_argument('--batch-size', type=int, default=None, help="Chunks per nlp.pipe batch")
+        parser.add_argument('--top', type=int, default=20, help="Candidates to list")
+
+    def handle(self, *args, **options):
+        if bool(options['session']) == bool(options['file']):
+            raise CommandError("Give a session id or --file, not both")
+
+        try:
+            if options['file']:
+                self._file(Path(options['file']), options)
+            else:
+                self._session(options['session'], options)
+        except (ImportError, OSError, ValueError) as exc:
+            raise CommandError(f"NER unavailable: {exc}")
+
+    def _file(self, path: Path, options):
+        text = path.read_text(encoding='utf-8', errors='replace')
+        ner.get_nlp(options['model'])  # Loading the model is not part of the throughput
+        started = time.perf_counter()
+        candidates = ner.extract(
+            text, model=options['model'], batch_size=options['batch_size'], n_process=options['n_process'],
+        )
+        seconds = time.perf_counter() - started
+
+        self.stdout.write(
+            f"{len(candidates)} candidates from {len(text):,} characters in {seconds:.1f}s "
+            f"({len(text) / seconds if seconds else 0:,.0f} characters/s)"
+        )
+        for candidate in candidates[:options['top']]:
+            self.stdout.write(
+                f"  {candidate['entity_type']:<12} {candidate['name']:<40} "
+                f"{candidate['mention_count']:>5} mentions  importance {candidate['importance']:.2f}"
+            )
+
+    def _session(self, session_id: str, options):
+        try:
+            session = ParseSession.objects.get(id=session_id)
+        except (ParseSession.DoesNotExist, ValueError):
+            raise CommandError(f"No parse session {session_id}")
+
+        result = ner.extract_session(
+            session, model=options['model'], batch_size=options['batch_size'], n_process=options['n_process'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['entities']} candidates stored for '{session.world_name}' "
+            f"({', '.join(f'{n} {t}' for t, n in sorted(result['by_type'].items())) or 'none'}) "
+            f"from {result['characters']:,} characters in {result['seconds']}s"
+        ))
+        for entity in session.extracted_entities.filter(properties__source=ner.SOURCE).order_by('-importance_score')[:options['top']]:
+            self.stdout.write(f"  {entity.entity_type:<12} {entity.name:<40} {len(entity.mentions):>5} mentions")
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.11 on 2026-10-19 07:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parser', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='extractedentity',
+            name='entity_type',
+            field=models.CharField(choices=[('character', 'Character'), ('location', 'Location'), ('institution', 'Institution'), ('object', 'Object'), ('event', 'Event'), ('concept', 'Concept'), ('treaty', 'Treaty/Agreement')], max_length=50),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.11 on 2026-10-19 07:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parser', '0002_entity_institution'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='parsesession',
+            name='extraction_status',
+            field=models.CharField(blank=True, choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], max_length=20),
+        ),
+    ]
@@ -49,6 +49,18 @@ class ParseSession(models.Model):
     resources_defined = models.BooleanField(default=False)
     world_created = models.BooleanField(default=False)
     
+    # Named-entity extraction runs in the background (parser.ner.submit)
+    extraction_status = models.CharField(
+        max_length=20,
+        choices=[
+            ('queued', 'Queued'),
+            ('running', 'Running'),
+            ('done', 'Done'),
+            ('failed', 'Failed'),
+        ],
+        blank=True,
+    )
+    
     # Extracted data
     extracted_text = models.TextField(blank=True)
     entities = models.JSONField(default=dict)
@@ -83,6 +95,7 @@ class ExtractedEntity(models.Model):
         choices=[
             ('character', 'Character'),
             ('location', 'Location'),
+            ('institution', 'Institution'),
             ('object', 'Object'),
             ('event', 'Event'),
             ('concept', 'Concept'),
@@ -0,0 +1,272 @@
+"""
+Named-entity extraction for parse sessions, with spaCy.
+A first pass in the dark: who is named, where they stand, whose banner they serve.
+
+The source text is cut into chunks at paragraph breaks and run through
+nlp.pipe in batches (and across N_PROCESS processes when asked), with every
+pipeline component but the entity recognizer disabled. Entities are mapped to
+ExtractedEntity candidates:
+
+    PERSON             -> character
+    GPE, LOC, FAC      -> location
+    ORG                -> institution
+
+Mentions of the same name are gathered into one candidate with their offsets
+in the source text; a name tagged differently in different places takes its
+most frequent type. Importance grows with the log of a candidate's mentions,
+relative to the most mentioned one. This pass is local and needs no LLM: a
+small model gets through a novel in about a minute per core, and later stages
+refine what it found.
+
+Requests do not wait for it. submit() queues a session on a single background
+worker per process and ParseSession.extraction_status follows it; the
+extract_entities command runs it in the foreground. Only the models named in
+NER_CONFIG (MODEL and MODELS) are loaded, so each process holds a known few.
+"""
+
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Tuple
+import logging
+import math
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from endless_nights.lazy import lazy_import
+from .models import ExtractedEntity, ParseSession
+
+spacy = lazy_import('spacy')
+
+logger = logging.getLogger(__name__)
+
+# spaCy entity label -> ExtractedEntity.entity_type
+LABELS = {
+    'PERSON': 'character',
+    'GPE': 'location',
+    'LOC': 'location',
+    'FAC': 'location',
+    'ORG': 'institution',
+}
+
+SOURCE = 'ner'
+
+_models: Dict[str, object] = {}
+_lock = threading.Lock()
+_executor = None
+
+
+def _config(name: str, default):
+    return getattr(settings, 'NER_CONFIG', {}).get(name, default)
+
+
+def resolve_model(model: str = None) -> str:
+    """The model to use, the default if none is given; raises ValueError for one not configured."""
+    default = _config('MODEL', 'en_core_web_sm')
+    model = model or default
+    if model != default and model not in _config('MODELS', ()):
+        raise ValueError(f"Unknown NER model {model!r}; add it to NER_CONFIG['MODELS'] first")
+    return model
+
+
+def get_nlp(model: str = None):
+    """
+    The pipeline for `model`, loaded once per process with only the entity
+    recognizer (and what feeds it) enabled. Raises ValueError for a model not
+    configured, ImportError without spaCy and OSError without the model.
+    """
+    model = resolve_model(model)
+    if model not in _models:
+        with _lock:
+            if model not in _models:
+                nlp = spacy.load(model)
+                keep = [name for name in _config('KEEP', ('tok2vec', 'ner')) if name in nlp.pipe_names]
+                nlp.select_pipes(enable=keep)
+                nlp.max_length = max(nlp.max_length, _config('CHUNK_CHARS', 10000) * 2)
+                _models[model] = nlp
+    return _models[model]
+
+
+def chunks(text: str, size: int = None) -> Iterator[Tuple[str, int]]:
+    """(chunk, offset) pieces of at most `size` characters, cut at paragraph breaks, or spaces when they must."""
+    size = size or _config('CHUNK_CHARS', 10000)
+    start = 0
+    while start < len(text):
+        end = min(len(text), start + size)
+        if end < len(text):
+            cut = text.rfind('\n\n', start, end)
+            if cut <= start:
+                cut = text.rfind(' ', start, end)
+            if cut > start:
+                end = cut
+        yield text[start:end], start
+        start = end
+
+
+def _name(text: str) -> str:
+    name = re.sub(r'\s+', ' ', text).strip()
+    name = re.sub(r'^(the|a|an) ', '', name, flags=re.IGNORECASE)
+    return re.sub(r"['’]s$", '', name).strip(" \"'“”‘’.,;:")
+
+
+def _context(text: str, start: int, end: int, width: int = 80) -> str:
+    """The mention with some of the text around it, for a first description."""
+    left, right = max(0, start - width), end + width
+    snippet = text[left:right]
+    # Whole words only at either end
+    if left > 0:
+        snippet = snippet.split(' ', 1)[-1]
+    if right < len(text):
+        snippet = snippet.rsplit(' ', 1)[0]
+    return re.sub(r'\s+', ' ', snippet).strip()
+
+
+def extract(text: str, model: str = None, batch_size: int = None, n_process: int = None) -> List[Dict]:
+    """Entity candidates found in `text`, most mentioned first."""
+    nlp = get_nlp(model)
+    found: Dict[str, Dict] = {}
+
+    docs = nlp.pipe(
+        chunks(text),
+        as_tuples=True,
+        batch_size=batch_size or _config('BATCH_SIZE', 32),
+        n_process=n_process or _config('N_PROCESS', 1),
+    )
+    for doc, offset in docs:
+        for ent in doc.ents:
+            if ent.label_ not in LABELS:
+                continue
+            name = _name(ent.text)
+            if len(name) < _config('MIN_LENGTH', 2):
+                continue
+            candidate = found.setdefault(name.casefold(), {'names': Counter(), 'labels': Counter(), 'mentions': []})
+            candidate['names'][name] += 1
+            candidate['labels'][ent.label_] += 1
+            candidate['mentions'].append((offset + ent.start_char, offset + ent.end_char))
+
+    candidates = []
+    min_mentions = _config('MIN_MENTIONS', 1)
+    for candidate in found.values():
+        mentions = candidate['mentions']
+        if len(mentions) < min_mentions:
+            continue
+        label = candidate['labels'].most_common(1)[0][0]
+        start, end = mentions[0]
+        candidates.append({
+            'entity_type': LABELS[label],
+            'name': candidate['names'].most_common(1)[0][0],
+            'labels': dict(candidate['labels']),
+            'mention_count': len(mentions),
+            'mentions': [{'start': s, 'end': e} for s, e in mentions[:_config('MAX_MENTIONS', 200)]],
+            'context': _context(text, start, end),
+        })
+
+    candidates.sort(key=lambda c: (-c['mention_count'], c['name']))
+    most = candidates[0]['mention_count'] if candidates else 1
+    for candidate in candidates:
+        # Log-scaled, so a name met a handful of times is not lost beside the protagonist
+        candidate['importance'] = round(math.log1p(candidate['mention_count']) / math.log1p(most), 3)
+    return candidates
+
+
+def source_text(session: ParseSession) -> str:
+    """The text a session parses: what was extracted from its source, or the source itself."""
+    if session.extracted_text:
+        return session.extracted_text
+    if session.source_text:
+        return session.source_text
+    if session.source_file and session.source_type in ('txt', 'manual'):
+        with session.source_file.open('rb') as f:
+            return f.read().decode('utf-8', errors='replace')
+    return ''
+
+
+def extract_session(session: ParseSession, model: str = None, batch_size: int = None, n_process: int = None) -> Dict:
+    """
+    Run NER over a session's source and store its candidates, replacing those
+    of an earlier run; returns counts per entity type and the throughput.
+    """
+    text = source_text(session)
+    model = resolve_model(model)
+    started = time.perf_counter()
+    candidates = extract(text, model=model, batch_size=batch_size, n_process=n_process)
+    seconds = time.perf_counter() - started
+
+    with transaction.atomic():
+        session.extracted_entities.filter(properties__source=SOURCE).delete()
+        ExtractedEntity.objects.bulk_create([
+            ExtractedEntity(
+                session=session,
+                entity_type=candidate['entity_type'],
+                name=candidate['name'][:200],
+                description=candidate['context'],
+                properties={
+                    'source': SOURCE,
+                    'model': model,
+                    'labels': candidate['labels'],
+                    'mention_count': candidate['mention_count'],
+                },
+                mentions=candidate['mentions'],
+                importance_score=candidate['importance'],
+            )
+            for candidate in candidates
+        ], batch_size=500)
+
+        counts = Counter(candidate['entity_type'] for candidate in candidates)
+        session.extracted_text = text
+        session.entities = {**session.entities, SOURCE: dict(counts)}
+        session.extraction_complete = True
+        session.entities_identified = bool(candidates)
+        session.extraction_status = 'done'
+        session.save(update_fields=[
+            'extracted_text', 'entities', 'extraction_complete', 'entities_identified', 'extraction_status',
+        ])
+
+    return {
+        'entities': len(candidates),
+        'by_type': dict(counts),
+        'characters': len(text),
+        'seconds': round(seconds, 3),
+        'chars_per_second': round(len(text) / seconds) if seconds else None,
+    }
+
+
+def _worker() -> ThreadPoolExecutor:
+    """One extraction at a time per process, started on first use."""
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ner')
+    return _executor
+
+
+def _run(session_id, model: str):
+    ParseSession.objects.filter(id=session_id).update(extraction_status='running')
+    try:
+        extract_session(ParseSession.objects.get(id=session_id), model=model)
+    except Exception as exc:
+        # Missing spaCy or model included; the session says why
+        logger.exception("NER failed for parse session %s", session_id)
+        ParseSession.objects.filter(id=session_id).update(extraction_status='failed', error_log=f"NER failed: {exc}")
+    finally:
+        close_old_connections()
+
+
+def submit(session: ParseSession, model: str = None) -> bool:
+    """
+    Queue extraction of a session on the background worker; False when it is
+    already queued or running. Raises ValueError for a model not configured.
+    """
+    model = resolve_model(model)
+    queued = (
+        ParseSession.objects.filter(id=session.id)
+        .exclude(extraction_status__in=('queued', 'running'))
+        .update(extraction_status='queued', error_log='')
+    )
+    if queued:
+        transaction.on_commit(lambda: _worker().submit(_run, session.id, model))
+    return bool(queued)
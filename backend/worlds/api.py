@@ -3,8 +3,12 @@ API endpoints for world management.
 """
 
 from ninja import Router
-from typing import List
-from .models import World, Location, Character, Object, Treaty
+from typing import List, Optional
+from django.shortcuts import get_object_or_404
+from endless_nights.caching import read_through, world_namespace
+from .models import World, Location, Character, Object, Treaty, Element
+from .elements import element_to_dict
+from .relations import neighbourhood, strongest_ties, traverse_strongest, relation_counts
 
 router = Router()
 
@@ -28,19 +32,22 @@ def list_worlds(request):
 @router.get("/{world_id}")
 def get_world(request, world_id: str):
     """Get detailed world information."""
-    world = World.objects.get(id=world_id)
-    return {
-        "id": str(world.id),
-        "name": world.name,
-        "description": world.description,
-        "witness_config": world.witness_config,
-        "resource_types": world.resource_types,
-        "degradation_pattern": world.degradation_pattern,
-        "hidden_truth": world.hidden_truth,
-        "locations": world.locations.count(),
-        "characters": world.characters.count(),
-        "objects": world.objects.count(),
-    }
+    def load():
+        world = get_object_or_404(World, id=world_id)
+        return {
+            "id": str(world.id),
+            "name": world.name,
+            "description": world.description,
+            "witness_config": world.witness_config,
+            "resource_types": world.resource_types,
+            "degradation_pattern": world.degradation_pattern,
+            "hidden_truth": world.hidden_truth,
+            "locations": world.locations.count(),
+            "characters": world.characters.count(),
+            "objects": world.world_objects.count(),
+        }
+    
+    return read_through('world_detail', load, namespaces=[world_namespace(world_id)], world_id=world_id)
 
 
 @router.get("/{world_id}/locations")
@@ -75,4 +82,33 @@ def get_characters(request, world_id: str):
             "memory_intact": char.memory_intact,
         }
         for char in characters
-    ]
\ No newline at end of file
+    ]
+
+@router.get("/{world_id}/elements")
+def get_elements(request, world_id: str, element_type: Optional[str] = None):
+    """Get the schema-validated OnlyWorlds elements of a world."""
+    elements = Element.objects.filter(world_id=world_id).prefetch_related('links')
+    if element_type:
+        elements = elements.filter(element_type=element_type)
+    
+    return [element_to_dict(element) for element in elements]
+
+
+@router.get("/{world_id}/relations/counts")
+def get_relation_counts(request, world_id: str):
+    """How many relations each character is caught up in."""
+    return relation_counts(world_id)
+
+
+@router.get("/{world_id}/relations/{element_id}/neighbourhood")
+def get_relation_neighbourhood(request, world_id: str, element_id: str, hops: int = 1):
+    """Everything within a few relation steps of an element."""
+    return neighbourhood(world_id, element_id, hops=max(1, min(hops, 4)))
+
+
+@router.get("/{world_id}/relations/{element_id}/ties")
+def get_relation_ties(request, world_id: str, element_id: str, limit: int = 10, traverse: bool = False):
+    """Strongest ties first - direct, or walking outward along them."""
+    if traverse:
+        return traverse_strongest(world_id, element_id, max_nodes=limit)
+    return strongest_ties(world_id, element_id, limit=limit)
@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+
+
+class WorldsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'worlds'
+
+    def ready(self):
+        from .snapshot import connect_signals
+        connect_signals()
+        
+        from endless_nights import caching
+        caching.connect_signals()
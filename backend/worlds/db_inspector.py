@@ -5,7 +5,9 @@ Allows peeking into the database and loading fixtures through UI
 
 from ninja import Router, Schema
 from typing import List, Dict, Any, Optional
+from django.conf import settings
 from django.db import connection
+from django.http import HttpResponse
 from django.core import serializers
 from django.core.management import call_command
 from django.db.models import Count, Q
@@ -14,6 +16,8 @@ import os
 from pathlib import Path
 from datetime import datetime
 
+from endless_nights import instrumentation, warmup
+from endless_nights.caching import read_through, cache_stats, world_namespace, WORLDS_NAMESPACE
 from worlds.models import World, Character, Location, Object as WorldObject, Treaty
 from game.models import GameSession, Knowledge, Discovery
 from parser.models import ParseSession, ExtractedEntity
@@ -125,85 +129,120 @@ def get_database_stats(request):
     return stats
 
 
+@router.get("/cache-stats")
+def get_cache_stats(request):
+    """Cache hit/miss metrics for this process."""
+    return cache_stats()
+
+
+@router.get("/metrics")
+def get_request_metrics(request, format: str = "json"):
+    """Per-route request cost histograms for this process."""
+    if format == "prometheus" and settings.REQUEST_METRICS.get('PROMETHEUS', True):
+        return HttpResponse(
+            instrumentation.registry.to_prometheus(),
+            content_type='text/plain; version=0.0.4',
+        )
+    return instrumentation.registry.to_dict()
+
+
+@router.get("/warmup")
+def get_warmup(request):
+    """What was preloaded before this worker was forked, and its memory footprint."""
+    return warmup.report()
+
+
 @router.get("/worlds", response=List[WorldSummary])
 def list_worlds(request):
     """List all worlds with summary information."""
-    worlds = []
+    def load():
+        worlds = []
     
-    for world in World.objects.all():
-        degradation = world.degradation_pattern or {}
+        for world in World.objects.all():
+            degradation = world.degradation_pattern or {}
         
-        worlds.append({
-            'id': str(world.id),
-            'name': world.name,
-            'description': world.description,
-            'character_count': world.characters.count(),
-            'location_count': world.locations.count(),
-            'object_count': world.world_objects.count(),
-            'treaty_count': world.treaties.count(),
-            'created_at': world.created_at,
-            'hidden_truth': world.hidden_truth,
-            'degradation_speed': degradation.get('speed', 1.0),
-        })
+            worlds.append({
+                'id': str(world.id),
+                'name': world.name,
+                'description': world.description,
+                'character_count': world.characters.count(),
+                'location_count': world.locations.count(),
+                'object_count': world.world_objects.count(),
+                'treaty_count': world.treaties.count(),
+                'created_at': world.created_at,
+                'hidden_truth': world.hidden_truth,
+                'degradation_speed': degradation.get('speed', 1.0),
+            })
+    
+        return worlds
     
-    return worlds
+    return read_through('inspector_worlds', load, namespaces=[WORLDS_NAMESPACE])
 
 
 @router.get("/world/{world_id}/characters", response=List[CharacterDetail])
 def get_world_characters(request, world_id: str):
     """Get all characters in a specific world."""
-    characters = []
+    def load():
+        characters = []
     
-    for char in Character.objects.filter(world_id=world_id):
-        characters.append({
-            'id': str(char.id),
-            'name': char.name,
-            'description': char.description,
-            'power_level': char.power_level,
-            'is_witness_candidate': char.is_witness_candidate,
-            'memory_intact': char.memory_intact,
-            'alive': char.alive,
-            'known_truths': char.known_truths,
-        })
+        for char in Character.objects.filter(world_id=world_id):
+            characters.append({
+                'id': str(char.id),
+                'name': char.name,
+                'description': char.description,
+                'power_level': char.power_level,
+                'is_witness_candidate': char.is_witness_candidate,
+                'memory_intact': char.memory_intact,
+                'alive': char.alive,
+                'known_truths': char.known_truths,
+            })
+    
+        return characters
     
-    return characters
+    return read_through('inspector_characters', load, namespaces=[world_namespace(world_id)], world_id=world_id)
 
 
 @router.get("/world/{world_id}/locations", response=List[LocationDetail])
 def get_world_locations(request, world_id: str):
     """Get all locations in a specific world."""
-    locations = []
+    def load():
+        locations = []
     
-    for loc in Location.objects.filter(world_id=world_id):
-        locations.append({
-            'id': str(loc.id),
-            'name': loc.name,
-            'description': loc.description,
-            'integrity': loc.integrity,
-            'color_saturation': loc.color_saturation,
-            'clarity': loc.clarity,
-            'witness_count': loc.witness_count,
-        })
+        for loc in Location.objects.filter(world_id=world_id):
+            locations.append({
+                'id': str(loc.id),
+                'name': loc.name,
+                'description': loc.description,
+                'integrity': loc.integrity,
+                'color_saturation': loc.color_saturation,
+                'clarity': loc.clarity,
+                'witness_count': loc.witness_count,
+            })
     
-    return locations
+        return locations
+    
+    return read_through('inspector_locations', load, namespaces=[world_namespace(world_id)], world_id=world_id)
 
 
 @router.get("/world/{world_id}/objects", response=List[ObjectDetail])
 def get_world_objects(request, world_id: str):
     """Get all objects in a specific world."""
-    objects = []
+    def load():
+        objects = []
     
-    for obj in WorldObject.objects.filter(world_id=world_id):
-        objects.append({
-            'id': str(obj.id),
-            'name': obj.name,
-            'description': obj.description,
-            'weight': obj.weight,
-            'resource_type': obj.resource_type,
-            'condition': obj.condition,
-        })
+        for obj in WorldObject.objects.filter(world_id=world_id):
+            objects.append({
+                'id': str(obj.id),
+                'name': obj.name,
+                'description': obj.description,
+                'weight': obj.weight,
+                'resource_type': obj.resource_type,
+                'condition': obj.condition,
+            })
+    
+        return objects
     
-    return objects
+    return read_through('inspector_objects', load, namespaces=[world_namespace(world_id)], world_id=world_id)
 
 
 @router.get("/fixtures", response=List[FixtureInfo])
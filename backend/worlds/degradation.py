@@ -0,0 +1,128 @@
+"""
+Degradation curves compiled from a world's degradation_pattern.
+The state of night N is a function of N, not of every night before it.
+
+A pattern such as {'stages': [...], 'speed': 1.0, 'entropy_rate': 0.01}
+compiles into piecewise-linear curves: each stage covers an equal slice of
+the decline and may run faster or slower (`stage_multipliers`). Breakpoints
+are precomputed once, so the amount lost after any number of nights is a
+bisect over a handful of stages - skipping ahead K nights costs the same as
+skipping one.
+"""
+
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+import json
+
+
+DEFAULT_ENTROPY_RATE = 0.01
+
+# Per-night losses at speed 1.0 and entropy_rate 0.01 - the original fixed increments
+SESSION_RATES = {
+    'world_entropy': 0.01,
+    'text_degradation': 0.02,
+    'color_loss': 0.015,
+}
+
+ELEMENT_RATES = {
+    'location': {'integrity': 0.01, 'color_saturation': 0.005, 'clarity': 0.003},
+    'character': {'memory_intact': 0.05},
+    'object': {'condition': 0.02},
+    'treaty': {'strength': 0.03},
+}
+
+
+class DegradationCurve:
+    """How much of a quantity is lost after n nights, in closed form."""
+
+    __slots__ = ('rate', 'multipliers', 'breakpoints', 'nights_at')
+
+    def __init__(self, rate: float, multipliers: Tuple[float, ...]):
+        self.rate = rate
+        self.multipliers = multipliers
+
+        stage_span = 1.0 / len(multipliers)
+        self.breakpoints = tuple(i * stage_span for i in range(len(multipliers) + 1))
+
+        # Night at which each stage begins; a stalled stage never ends
+        nights_at = [0.0]
+        for multiplier in multipliers:
+            stage_rate = rate * multiplier
+            nights_at.append(nights_at[-1] + stage_span / stage_rate if stage_rate > 0 else float('inf'))
+        self.nights_at = tuple(nights_at)
+
+    def amount(self, nights: float) -> float:
+        """Total loss after `nights` nights, between 0 and 1."""
+        if nights <= 0 or self.rate <= 0:
+            return 0.0
+        stage = min(bisect_right(self.nights_at, nights) - 1, len(self.multipliers) - 1)
+        lost = self.breakpoints[stage] + (nights - self.nights_at[stage]) * self.rate * self.multipliers[stage]
+        return min(1.0, lost)
+
+    def delta(self, from_night: float, nights: float) -> float:
+        """Loss between night `from_night` and `from_night + nights`."""
+        return self.amount(from_night + nights) - self.amount(from_night)
+
+    def stage(self, nights: float) -> int:
+        """Index of the stage the quantity is in after `nights` nights."""
+        if nights <= 0:
+            return 0
+        return min(bisect_right(self.nights_at, nights) - 1, len(self.multipliers) - 1)
+
+
+class WorldDegradation:
+    """All curves for one world, compiled from its degradation_pattern."""
+
+    def __init__(self, pattern: Dict):
+        pattern = pattern or {}
+        self.stages = tuple(pattern.get('stages') or ['decline'])
+
+        multipliers = tuple(pattern.get('stage_multipliers') or [1.0] * len(self.stages))
+        if len(multipliers) != len(self.stages):
+            multipliers = (multipliers + (1.0,) * len(self.stages))[:len(self.stages)]
+
+        scale = float(pattern.get('speed', 1.0)) * (
+            float(pattern.get('entropy_rate', DEFAULT_ENTROPY_RATE)) / DEFAULT_ENTROPY_RATE
+        )
+        self.scale = scale
+
+        self.session_curves = {
+            field: DegradationCurve(rate * scale, multipliers)
+            for field, rate in SESSION_RATES.items()
+        }
+        self.element_curves = {
+            element_type: {
+                field: DegradationCurve(rate * scale, multipliers)
+                for field, rate in rates.items()
+            }
+            for element_type, rates in ELEMENT_RATES.items()
+        }
+
+    def session_state(self, night: int) -> Dict:
+        """Session degradation on night `night` (night 1 is pristine)."""
+        elapsed = max(0, night - 1)
+        state = {
+            field: round(curve.amount(elapsed), 6)
+            for field, curve in self.session_curves.items()
+        }
+        state['stage'] = self.stages[self.session_curves['world_entropy'].stage(elapsed)]
+        return state
+
+    def element_deltas(self, element_type: str, from_night: int, nights: int) -> Dict[str, float]:
+        """How much each field of an element loses over `nights` nights."""
+        elapsed = max(0, from_night - 1)
+        return {
+            field: curve.delta(elapsed, nights)
+            for field, curve in self.element_curves[element_type].items()
+        }
+
+
+@lru_cache(maxsize=256)
+def _compile(pattern_json: str) -> WorldDegradation:
+    return WorldDegradation(json.loads(pattern_json))
+
+
+def compile_pattern(pattern: Optional[Dict]) -> WorldDegradation:
+    """Compiled curves for a degradation_pattern, shared between identical patterns."""
+    return _compile(json.dumps(pattern or {}, sort_keys=True))
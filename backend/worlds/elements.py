@@ -0,0 +1,157 @@
+"""
+Storage for schema-validated OnlyWorlds elements.
+Every element type lands in the same table; links get their own indexed rows.
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+from django.db import transaction
+
+from .models import World, Element, ElementLink
+from .schema import BASE_FIELDS, get_schema, validate_elements
+from .relations import store_relations
+
+
+# Keeps IN (...) lists well under SQLite's variable limit
+CHUNK_SIZE = 900
+
+
+def _chunks(items: List, size: int = CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _build_rows(world: World, schema, element):
+    """Split a validated element into its Element row and ElementLink rows."""
+    data = element.model_dump()
+
+    row = Element(
+        id=data['id'],
+        world=world,
+        element_type=schema.element_type,
+        name=data['name'],
+        description=data.get('description') or '',
+        supertype=data.get('supertype') or '',
+        subtype=data.get('subtype') or '',
+        image_url=data.get('image_url') or '',
+        fields={
+            name: data[name]
+            for name in schema.scalars
+            if data.get(name) is not None
+        },
+    )
+
+    links = []
+    for field, (kind, category) in schema.links.items():
+        value = data.get(field)
+        if not value:
+            continue
+
+        if kind == 'generic-link':
+            # The category is carried by a sibling field on the element itself
+            target_type = (data.get(category) or '').lower()
+        else:
+            target_type = category
+
+        targets = value if kind == 'multi-link' else [value]
+        for position, target_id in enumerate(targets):
+            links.append(ElementLink(
+                element_id=row.id,
+                field=field,
+                target_type=target_type,
+                target_id=target_id,
+                position=position,
+            ))
+
+    return row, links
+
+
+def store_elements(
+    world: World,
+    elements: Iterable[Dict],
+    default_type: Optional[str] = None,
+    batch_size: int = 2000,
+) -> Dict:
+    """
+    Validate and store elements in the generic element table.
+
+    Existing elements with the same id are replaced along with their links,
+    so re-importing a world is idempotent. Ids are global: an element whose
+    id already belongs to another world is reported as an error, not moved.
+    """
+    valid, errors = validate_elements(elements, world_id=str(world.id), default_type=default_type)
+
+    rows = []
+    links = []
+    relations = []
+    for schema, element in valid:
+        row, element_links = _build_rows(world, schema, element)
+        rows.append(row)
+        links.extend(element_links)
+        if schema.element_type == 'relation':
+            relations.append(element.model_dump())
+
+    update_fields = [f for f in BASE_FIELDS if f not in ('id', 'world')] + ['element_type', 'fields']
+
+    with transaction.atomic():
+        taken = set()
+        for chunk in _chunks([row.id for row in rows]):
+            taken.update(
+                Element.objects.filter(id__in=chunk).exclude(world=world).values_list('id', flat=True)
+            )
+        if taken:
+            errors.extend(
+                f"{row.name} ({row.element_type}): id {row.id} belongs to another world"
+                for row in rows if row.id in taken
+            )
+            rows = [row for row in rows if row.id not in taken]
+            links = [link for link in links if link.element_id not in taken]
+            relations = [relation for relation in relations if relation['id'] not in taken]
+
+        for chunk in _chunks([row.id for row in rows]):
+            ElementLink.objects.filter(element_id__in=chunk).delete()
+
+        # The world is never updated: a conflicting id is always this world's own
+        Element.objects.bulk_create(
+            rows,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['id'],
+            update_fields=update_fields,
+        )
+        ElementLink.objects.bulk_create(links, batch_size=batch_size)
+        
+        # Relations also feed the graph store, for neighbourhood queries
+        store_relations(world, relations, batch_size=batch_size)
+
+    return {
+        'stored': len(rows),
+        'links': len(links),
+        'relations': len(relations),
+        'errors': errors,
+    }
+
+
+def element_to_dict(element: Element) -> Dict:
+    """Reassemble an element into OnlyWorlds JSON, links included."""
+    data = {
+        'id': element.id,
+        'type': element.element_type,
+        'world': str(element.world_id),
+        'name': element.name,
+        'description': element.description,
+        'supertype': element.supertype,
+        'subtype': element.subtype,
+        'image_url': element.image_url,
+        **element.fields,
+    }
+
+    links = get_schema(element.element_type).links
+    for link in element.links.all():
+        kind = links.get(link.field, ('multi-link', ''))[0]
+        if kind == 'multi-link':
+            data.setdefault(link.field, []).append(link.target_id)
+        else:
+            data[link.field] = link.target_id
+
+    return data
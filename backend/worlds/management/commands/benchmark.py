@@ -0,0 +1,66 @@
+"""
+Management command to run the model micro-benchmarks.
+Time the decay, and fail when it slows.
+"""
+
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from endless_nights import benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Time the model hot paths on synthetic worlds and compare against the stored baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help=f"Benchmarks to run (default: all of {', '.join(benchmarks.BENCHMARKS)})")
+        parser.add_argument('--sizes', type=int, nargs='+', help="World sizes in elements (default: 1000 10000 100000)")
+        parser.add_argument('--repeats', type=int, default=None)
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--tolerance', type=float, default=None, help="Allowed slowdown, e.g. 0.25 for 25%%")
+        parser.add_argument('--baseline', help="Baseline file (default: BENCHMARK_CONFIG['BASELINE'])")
+        parser.add_argument('--save-baseline', action='store_true', help="Store these results as the baseline")
+
+    def handle(self, *args, **options):
+        path = Path(options['baseline']) if options['baseline'] else benchmarks.baseline_path()
+
+        try:
+            results = benchmarks.run(
+                sizes=options['sizes'],
+                names=options['names'],
+                seed=options['seed'],
+                repeats=options['repeats'],
+                progress=self._progress,
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        if options['save_baseline']:
+            self.stdout.write(self.style.SUCCESS(f"Baseline saved to {benchmarks.save_baseline(results, path)}"))
+            return
+
+        baseline = benchmarks.load_baseline(path)
+        if baseline is None:
+            self.stdout.write(f"No baseline at {path}; run with --save-baseline to store one")
+            return
+
+        comparisons = benchmarks.compare(results, baseline, options['tolerance'])
+        for comparison in comparisons:
+            line = (
+                f"{comparison['benchmark']:<42} {comparison['size']:>7} "
+                f"{comparison['baseline_us']:>10.1f}us -> {comparison['best_us']:>10.1f}us "
+                f"{comparison['change']:>+8.1%}"
+            )
+            self.stdout.write(self.style.ERROR(line) if comparison['regressed'] else line)
+
+        regressed = [c for c in comparisons if c['regressed']]
+        if regressed:
+            raise CommandError(f"{len(regressed)} benchmark(s) regressed beyond the tolerance")
+        self.stdout.write(self.style.SUCCESS(f"{len(comparisons)} benchmark(s) within the tolerance"))
+
+    def _progress(self, name: str, size: int, timing: dict):
+        self.stdout.write(
+            f"{name:<42} {size:>7} {timing['best_us']:>10.1f}us best {timing['median_us']:>10.1f}us median "
+            f"({timing['calls']} calls)"
+        )
@@ -0,0 +1,167 @@
+"""
+Management command to profile startup import time.
+How long the night takes to fall, module by module.
+"""
+
+from collections import defaultdict
+from typing import Dict, List
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter, so nothing this process imported skews the numbers
+PROBE = """
+import importlib, json, os, sys, time
+
+# -X importtime only sees the import statement; Django and Ninja load the
+# URLconf and routers with import_module, so send that through __import__
+_import_module = importlib.import_module
+def _traced_import_module(name, package=None):
+    if package or name.startswith('.'):
+        return _import_module(name, package)
+    __import__(name)
+    return sys.modules[name]
+importlib.import_module = _traced_import_module
+
+started = time.perf_counter()
+import django
+django.setup()
+setup = time.perf_counter()
+if {urls}:
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+from endless_nights import lazy
+print(json.dumps({{
+    'setup_ms': (setup - started) * 1000,
+    'total_ms': (time.perf_counter() - started) * 1000,
+    'lazy': lazy.loaded(),
+}}))
+"""
+
+
+def _config(name: str, default):
+    return getattr(settings, 'STARTUP_CONFIG', {}).get(name, default)
+
+
+def parse_importtime(output: str) -> List[Dict]:
+    """`-X importtime` lines as {module, self_us, cumulative_us, depth}, in import order."""
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        imports.append({
+            'module': name.strip(),
+            'self_us': int(self_us),
+            'cumulative_us': int(cumulative_us),
+            'depth': (len(name) - len(name.lstrip())) // 2,
+        })
+    return imports
+
+
+def breakdown(imports: List[Dict], apps: List[str]) -> Dict:
+    """
+    Self time per top-level package, and per project app: every module's self
+    time is charged to the nearest app module above it in the import tree (or
+    itself), so third-party libraries an app was first to import count
+    against that app. Whatever no app imported is charged to '(startup)'.
+    """
+    packages = defaultdict(int)
+    for item in imports:
+        packages[item['module'].split('.')[0]] += item['self_us']
+
+    # importtime lists children before their parent, one level deeper
+    waiting = defaultdict(list)
+    for item in imports:
+        item['children'] = waiting.pop(item['depth'] + 1, [])
+        waiting[item['depth']].append(item)
+
+    per_app = defaultdict(int)
+    pending = [(root, '(startup)') for root in waiting[0]]
+    while pending:
+        item, owner = pending.pop()
+        package = item['module'].split('.')[0]
+        owner = package if package in apps else owner
+        per_app[owner] += item['self_us']
+        pending.extend((child, owner) for child in item['children'])
+
+    return {
+        'packages': dict(sorted(packages.items(), key=lambda kv: -kv[1])),
+        'apps': dict(sorted(per_app.items(), key=lambda kv: -kv[1])),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Profile import time at startup (django.setup, plus the URLconf with --urls) against a budget'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--urls', action='store_true',
+                            help="Also load the URLconf and every router, as a web worker does")
+        parser.add_argument('--budget', type=float, default=None,
+                            help="Fail above this many milliseconds (default: STARTUP_CONFIG)")
+        parser.add_argument('--top', type=int, default=15, help="Slowest modules to list")
+        parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+
+    def handle(self, *args, **options):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'endless_nights.settings')}
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', PROBE.format(urls=options['urls'])],
+            capture_output=True, text=True, cwd=settings.BASE_DIR, env=env,
+        )
+        if result.returncode:
+            raise CommandError(f"Startup failed:\n{result.stderr[-2000:]}")
+
+        probe = json.loads(result.stdout.strip().splitlines()[-1])
+        imports = parse_importtime(result.stderr)
+        apps = [app.split('.')[0] for app in settings.INSTALLED_APPS if not app.startswith('django.')]
+        apps.append(settings.ROOT_URLCONF.split('.')[0])
+        report = {
+            'phase': 'urls' if options['urls'] else 'setup',
+            'setup_ms': round(probe['setup_ms'], 1),
+            'total_ms': round(probe['total_ms'], 1),
+            'modules': len(imports),
+            **{
+                key: {name: round(us / 1000, 1) for name, us in values.items()}
+                for key, values in breakdown(imports, apps).items()
+            },
+            'slowest': [
+                {'module': item['module'], 'self_ms': round(item['self_us'] / 1000, 1)}
+                for item in sorted(imports, key=lambda item: -item['self_us'])[:options['top']]
+            ],
+            'lazy_loaded': [name for name, imported in probe['lazy'].items() if imported],
+        }
+
+        budget = options['budget'] or _config('URLS_BUDGET_MS' if options['urls'] else 'SETUP_BUDGET_MS', None)
+        report['budget_ms'] = budget
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self._print(report)
+
+        problems = []
+        if budget and report['total_ms'] > budget:
+            problems.append(f"startup took {report['total_ms']}ms, over the {budget}ms budget")
+        if report['lazy_loaded']:
+            problems.append(f"lazy modules imported at startup: {', '.join(report['lazy_loaded'])}")
+        if problems:
+            raise CommandError('; '.join(problems))
+
+    def _print(self, report: Dict):
+        self.stdout.write(
+            f"Startup ({report['phase']}): {report['total_ms']}ms, django.setup {report['setup_ms']}ms, "
+            f"{report['modules']} modules imported"
+        )
+        self.stdout.write("\nPer app (ms, with what each was first to import):")
+        for name, ms in report['apps'].items():
+            self.stdout.write(f"  {name:<30} {ms:>8.1f}")
+        self.stdout.write("\nPer package (self ms):")
+        for name, ms in list(report['packages'].items())[:15]:
+            self.stdout.write(f"  {name:<30} {ms:>8.1f}")
+        self.stdout.write("\nSlowest modules (self ms):")
+        for item in report['slowest']:
+            self.stdout.write(f"  {item['module']:<50} {item['self_ms']:>8.1f}")
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.11 on 2026-10-19 06:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('worlds', '0002_alter_object_world'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Element',
+            fields=[
+                ('id', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('element_type', models.CharField(max_length=30)),
+                ('name', models.CharField(max_length=200)),
+                ('description', models.TextField(blank=True)),
+                ('supertype', models.CharField(blank=True, max_length=100)),
+                ('subtype', models.CharField(blank=True, max_length=100)),
+                ('image_url', models.CharField(blank=True, max_length=500)),
+                ('fields', models.JSONField(default=dict)),
+                ('world', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='elements', to='worlds.world')),
+            ],
+            options={
+                'ordering': ['element_type', 'name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ElementLink',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(max_length=50)),
+                ('target_type', models.CharField(max_length=30)),
+                ('target_id', models.CharField(max_length=100)),
+                ('position', models.PositiveSmallIntegerField(default=0)),
+                ('element', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='links', to='worlds.element')),
+            ],
+            options={
+                'ordering': ['element', 'field', 'position'],
+                'indexes': [models.Index(fields=['target_id', 'target_type'], name='worlds_elem_target__58225c_idx'), models.Index(fields=['element', 'field'], name='worlds_elem_element_602524_idx')],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='element',
+            index=models.Index(fields=['world', 'element_type'], name='worlds_elem_world_i_85b813_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.11 on 2026-10-19 06:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('worlds', '0003_element'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Relation',
+            fields=[
+                ('id', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=200)),
+                ('actor', models.CharField(max_length=100)),
+                ('intensity', models.PositiveSmallIntegerField(default=50)),
+                ('background', models.TextField(blank=True)),
+                ('start_date', models.IntegerField(blank=True, null=True)),
+                ('end_date', models.IntegerField(blank=True, null=True)),
+                ('world', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='relations', to='worlds.world')),
+            ],
+            options={
+                'ordering': ['-intensity', 'name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RelationInvolvement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('element_type', models.CharField(max_length=30)),
+                ('element_id', models.CharField(max_length=100)),
+                ('relation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='involvements', to='worlds.relation')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['element_id'], name='worlds_rela_element_7245d6_idx')],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='relation',
+            index=models.Index(fields=['actor'], name='worlds_rela_actor_4a1eb8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='relation',
+            index=models.Index(fields=['world', '-intensity'], name='worlds_rela_world_i_be683c_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.11 on 2026-10-19 07:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('worlds', '0004_relation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='character',
+            name='onlyworlds_id',
+            field=models.CharField(blank=True, db_index=True, max_length=100),
+        ),
+    ]
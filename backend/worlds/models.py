@@ -104,6 +104,9 @@ class Character(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     world = models.ForeignKey(World, on_delete=models.CASCADE, related_name='characters')
     
+    # The OnlyWorlds element this character was imported from; relations are keyed on it
+    onlyworlds_id = models.CharField(max_length=100, blank=True, db_index=True)
+    
     name = models.CharField(max_length=200)
     description = models.TextField()
     role = models.CharField(max_length=100, blank=True)
@@ -229,4 +232,92 @@ class Treaty(models.Model):
     
     def __str__(self):
         status = "broken" if self.is_broken else f"strength: {self.strength:.2f}"
-        return f"{self.name} ({status})"
\ No newline at end of file
+        return f"{self.name} ({status})"
+
+class Element(models.Model):
+    """Any OnlyWorlds element, kept in one compact table shaped by ow_schema."""
+    
+    # OnlyWorlds ids are uuidv7 in the wild, but parser drafts use readable slugs
+    id = models.CharField(primary_key=True, max_length=100)
+    world = models.ForeignKey(World, on_delete=models.CASCADE, related_name='elements')
+    element_type = models.CharField(max_length=30)
+    
+    # Base properties
+    name = models.CharField(max_length=200)
+    description = models.TextField(blank=True)
+    supertype = models.CharField(max_length=100, blank=True)
+    subtype = models.CharField(max_length=100, blank=True)
+    image_url = models.CharField(max_length=500, blank=True)
+    
+    # Scalar schema fields (physicality, intensity, ...); links live in ElementLink
+    fields = models.JSONField(default=dict)
+    
+    class Meta:
+        ordering = ['element_type', 'name']
+        indexes = [
+            models.Index(fields=['world', 'element_type']),
+        ]
+    
+    def __str__(self):
+        return f"{self.element_type}: {self.name}"
+
+
+class ElementLink(models.Model):
+    """A typed single/multi link from one element to another."""
+    
+    element = models.ForeignKey(Element, on_delete=models.CASCADE, related_name='links')
+    field = models.CharField(max_length=50)
+    target_type = models.CharField(max_length=30)
+    target_id = models.CharField(max_length=100)
+    position = models.PositiveSmallIntegerField(default=0)  # Order within a multi-link
+    
+    class Meta:
+        ordering = ['element', 'field', 'position']
+        indexes = [
+            models.Index(fields=['target_id', 'target_type']),
+            models.Index(fields=['element', 'field']),
+        ]
+    
+    def __str__(self):
+        return f"{self.element_id}.{self.field} -> {self.target_type}:{self.target_id}"
+
+
+class Relation(models.Model):
+    """A bond between an actor and the elements it involves."""
+    
+    id = models.CharField(primary_key=True, max_length=100)
+    world = models.ForeignKey(World, on_delete=models.CASCADE, related_name='relations')
+    
+    name = models.CharField(max_length=200)
+    actor = models.CharField(max_length=100)  # Element id of the defining character
+    intensity = models.PositiveSmallIntegerField(default=50)  # 0-100
+    
+    background = models.TextField(blank=True)
+    start_date = models.IntegerField(null=True, blank=True)
+    end_date = models.IntegerField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-intensity', 'name']
+        indexes = [
+            models.Index(fields=['actor']),
+            models.Index(fields=['world', '-intensity']),
+        ]
+    
+    def __str__(self):
+        return f"{self.name} ({self.actor}, intensity: {self.intensity})"
+
+
+class RelationInvolvement(models.Model):
+    """One element drawn into a relation."""
+    
+    relation = models.ForeignKey(Relation, on_delete=models.CASCADE, related_name='involvements')
+    element_type = models.CharField(max_length=30)
+    element_id = models.CharField(max_length=100)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['element_id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.relation_id} involves {self.element_type}:{self.element_id}"
@@ -2,11 +2,14 @@
 OnlyWorlds integration for importing and exporting worlds.
 """
 
-import requests
 from typing import Dict, List, Optional
+from endless_nights.lazy import lazy_import
 from .models import World, Location, Character, Object, Treaty
+from .elements import store_elements
 import json
 
+requests = lazy_import('requests')
+
 
 class OnlyWorldsAdapter:
     """Adapter for OnlyWorlds API integration."""
@@ -38,6 +41,9 @@ class OnlyWorldsAdapter:
         for element in elements:
             self._process_element(world, element)
         
+        # Keep every element, not just the ones the game models know about
+        store_elements(world, elements)
+        
         # Analyze for witness
         self._identify_witness(world)
         
@@ -82,6 +88,7 @@ class OnlyWorldsAdapter:
         
         character = Character.objects.create(
             world=world,
+            onlyworlds_id=data.get('id', ''),
             name=data.get('name', 'Unknown'),
             description=data.get('description', ''),
             role=data.get('role', ''),
@@ -0,0 +1,300 @@
+"""
+Relation graph for OnlyWorlds Relation elements.
+Who is bound to whom, and how tightly, answered from indexed rows.
+"""
+
+import heapq
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .models import World, Relation, RelationInvolvement
+from .schema import get_schema
+
+
+# Keeps IN (...) lists well under SQLite's variable limit
+CHUNK_SIZE = 900
+
+
+def _chunks(items: List, size: int = CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _involved_categories() -> Dict[str, str]:
+    """Map relation link fields (characters, objects, ...) to element types."""
+    schema = get_schema('relation')
+    return {
+        field: schema.links[field][1]
+        for field in schema.sections.get('Involves', [])
+        if field in schema.links
+    }
+
+
+def build_relation_rows(world: World, data: Dict, categories: Dict[str, str] = None):
+    """
+    Split a relation into its Relation row and RelationInvolvement rows.
+
+    Accepts flat schema dicts (`characters: [...]`) as well as the nested
+    `involves` shape written by OnlyWorldsRelation.to_dict().
+    """
+    categories = categories or _involved_categories()
+    involves = data.get('involves') or {
+        field: data.get(field) for field in categories
+    }
+
+    row = Relation(
+        id=data['id'],
+        world=world,
+        name=data.get('name', ''),
+        actor=data.get('actor') or '',
+        intensity=max(0, min(100, data.get('intensity') or 0)),
+        background=data.get('background') or '',
+        start_date=data.get('start_date'),
+        end_date=data.get('end_date'),
+    )
+
+    involvements = []
+    for field, element_ids in involves.items():
+        element_type = categories.get(field, field.rstrip('s'))
+        for element_id in element_ids or []:
+            involvements.append(RelationInvolvement(
+                relation_id=row.id,
+                element_type=element_type,
+                element_id=element_id,
+            ))
+
+    return row, involvements
+
+
+def store_relations(world: World, relations: Iterable[Dict], batch_size: int = 2000) -> int:
+    """
+    Store relations in the graph tables (see build_relation_rows for the shapes
+    accepted). A relation whose id belongs to another world is skipped.
+    """
+    categories = _involved_categories()
+    rows = []
+    involvements = []
+
+    for data in relations:
+        row, relation_involvements = build_relation_rows(world, data, categories)
+        rows.append(row)
+        involvements.extend(relation_involvements)
+
+    with transaction.atomic():
+        taken = set()
+        for chunk in _chunks([row.id for row in rows]):
+            taken.update(
+                Relation.objects.filter(id__in=chunk).exclude(world=world).values_list('id', flat=True)
+            )
+        if taken:
+            rows = [row for row in rows if row.id not in taken]
+            involvements = [involvement for involvement in involvements if involvement.relation_id not in taken]
+
+        for chunk in _chunks([row.id for row in rows]):
+            RelationInvolvement.objects.filter(relation_id__in=chunk).delete()
+
+        Relation.objects.bulk_create(
+            rows,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['id'],
+            update_fields=['name', 'actor', 'intensity', 'background', 'start_date', 'end_date'],
+        )
+        RelationInvolvement.objects.bulk_create(involvements, batch_size=batch_size)
+
+    return len(rows)
+
+
+def _edges(world_id: str, element_ids: List[str]) -> List[tuple]:
+    """
+    All (from, to, to_type, intensity, relation_id) edges touching the given elements.
+
+    An edge runs between a relation's actor and each element it involves,
+    in both directions. Two indexed queries per chunk: one by actor, one by
+    involved element.
+    """
+    edges = []
+    for chunk in _chunks(element_ids):
+        outgoing = RelationInvolvement.objects.filter(
+            relation__world_id=world_id,
+            relation__actor__in=chunk,
+        ).values_list('relation__actor', 'element_id', 'element_type', 'relation__intensity', 'relation_id')
+        edges.extend(outgoing)
+
+        incoming = RelationInvolvement.objects.filter(
+            relation__world_id=world_id,
+            element_id__in=chunk,
+        ).values_list('element_id', 'relation__actor', 'relation__intensity', 'relation_id')
+        edges.extend(
+            (source, actor, 'character', intensity, relation_id)
+            for source, actor, intensity, relation_id in incoming
+        )
+
+    return edges
+
+
+def neighbourhood(world_id: str, element_id: str, hops: int = 1, limit: int = 500) -> Dict:
+    """
+    Everything within `hops` relation steps of an element.
+
+    Breadth-first, one batch of queries per hop regardless of frontier size.
+    """
+    distances = {element_id: 0}
+    types = {}
+    edges = []
+    frontier = [element_id]
+
+    for hop in range(1, hops + 1):
+        if not frontier or len(distances) >= limit:
+            break
+
+        next_frontier = []
+        for source, target, target_type, intensity, relation_id in _edges(world_id, frontier):
+            edges.append({
+                'from': source,
+                'to': target,
+                'intensity': intensity,
+                'relation': relation_id,
+            })
+            types.setdefault(target, target_type)
+            if target not in distances and len(distances) < limit:
+                distances[target] = hop
+                next_frontier.append(target)
+
+        frontier = next_frontier
+
+    reached = set(distances)
+    return {
+        'center': element_id,
+        'hops': hops,
+        'nodes': [
+            {'id': node, 'type': types.get(node, ''), 'distance': distance}
+            for node, distance in distances.items()
+        ],
+        'edges': [edge for edge in edges if edge['from'] in reached and edge['to'] in reached],
+    }
+
+
+def strongest_ties(world_id: str, element_id: str, limit: int = 10) -> List[Dict]:
+    """Direct ties of an element, strongest first, in one indexed query."""
+    involvements = (
+        RelationInvolvement.objects
+        .filter(relation__world_id=world_id)
+        .filter(Q(relation__actor=element_id) | Q(element_id=element_id))
+        .select_related('relation')
+        .order_by('-relation__intensity')
+    )
+
+    ties = []
+    seen = set()
+    for involvement in involvements.iterator(chunk_size=limit * 4):
+        relation = involvement.relation
+        if relation.actor == element_id:
+            other, other_type = involvement.element_id, involvement.element_type
+        else:
+            other, other_type = relation.actor, 'character'
+
+        if other == element_id or (relation.id, other) in seen:
+            continue
+        seen.add((relation.id, other))
+
+        ties.append({
+            'element_id': other,
+            'element_type': other_type,
+            'relation': relation.id,
+            'name': relation.name,
+            'intensity': relation.intensity,
+            'is_actor': relation.actor == element_id,
+        })
+        if len(ties) >= limit:
+            break
+
+    return ties
+
+
+def traverse_strongest(world_id: str, element_id: str, max_nodes: int = 25) -> List[Dict]:
+    """
+    Walk outward along the strongest ties first.
+
+    Best-first search where a path is as strong as its weakest link, so the
+    walk visits the elements most tightly bound to the start before any
+    loosely connected ones. Ties are fetched a frontier at a time: when the
+    walk reaches an element whose ties are not loaded yet, those of every
+    element waiting on the heap are loaded with it, in one batch of queries.
+    """
+    visited = {element_id}
+    order = []
+    heap = []
+    ties: Dict[str, List[tuple]] = {}
+
+    def load_ties(element_ids: List[str]):
+        found = {node: [] for node in element_ids}
+        for source, target, target_type, intensity, _ in _edges(world_id, element_ids):
+            if target != source:
+                found[source].append((intensity, target, target_type))
+        for node, edges in found.items():
+            ties[node] = heapq.nlargest(max_nodes, edges)
+
+    def push_ties(source: str, strength: int):
+        for intensity, target, target_type in ties[source]:
+            if target not in visited:
+                heapq.heappush(heap, (-min(strength, intensity), target, target_type, source))
+
+    load_ties([element_id])
+    push_ties(element_id, 100)
+
+    while heap and len(order) < max_nodes:
+        negative_strength, node, node_type, via = heapq.heappop(heap)
+        if node in visited:
+            continue
+        visited.add(node)
+        order.append({
+            'element_id': node,
+            'element_type': node_type,
+            'strength': -negative_strength,
+            'via': via,
+        })
+        if node not in ties:
+            waiting = {entry[1] for entry in heap if entry[1] not in visited and entry[1] not in ties}
+            load_ties([node, *waiting])
+        push_ties(node, -negative_strength)
+
+    return order
+
+
+def relation_counts(world_id: str, element_ids: Optional[List[str]] = None) -> Dict[str, int]:
+    """How many relations each character takes part in, as actor or involved."""
+    as_actor = Relation.objects.filter(world_id=world_id)
+    as_involved = RelationInvolvement.objects.filter(relation__world_id=world_id, element_type='character')
+
+    if element_ids is not None:
+        as_actor = as_actor.filter(actor__in=element_ids)
+        as_involved = as_involved.filter(element_id__in=element_ids)
+
+    counts = Counter()
+    for actor, count in as_actor.order_by().values_list('actor').annotate(count=Count('id')):
+        counts[actor] += count
+    for element_id, count in as_involved.order_by().values_list('element_id').annotate(
+        count=Count('relation_id', distinct=True)
+    ):
+        counts[element_id] += count
+
+    counts.pop('', None)
+    return dict(counts.most_common())
+
+
+def relationship_state(world_id: str, character_id: str, limit: int = 5) -> Dict:
+    """
+    A compact summary of a character's bonds, for the LLM context.
+
+    `character_id` is the OnlyWorlds element id relations refer to; a
+    character created here rather than imported has none, and no ties.
+    """
+    ties = strongest_ties(world_id, character_id, limit=limit) if character_id else []
+    return {
+        'strongest_ties': ties,
+        'tie_count': len(ties),
+    }
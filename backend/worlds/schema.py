@@ -0,0 +1,204 @@
+"""
+OnlyWorlds schema compilation.
+The ow_schema YAML is read once and turned into pydantic models,
+so every element entering a world is measured against the same shape.
+"""
+
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import threading
+
+from django.conf import settings
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, create_model
+
+from endless_nights.lazy import lazy_import
+
+yaml = lazy_import('yaml')
+
+
+LINK_TYPES = ('single-link', 'multi-link', 'generic-link')
+
+# Files in ow_schema that describe containers rather than elements
+NON_ELEMENT_SCHEMAS = ('base_properties', 'world')
+
+# Base properties shared by every element (see ow_schema/base_properties.yaml)
+BASE_FIELDS = ('id', 'name', 'description', 'supertype', 'subtype', 'image_url', 'world')
+
+
+class ElementBase(BaseModel):
+    """Fields every OnlyWorlds element carries."""
+
+    model_config = ConfigDict(extra='ignore', str_strip_whitespace=True)
+
+    id: str = Field(min_length=1, max_length=100)
+    name: str = Field(min_length=1, max_length=200)
+    world: str
+    description: str = ''
+    supertype: str = ''
+    subtype: str = ''
+    image_url: str = ''
+
+
+class ElementSchema:
+    """A compiled element type: its pydantic model plus link metadata."""
+
+    def __init__(self, element_type: str, title: str, model, sections: Dict[str, List[str]],
+                 scalars: List[str], links: Dict[str, Tuple[str, str]]):
+        self.element_type = element_type
+        self.title = title
+        self.model = model
+        self.sections = sections  # section name -> field names, for display
+        self.scalars = scalars  # plain string/integer fields
+        self.links = links  # field -> (link kind, target category)
+
+    def __repr__(self):
+        return f"<ElementSchema {self.element_type}: {len(self.scalars)} fields, {len(self.links)} links>"
+
+
+_registry: Dict[str, ElementSchema] = {}
+_lock = threading.Lock()
+
+
+def schema_dir() -> Path:
+    """Where the OnlyWorlds YAML definitions live."""
+    return Path(getattr(settings, 'ONLYWORLDS_SCHEMA_DIR', settings.BASE_DIR.parent / 'ow_schema'))
+
+
+def _field_definition(spec: Dict, required: bool):
+    """Translate one YAML property into a pydantic (annotation, default) pair."""
+    kind = spec.get('type')
+
+    if kind == 'multi-link':
+        return List[str], Field(default_factory=list)
+
+    if kind == 'integer':
+        constraints = {}
+        if 'minimum' in spec:
+            constraints['ge'] = spec['minimum']
+        if 'maximum' in spec:
+            constraints['le'] = spec['maximum']
+        if required:
+            return int, Field(..., **constraints)
+        return Optional[int], Field(None, **constraints)
+
+    # strings, single links and generic links are all plain ids or text
+    if required:
+        return str, Field(...)
+    return Optional[str], Field(None)
+
+
+def compile_schema(element_type: str, data: Dict) -> ElementSchema:
+    """Compile a single ow_schema document into an ElementSchema."""
+    fields = {}
+    sections = {}
+    scalars = []
+    links = {}
+
+    for section, section_spec in (data.get('properties') or {}).items():
+        properties = (section_spec or {}).get('properties') or {}
+        required = set(section_spec.get('required') or [])
+        sections[section] = []
+
+        for name, spec in properties.items():
+            kind = spec.get('type')
+
+            if kind == 'generic-link':
+                # A generic link is stored as (element_type, element_id) on the element
+                type_field = spec.get('content_type_field_name', 'element_type')
+                id_field = spec.get('object_id_field_name', 'element_id')
+                fields[type_field] = _field_definition({'type': 'string'}, False)
+                fields[id_field] = _field_definition({'type': 'string'}, name in required)
+                links[id_field] = ('generic-link', type_field)
+                sections[section].append(id_field)
+                continue
+
+            sections[section].append(name)
+
+            if name in fields:
+                # Relation lists `events` under both Nature and Involves; they share one column
+                continue
+
+            fields[name] = _field_definition(spec, name in required)
+            if kind in LINK_TYPES:
+                links[name] = (kind, (spec.get('category') or '').lower())
+            else:
+                scalars.append(name)
+
+    title = data.get('title') or element_type.title()
+    model = create_model(f"{title}Element", __base__=ElementBase, **fields)
+
+    return ElementSchema(element_type, title, model, sections, scalars, links)
+
+
+def load_schema(force: bool = False) -> Dict[str, ElementSchema]:
+    """Read and compile every element schema. Runs once per process."""
+    if _registry and not force:
+        return _registry
+
+    with _lock:
+        if _registry and not force:
+            return _registry
+
+        compiled = {}
+        for path in sorted(schema_dir().glob('*.yaml')):
+            element_type = path.stem
+            if element_type in NON_ELEMENT_SCHEMAS:
+                continue
+            with open(path, 'r', encoding='utf-8') as f:
+                compiled[element_type] = compile_schema(element_type, yaml.safe_load(f))
+
+        _registry.clear()
+        _registry.update(compiled)
+
+    return _registry
+
+
+def get_schema(element_type: str) -> ElementSchema:
+    """Get the compiled schema for an element type."""
+    registry = load_schema()
+    try:
+        return registry[element_type]
+    except KeyError:
+        raise KeyError(f"Unknown OnlyWorlds element type: {element_type}")
+
+
+def element_types() -> List[str]:
+    """All element types known to the schema."""
+    return sorted(load_schema().keys())
+
+
+def validate_elements(
+    elements: Iterable[Dict],
+    world_id: Optional[str] = None,
+    default_type: Optional[str] = None,
+) -> Tuple[List[Tuple[ElementSchema, BaseModel]], List[str]]:
+    """
+    Validate raw element dicts against their compiled models.
+
+    Each dict names its type under `type`; `default_type` covers
+    homogeneous batches. Returns (valid, errors) - invalid elements are
+    reported, never silently dropped.
+    """
+    registry = load_schema()
+    valid = []
+    errors = []
+
+    for index, raw in enumerate(elements):
+        element_type = (raw.get('type') or default_type or '').lower()
+        schema = registry.get(element_type)
+        if schema is None:
+            errors.append(f"[{index}] {raw.get('name', 'unnamed')}: unknown element type '{element_type}'")
+            continue
+
+        if world_id and not raw.get('world'):
+            raw = {**raw, 'world': world_id}
+
+        try:
+            valid.append((schema, schema.model.model_validate(raw)))
+        except ValidationError as e:
+            problems = '; '.join(
+                f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()
+            )
+            errors.append(f"[{index}] {raw.get('name', 'unnamed')} ({element_type}): {problems}")
+
+    return valid, errors
@@ -0,0 +1,307 @@
+"""
+Compact, read-only snapshots of a world for the game loop.
+The night reads the world constantly; it should not have to rebuild it each time.
+
+A snapshot holds locations and characters as parallel array columns and is
+versioned by a revision counter in the cache - checking it is one cache read,
+no query. Writes to the world and its elements bump the revision; degradation
+ticks patch the in-process copy as they bump it, so other workers refetch
+instead of serving stale integrity.
+"""
+
+from array import array
+from typing import Dict, List, Optional
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+
+from .models import World, Location, Character
+
+
+SNAPSHOT_TIMEOUT = 60 * 60  # An hour; versions make expiry a memory concern only
+
+LOCATION_COLUMNS = ('integrity', 'color_saturation', 'clarity')
+CHARACTER_COLUMNS = ('power_level', 'memory_intact')
+
+
+def snapshot_key(world_id: str) -> str:
+    return f"world:{world_id}:snapshot"
+
+
+def revision_key(world_id: str) -> str:
+    return f"world:{world_id}:snapshot:rev"
+
+
+class WorldSnapshot:
+    """A world frozen into columns. Treat as immutable; patch() returns a copy."""
+
+    __slots__ = (
+        'world_id', 'version', 'name', 'degradation_pattern',
+        'location_ids', 'location_names', 'location_index',
+        'integrity', 'color_saturation', 'clarity',
+        'character_ids', 'character_names', 'character_index', 'character_locations',
+        'power_level', 'memory_intact', 'alive',
+    )
+
+    def __init__(self, world_id: str, version: str, name: str, degradation_pattern: Dict,
+                 locations: List[tuple], characters: List[tuple]):
+        self.world_id = world_id
+        self.version = version
+        self.name = name
+        self.degradation_pattern = degradation_pattern
+
+        self.location_ids = tuple(str(row[0]) for row in locations)
+        self.location_names = tuple(row[1] for row in locations)
+        self.location_index = {loc_id: i for i, loc_id in enumerate(self.location_ids)}
+        self.integrity = array('f', (row[2] for row in locations))
+        self.color_saturation = array('f', (row[3] for row in locations))
+        self.clarity = array('f', (row[4] for row in locations))
+
+        self.character_ids = tuple(str(row[0]) for row in characters)
+        self.character_names = tuple(row[1] for row in characters)
+        self.character_index = {char_id: i for i, char_id in enumerate(self.character_ids)}
+        self.character_locations = tuple(str(row[2]) if row[2] else None for row in characters)
+        self.power_level = array('f', (row[3] for row in characters))
+        self.memory_intact = array('f', (row[4] for row in characters))
+        self.alive = array('b', (row[5] for row in characters))
+
+    def location(self, location_id: str) -> Optional[Dict]:
+        """A location's current state, or None if it is not in this world."""
+        i = self.location_index.get(str(location_id))
+        if i is None:
+            return None
+        return {
+            'id': self.location_ids[i],
+            'name': self.location_names[i],
+            'integrity': round(self.integrity[i], 6),  # float32 columns
+            'color_saturation': round(self.color_saturation[i], 6),
+            'clarity': round(self.clarity[i], 6),
+        }
+
+    def character(self, character_id: str) -> Optional[Dict]:
+        """A character's current state, or None if it is not in this world."""
+        i = self.character_index.get(str(character_id))
+        if i is None:
+            return None
+        return {
+            'id': self.character_ids[i],
+            'name': self.character_names[i],
+            'current_location': self.character_locations[i],
+            'power_level': int(self.power_level[i]),
+            'memory_intact': round(self.memory_intact[i], 6),  # float32 columns
+            'alive': bool(self.alive[i]),
+        }
+
+    def characters_at(self, location_id: str) -> List[str]:
+        """Ids of every character standing at a location."""
+        location_id = str(location_id)
+        return [
+            self.character_ids[i]
+            for i, loc in enumerate(self.character_locations)
+            if loc == location_id
+        ]
+
+    def patch(self, kind: str, element_id: str, version: str, **values) -> 'WorldSnapshot':
+        """A copy with one location or character's columns replaced."""
+        index = self.location_index if kind == 'location' else self.character_index
+        i = index.get(str(element_id))
+
+        patched = object.__new__(WorldSnapshot)
+        for slot in WorldSnapshot.__slots__:
+            setattr(patched, slot, getattr(self, slot))
+        patched.version = version
+
+        if i is None:
+            return patched
+
+        for column, value in values.items():
+            # Copying an array column is a single memcpy
+            copied = array(getattr(self, column).typecode, getattr(self, column))
+            copied[i] = value
+            setattr(patched, column, copied)
+
+        return patched
+
+
+def build_snapshot(world_id: str, version: str) -> Optional[WorldSnapshot]:
+    """Read a world into a snapshot with three flat queries and no model instances."""
+    world = World.objects.filter(id=world_id).values('name', 'degradation_pattern').first()
+    if world is None:
+        return None
+
+    locations = list(
+        Location.objects.filter(world_id=world_id)
+        .order_by()
+        .values_list('id', 'name', *LOCATION_COLUMNS)
+    )
+    characters = list(
+        Character.objects.filter(world_id=world_id)
+        .order_by()
+        .values_list('id', 'name', 'current_location_id', *CHARACTER_COLUMNS, 'alive')
+    )
+
+    return WorldSnapshot(
+        str(world_id), version, world['name'], world['degradation_pattern'],
+        locations, characters,
+    )
+
+
+_local: Dict[str, WorldSnapshot] = {}
+_lock = threading.Lock()
+
+
+def _seed() -> int:
+    # A lost counter restarts from the clock, never from a revision some copy still carries
+    return time.time_ns() // 1000
+
+
+def _revision(world_id: str) -> int:
+    key = revision_key(world_id)
+    revision = cache.get(key)
+    if revision is None:
+        cache.add(key, _seed(), None)
+        revision = cache.get(key)
+    return revision
+
+
+def get_snapshot(world_id: str) -> Optional[WorldSnapshot]:
+    """
+    The current snapshot of a world.
+
+    Checks the in-process copy, then the shared cache, and only rebuilds from
+    the database when both are out of date.
+    """
+    world_id = str(world_id)
+    version = str(_revision(world_id))
+
+    snapshot = _local.get(world_id)
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+
+    snapshot = cache.get(snapshot_key(world_id))
+    if snapshot is None or snapshot.version != version:
+        snapshot = build_snapshot(world_id, version)
+        if snapshot is None:
+            return None
+        cache.set(snapshot_key(world_id), snapshot, SNAPSHOT_TIMEOUT)
+
+    with _lock:
+        _local[world_id] = snapshot
+    return snapshot
+
+
+def _bump_revision(world_id: str) -> int:
+    key = revision_key(world_id)
+    seed = _seed()
+    if cache.add(key, seed, None):
+        return seed
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Evicted between add and incr
+        cache.set(key, seed, None)
+        return seed
+
+
+def patch_snapshot(world_id: str, kind: str, element_id: str, **values):
+    """
+    Apply a degradation tick to the cached snapshot instead of rebuilding it.
+
+    Every patch bumps the shared revision. If another worker patched in
+    between, our copy is missing their change and is dropped instead; a stale
+    copy written to the cache is harmless because readers compare versions.
+    """
+    world_id = str(world_id)
+    old_revision = _revision(world_id)
+    revision = _bump_revision(world_id)
+
+    with _lock:
+        snapshot = _local.get(world_id)
+        if snapshot is None:
+            return
+        if revision != old_revision + 1 or snapshot.version != str(old_revision):
+            del _local[world_id]
+            return
+        snapshot = snapshot.patch(kind, element_id, str(revision), **values)
+        _local[world_id] = snapshot
+
+    cache.set(snapshot_key(world_id), snapshot, SNAPSHOT_TIMEOUT)
+
+
+def invalidate_snapshot(world_id: str):
+    """Forget a world's snapshot everywhere."""
+    world_id = str(world_id)
+    _bump_revision(world_id)
+    cache.delete(snapshot_key(world_id))
+    with _lock:
+        _local.pop(world_id, None)
+
+
+# Signal handlers - snapshots are patched or dropped once the write commits, so
+# neither a rolled-back tick nor a rebuild from uncommitted rows is ever cached
+
+def _location_saved(sender, instance, created, **kwargs):
+    transaction.on_commit(lambda: _location_committed(instance, created))
+
+
+def _location_committed(instance, created):
+    snapshot = _local.get(str(instance.world_id))
+    state = snapshot.location(instance.id) if snapshot else None
+
+    if created or state is None or state['name'] != instance.name:
+        invalidate_snapshot(instance.world_id)
+    else:
+        patch_snapshot(
+            instance.world_id, 'location', instance.id,
+            **{column: getattr(instance, column) for column in LOCATION_COLUMNS},
+        )
+
+
+def _character_saved(sender, instance, created, **kwargs):
+    transaction.on_commit(lambda: _character_committed(instance, created))
+
+
+def _character_committed(instance, created):
+    snapshot = _local.get(str(instance.world_id))
+    state = snapshot.character(instance.id) if snapshot else None
+    location_id = str(instance.current_location_id) if instance.current_location_id else None
+
+    # Movement, renaming and death change more than the numeric columns; rebuild for those
+    if (
+        created or state is None
+        or state['name'] != instance.name
+        or state['current_location'] != location_id
+        or state['alive'] != instance.alive
+    ):
+        invalidate_snapshot(instance.world_id)
+    else:
+        patch_snapshot(
+            instance.world_id, 'character', instance.id,
+            **{column: getattr(instance, column) for column in CHARACTER_COLUMNS},
+        )
+
+
+def _element_deleted(sender, instance, **kwargs):
+    world_id = instance.world_id
+    transaction.on_commit(lambda: invalidate_snapshot(world_id))
+
+
+def _world_changed(sender, instance, update_fields=None, **kwargs):
+    # The witness counter is not part of a snapshot
+    if update_fields is not None and set(update_fields) <= {'times_witnessed'}:
+        return
+    world_id = instance.pk
+    transaction.on_commit(lambda: invalidate_snapshot(world_id))
+
+
+def connect_signals():
+    """Keep snapshots in step with World, Location and Character writes."""
+    post_save.connect(_world_changed, sender=World, dispatch_uid='snapshot_world_saved')
+    post_delete.connect(_world_changed, sender=World, dispatch_uid='snapshot_world_deleted')
+    post_save.connect(_location_saved, sender=Location, dispatch_uid='snapshot_location_saved')
+    post_save.connect(_character_saved, sender=Character, dispatch_uid='snapshot_character_saved')
+    post_delete.connect(_element_deleted, sender=Location, dispatch_uid='snapshot_location_deleted')
+    post_delete.connect(_element_deleted, sender=Character, dispatch_uid='snapshot_character_deleted')
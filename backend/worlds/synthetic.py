@@ -0,0 +1,343 @@
+"""
+Synthetic OnlyWorlds worlds for scale testing.
+A world dreamt up from a seed - the same seed, the same dream, however large.
+
+SyntheticWorld generates schema-valid elements for every type in ow_schema,
+in proportions set by MIX, from a few thousand to millions. Every draw comes
+from one generator seeded by `seed`, and element ids are derived from
+(seed, type, index), so a world is identical from run to run without keeping
+it in memory. The shapes follow what real worlds look like:
+
+- Description and field lengths are lognormal: mostly a sentence or two,
+  now and then a page.
+- Link fan-out is lognormal too, and targets are picked with preferential
+  attachment, so a few hubs gather most of the links.
+- Relation intensity follows a beta distribution: most ties are middling,
+  few are absolute.
+- Locations form a tree through parent_location, with the odd rival and
+  partner across it; these become the game's connected_to paths.
+
+A world can be written as OnlyWorlds element JSON, as a Django fixture, or
+inserted straight into the database in bulk (elements, links, relations, and
+the game's Location/Character/Object rows). See `manage.py generate_world`.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, IO, Iterator, List, Optional, Tuple
+import hashlib
+import json
+import random
+import uuid
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from .elements import _build_rows
+from .models import World, Location, Character, Object
+from .onlyworlds import OnlyWorldsAdapter
+from .relations import _involved_categories, build_relation_rows
+from .schema import get_schema, load_schema
+
+# Share of the world's elements per type; types missing here are not generated
+MIX = {
+    'character': 0.22,
+    'location': 0.10,
+    'object': 0.14,
+    'relation': 0.16,
+    'event': 0.06,
+    'creature': 0.04,
+    'collective': 0.03,
+    'institution': 0.03,
+    'species': 0.02,
+    'family': 0.02,
+    'trait': 0.03,
+    'ability': 0.03,
+    'title': 0.02,
+    'construct': 0.02,
+    'narrative': 0.01,
+    'phenomenon': 0.01,
+    'language': 0.01,
+    'law': 0.01,
+    'zone': 0.01,
+    'map': 0.005,
+    'marker': 0.01,
+    'pin': 0.015,
+}
+
+# Lognormal (mu, sigma) of word counts, and of extra links in a multi-link
+DESCRIPTION_WORDS = (3.2, 0.8)  # Median ~25 words
+FIELD_WORDS = (2.0, 0.7)  # Median ~7 words
+FAN_OUT = (0.3, 0.9)  # Median ~1 link, tail into the dozens
+MAX_FAN_OUT = 64
+
+FIELD_FILL = 0.6  # Chance an optional scalar field is filled
+LINK_FILL = 0.25  # Chance a link field is filled
+HUB_SKEW = 2.5  # Preferential attachment: higher, fewer and bigger hubs
+INTENSITY = (2.0, 3.0)  # Beta(a, b) * 100
+
+# Fixtures need a time for auto_now fields; keep it fixed so output is reproducible
+GENERATED_AT = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+WORDS = (
+    "night lantern carousel forest memory weight witness treaty broken faded silent "
+    "road ruin ember crown wolf river bell tower ash mirror thread stone gate hollow "
+    "shadow candle salt iron promise stranger ruler king queen lord master knight "
+    "warrior captain leader merchant craftsman citizen servant prisoner child orphan "
+    "beggar vast grand small tiny endless old quiet bitter golden pale distant "
+    "of the and in under beyond with without against toward"
+).split()
+
+SYLLABLES = "an bel cor dra el fen gar hal ir jun kel lor mar nel or pel quin ros sar tal ur vel wen yr zan".split()
+
+SUPERTYPES = ('common', 'rare', 'ancient', 'forgotten', 'sacred', 'lost')
+
+
+def _lognormal_count(rng: random.Random, shape: Tuple[float, float], minimum: int = 1, maximum: int = 400) -> int:
+    return max(minimum, min(maximum, int(rng.lognormvariate(*shape))))
+
+
+class SyntheticWorld:
+    """A deterministic world of `size` elements; nothing is generated until it is read."""
+
+    def __init__(self, size: int, seed: int = 0, name: str = None, mix: Dict[str, float] = None):
+        self.size = size
+        self.seed = seed
+        self.name = name or f"Synthetic {size} #{seed}"
+        self.id = str(uuid.UUID(bytes=self._digest('world'), version=4))
+
+        schemas = load_schema()
+        mix = {t: share for t, share in (mix or MIX).items() if t in schemas and share > 0}
+        total = sum(mix.values())
+        self.counts = {t: max(1, round(size * share / total)) for t, share in mix.items()}
+
+    def _digest(self, *parts) -> bytes:
+        return hashlib.sha256(':'.join(str(p) for p in (self.seed, *parts)).encode()).digest()[:16]
+
+    def element_id(self, element_type: str, index: int) -> str:
+        return str(uuid.UUID(bytes=self._digest(element_type, index), version=4))
+
+    def world(self) -> Dict:
+        """The world itself, as OnlyWorlds describes it."""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'description': f"A synthetic world of {self.size} elements, dreamt from seed {self.seed}",
+            'version': '1.0',
+            'time_basic_unit': 'night',
+            'time_range_min': -10000,
+            'time_range_max': 0,
+            'time_current': 0,
+        }
+
+    # Generation
+
+    def elements(self) -> Iterator[Dict]:
+        """Every element, type by type, in the same order for the same seed."""
+        rng = random.Random(self.seed)
+        for element_type, count in self.counts.items():
+            schema = get_schema(element_type)
+            fields = self._fields(schema)
+            for index in range(count):
+                yield self._element(rng, schema, fields, index)
+
+    def _fields(self, schema) -> List[Tuple[str, str, bool, Optional[int], Optional[int]]]:
+        """Scalar fields as (name, 'int' or 'str', required, minimum, maximum)."""
+        fields = []
+        for name in schema.scalars:
+            info = schema.model.model_fields[name]
+            if info.annotation in (int, Optional[int]):
+                low = next((m.ge for m in info.metadata if hasattr(m, 'ge')), None)
+                high = next((m.le for m in info.metadata if hasattr(m, 'le')), None)
+                fields.append((name, 'int', info.is_required(), low, high))
+            else:
+                fields.append((name, 'str', info.is_required(), None, None))
+        return fields
+
+    def _text(self, rng: random.Random, shape) -> str:
+        text = ' '.join(rng.choice(WORDS) for _ in range(_lognormal_count(rng, shape)))
+        return text[0].upper() + text[1:] + '.'
+
+    def _name(self, rng: random.Random, element_type: str, index: int) -> str:
+        name = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).title()
+        return f"{name} {rng.choice(WORDS).title()} {index}"
+
+    def _target(self, rng: random.Random, element_type: str, below: int = None) -> Optional[str]:
+        """A link target: low indices are picked far more often, so they become hubs."""
+        count = self.counts.get(element_type, 0) if below is None else below
+        if count <= 0:
+            return None
+        return self.element_id(element_type, int(count * rng.random() ** HUB_SKEW))
+
+    def _targets(self, rng: random.Random, element_type: str) -> List[str]:
+        count = self.counts.get(element_type, 0)
+        if not count:
+            return []
+        fan_out = min(count, MAX_FAN_OUT, _lognormal_count(rng, FAN_OUT))
+        return list(dict.fromkeys(self._target(rng, element_type) for _ in range(fan_out)))
+
+    def _element(self, rng: random.Random, schema, fields, index: int) -> Dict:
+        element_type = schema.element_type
+        element = {
+            'id': self.element_id(element_type, index),
+            'type': element_type,
+            'world': self.id,
+            'name': self._name(rng, element_type, index),
+            'description': self._text(rng, DESCRIPTION_WORDS),
+            'supertype': rng.choice(SUPERTYPES),
+        }
+
+        for name, kind, required, low, high in fields:
+            if not required and rng.random() > FIELD_FILL:
+                continue
+            if kind == 'str':
+                element[name] = self._text(rng, FIELD_WORDS)
+            else:
+                high = high if high is not None else (low or 0) + 1000
+                low = low if low is not None else high - 1000
+                element[name] = rng.randint(low, high)
+
+        for field, (kind, category) in schema.links.items():
+            if not schema.model.model_fields[field].is_required() and rng.random() > LINK_FILL:
+                continue
+            if kind == 'generic-link':
+                target_type = rng.choice(list(self.counts))
+                element[category] = target_type.title()
+                element[field] = self._target(rng, target_type)
+            elif kind == 'multi-link':
+                element[field] = self._targets(rng, category)
+            else:
+                element[field] = self._target(rng, category)
+
+        if element_type == 'location':
+            # A tree: every location but the first lies within an earlier one
+            element['parent_location'] = self._target(rng, 'location', below=index)
+        elif element_type == 'relation':
+            element['intensity'] = int(rng.betavariate(*INTENSITY) * 100)
+            element['actor'] = self._target(rng, 'character')
+            element['characters'] = self._targets(rng, 'character')
+        elif element_type == 'character':
+            element['location'] = self._target(rng, 'location')
+
+        return {key: value for key, value in element.items() if value not in (None, [])}
+
+    # Rows
+
+    def _world_row(self) -> World:
+        return World(
+            id=self.id,
+            name=self.name,
+            description=self.world()['description'],
+            source_type='manual',
+            source_reference=f'synthetic:{self.size}:{self.seed}',
+        )
+
+    def rows(self, world: World = None) -> Iterator[object]:
+        """Model instances for the whole world, World first, connected_to rows included."""
+        world = world or self._world_row()
+        yield world
+
+        adapter = OnlyWorldsAdapter(api_key='', pin='')
+        categories = _involved_categories()
+        through = Location.connected_to.through
+        connected = set()
+
+        for data in self.elements():
+            schema = get_schema(data['type'])
+            element, links = _build_rows(world, schema, schema.model.model_validate(data))
+            yield element
+            yield from links
+
+            if data['type'] == 'relation':
+                relation, involvements = build_relation_rows(world, data, categories)
+                yield relation
+                yield from involvements
+            elif data['type'] == 'location':
+                yield Location(
+                    id=data['id'], world=world, name=data['name'], description=data['description'],
+                    size_scale=adapter._determine_scale(data),
+                )
+                for key in ('parent_location', 'rival', 'partner'):
+                    target = data.get(key)
+                    if target in (None, data['id']) or frozenset((data['id'], target)) in connected:
+                        continue
+                    # connected_to is symmetrical; rows written directly need both directions
+                    connected.add(frozenset((data['id'], target)))
+                    yield through(from_location_id=data['id'], to_location_id=target)
+                    yield through(from_location_id=target, to_location_id=data['id'])
+            elif data['type'] == 'character':
+                power_level = adapter._analyze_power_level(data)
+                yield Character(
+                    id=data['id'], world=world, name=data['name'], description=data['description'],
+                    has_agency=power_level > 2, power_level=power_level,
+                    is_witness_candidate=power_level <= 3, current_location_id=data.get('location'),
+                )
+            elif data['type'] == 'object':
+                yield Object(
+                    id=data['id'], world=world, name=data['name'], description=data['description'],
+                    size=adapter._determine_object_size(data),
+                    resource_type=adapter._determine_resource_type(data),
+                    location_id=data.get('location'),
+                )
+
+    # Output
+
+    def write_elements(self, out: IO[str]) -> int:
+        """OnlyWorlds JSON - the world and its elements - streamed to `out`."""
+        out.write('{"world": ' + json.dumps(self.world()) + ', "elements": [\n')
+        count = 0
+        for element in self.elements():
+            out.write((',\n' if count else '') + json.dumps(element))
+            count += 1
+        out.write('\n]}\n')
+        return count
+
+    def write_fixture(self, out: IO[str]) -> int:
+        """A Django fixture for `loaddata`, streamed to `out`; returns the number of objects."""
+        out.write('[\n')
+        count = 0
+        for instance in self.rows():
+            out.write((',\n' if count else '') + json.dumps(_fixture_entry(instance), cls=DjangoJSONEncoder))
+            count += 1
+        out.write('\n]\n')
+        return count
+
+    def insert(self, batch_size: int = 2000) -> World:
+        """Insert the whole world in bulk, in one transaction."""
+        buffers: Dict[type, List] = defaultdict(list)
+
+        def flush(model):
+            model.objects.bulk_create(buffers.pop(model), batch_size=batch_size)
+
+        with transaction.atomic():
+            for instance in self.rows():
+                if isinstance(instance, World):
+                    instance.save()
+                    continue
+                model = type(instance)
+                buffers[model].append(instance)
+                if len(buffers[model]) >= batch_size:
+                    flush(model)
+
+            # Foreign keys are checked at commit, so the order rows go in does not matter
+            for model in list(buffers):
+                flush(model)
+
+        return World.objects.get(id=self.id)
+
+
+def _fixture_entry(instance) -> Dict:
+    meta = instance._meta
+    fields = {}
+    for field in meta.concrete_fields:
+        if field.primary_key:
+            continue
+        value = field.value_from_object(instance)
+        if value is None and (getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)):
+            value = GENERATED_AT
+        fields[field.name] = value
+    return {
+        'model': meta.label_lower,
+        'pk': instance.pk,  # None for auto ids; loaddata assigns them
+        'fields': fields,
+    }